@@ -0,0 +1,264 @@
+"""
+账户内存账本 - 在线玩家的余额和持股以内存为准，余额变动先写日志，再定时批量写入数据库
+"""
+import glob
+import os
+import threading
+from decimal import Decimal
+from typing import Dict, Optional
+
+from .databaseManager import DatabaseManager
+from .money import from_micro, to_micro
+
+
+class AccountLedger:
+    def __init__(self, database_manager: DatabaseManager, journal_path: str, flush_interval_ms: int = 200):
+        """
+        初始化账户账本，加载前先根据日志恢复上次未写入数据库的余额
+        :param database_manager: 数据库管理器实例
+        :param journal_path: 预写日志文件路径
+        :param flush_interval_ms: 日志批量写入数据库的间隔（毫秒）
+        """
+        self.database_manager = database_manager
+        self.journal_path = journal_path
+        self.flush_interval = flush_interval_ms / 1000
+
+        self._lock = threading.RLock()
+        # 玩家XUID -> 余额（微单位），None 表示没有账户
+        self._balances: Dict[str, Optional[int]] = {}
+        # 玩家XUID -> {股票名: 股数}
+        self._holdings: Dict[str, Dict[str, int]] = {}
+        # 尚未写入数据库的余额（只保留每个玩家的最新值）
+        self._pending: Dict[str, int] = {}
+        # 正在写入数据库（尚未提交）的余额
+        self._flushing: Dict[str, int] = {}
+        # 已下线但余额尚未写入数据库的玩家，写入后释放
+        self._deferred_evictions = set()
+        self._seq = 0
+
+        # 批量写入由后台线程完成，同一时间只有一个写入
+        self._flush_lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+        self.recover()
+        self._journal = open(self.journal_path, "a", encoding="utf-8")
+        self._flush_thread = threading.Thread(target=self._flush_loop, daemon=True)
+        self._flush_thread.start()
+
+    # ==================== 余额 ====================
+
+    def has_account(self, xuid: str) -> bool:
+        """检查玩家是否已激活股票账户"""
+        return self._load_balance(xuid) is not None
+
+    def get_balance(self, xuid: str) -> Optional[Decimal]:
+        """
+        获取玩家余额
+        :return: Decimal 金额，没有账户返回None
+        """
+        return from_micro(self._load_balance(xuid))
+
+    def increase_balance(self, xuid: str, amount) -> None:
+        """
+        增加余额，没有账户时创建账户
+        :param xuid: 玩家XUID
+        :param amount: 金额
+        """
+        with self._lock:
+            balance = self._load_balance(xuid) or 0
+            self._write(xuid, balance + to_micro(amount))
+
+    def decrease_balance(self, xuid: str, amount) -> None:
+        """
+        减少余额
+        :param xuid: 玩家XUID
+        :param amount: 金额
+        """
+        with self._lock:
+            balance = self._load_balance(xuid)
+            if balance is None:
+                raise Exception("User not found")
+            self._write(xuid, balance - to_micro(amount))
+
+    def _load_balance(self, xuid: str) -> Optional[int]:
+        """读取内存中的余额，第一次访问时从数据库加载"""
+        with self._lock:
+            if xuid not in self._balances:
+                account = self.database_manager.query_one(
+                    "SELECT balance FROM tb_player_account WHERE player_xuid = ?",
+                    (xuid,)
+                )
+                self._balances[xuid] = None if account is None else (account["balance"] or 0)
+            return self._balances[xuid]
+
+    def _write(self, xuid: str, balance: int) -> None:
+        """
+        记录新余额：先追加到日志（只写入操作系统缓冲区，不同步刷盘），再更新内存
+        日志记录的是变动后的余额而不是变动量，重放多次结果相同
+        """
+        self._seq += 1
+        self._journal.write(f"{self._seq}\t{xuid}\t{balance}\n")
+        self._journal.flush()
+        self._balances[xuid] = balance
+        self._pending[xuid] = balance
+
+    # ==================== 持股 ====================
+
+    def get_holding(self, xuid: str, stock_name: str) -> int:
+        """
+        获取玩家某只股票的持股数量
+        :return: 股数，没有持股返回0
+        """
+        return self._load_holdings(xuid).get(stock_name.upper(), 0)
+
+    def adjust_holding(self, xuid: str, stock_name: str, share: int) -> None:
+        """
+        在成交写入数据库后同步内存中的持股
+        内存中没有该玩家的持股时（第一次交易或交易期间下线）直接从数据库加载，
+        数据库中已包含本次成交，不再叠加变动股数
+        :param share: 变动股数，买入为正，卖出为负
+        """
+        with self._lock:
+            if xuid not in self._holdings:
+                self._load_holdings(xuid)
+                return
+            holdings = self._holdings[xuid]
+            stock_name = stock_name.upper()
+            holdings[stock_name] = holdings.get(stock_name, 0) + int(share)
+
+    def _load_holdings(self, xuid: str) -> Dict[str, int]:
+        with self._lock:
+            if xuid not in self._holdings:
+                self._holdings[xuid] = {
+                    row["stock_name"].upper(): row["share"]
+                    for row in self.database_manager.query_all(
+                        "SELECT stock_name, share FROM tb_player_stock WHERE player_xuid = ?",
+                        (xuid,)
+                    )
+                }
+            return self._holdings[xuid]
+
+    def evict(self, xuid: str) -> None:
+        """
+        玩家下线时释放内存，仍有未写入或正在写入数据库的余额时保留到写入之后
+        （否则玩家在写入提交前重新进服会从数据库读到旧余额）
+        """
+        with self._lock:
+            self._holdings.pop(xuid, None)
+            if xuid in self._pending or xuid in self._flushing:
+                self._deferred_evictions.add(xuid)
+            else:
+                self._balances.pop(xuid, None)
+
+    # ==================== 日志和批量写入 ====================
+
+    def flush(self) -> None:
+        """
+        将日志中的余额批量写入数据库（单个事务），写入成功后删除对应的日志
+        排行榜等直接读数据库的逻辑在读取前应先调用
+        """
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return
+                pending = self._pending
+                self._pending = {}
+                self._flushing = pending
+                # 轮换日志文件，写入期间的新变动记录到新文件
+                # 同名文件已存在说明上次写入失败且之后没有新变动，当前日志为空，无需轮换
+                rotated_path = f"{self.journal_path}.{self._seq}"
+                if not os.path.exists(rotated_path):
+                    self._journal.close()
+                    os.replace(self.journal_path, rotated_path)
+                    self._journal = open(self.journal_path, "a", encoding="utf-8")
+
+            try:
+                self._apply_to_database(pending)
+            except Exception:
+                # 写入失败：保留轮换出的日志，未被新值覆盖的余额放回待写入队列
+                with self._lock:
+                    for xuid, balance in pending.items():
+                        self._pending.setdefault(xuid, balance)
+                    self._flushing = {}
+                raise
+
+            with self._lock:
+                self._flushing = {}
+                # 写入期间或之前下线的玩家，余额已提交且没有新的变动时释放
+                for xuid in pending:
+                    if xuid in self._deferred_evictions and xuid not in self._pending:
+                        self._deferred_evictions.discard(xuid)
+                        self._balances.pop(xuid, None)
+
+            # 之前写入失败遗留的日志已被本次写入覆盖
+            for path in self._rotated_journals():
+                if self._journal_seq(path) <= self._journal_seq(rotated_path):
+                    os.remove(path)
+
+    def recover(self) -> None:
+        """
+        根据日志恢复上次未写入数据库的余额（服务器崩溃后启动时）
+        按顺序重放所有轮换日志和当前日志，同一玩家以最后一条为准
+        """
+        paths = self._rotated_journals()
+        if os.path.exists(self.journal_path):
+            paths.append(self.journal_path)
+
+        balances = {}
+        for path in paths:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if not line.endswith("\n"):
+                        # 崩溃时只写了一半的最后一行
+                        break
+                    seq, xuid, balance = line.rstrip("\n").split("\t")
+                    balances[xuid] = int(balance)
+                    self._seq = max(self._seq, int(seq))
+
+        if balances:
+            self._apply_to_database(balances)
+            print(f"[UpAndDown] 已从日志恢复 {len(balances)} 个账户的余额")
+
+        for path in paths:
+            os.remove(path)
+
+    def close(self) -> None:
+        """停止后台写入线程，写入剩余日志并关闭文件（插件卸载时调用）"""
+        self._stop_event.set()
+        self._flush_thread.join(timeout=5)
+        try:
+            self.flush()
+        finally:
+            with self._lock:
+                self._journal.close()
+
+    def _flush_loop(self):
+        while not self._stop_event.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception as e:
+                import traceback
+                print(f"写入账户余额失败: {str(e)}")
+                print(traceback.format_exc())
+
+    def _apply_to_database(self, balances: Dict[str, int]) -> None:
+        """在同一个事务内写入余额，tb_player_account 没有唯一约束，因此先更新，不存在再插入"""
+        with self.database_manager.transaction() as conn:
+            for xuid, balance in balances.items():
+                cursor = conn.execute(
+                    "UPDATE tb_player_account SET balance = ? WHERE player_xuid = ?",
+                    (balance, xuid)
+                )
+                if cursor.rowcount == 0:
+                    conn.execute(
+                        "INSERT INTO tb_player_account (player_xuid, balance) VALUES (?, ?)",
+                        (xuid, balance)
+                    )
+
+    def _rotated_journals(self):
+        """按序号升序返回轮换出的日志文件"""
+        return sorted(glob.glob(glob.escape(self.journal_path) + ".*"), key=self._journal_seq)
+
+    @staticmethod
+    def _journal_seq(path: str) -> int:
+        return int(path.rsplit(".", 1)[1])
@@ -0,0 +1,110 @@
+"""
+数据库在线备份 - 使用 SQLite 备份接口分批复制页面，不停服也不会长时间锁住数据库
+"""
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import List, Optional
+
+from .databaseManager import DatabaseManager
+
+
+class _BackupRestarted(Exception):
+    """备份期间源数据库被其他连接修改次数过多"""
+
+
+class BackupManager:
+    # 备份文件名: up_and_down_20240101_120000.db
+    FILE_PREFIX = "up_and_down_"
+    FILE_SUFFIX = ".db"
+
+    def __init__(self, database_manager: DatabaseManager, backup_dir: str, keep: int = 24,
+                 pages_per_step: int = 64, step_sleep: float = 0.01, max_restarts: int = 5):
+        """
+        初始化备份管理器
+        :param database_manager: 数据库管理器实例
+        :param backup_dir: 备份目录
+        :param keep: 保留的备份数量
+        :param pages_per_step: 每批复制的页数
+        :param step_sleep: 每批之间让出数据库的时间（秒）
+        :param max_restarts: 源数据库被修改导致备份重新开始的最大次数，超过后一次性复制
+        """
+        self.database_manager = database_manager
+        self.backup_dir = Path(backup_dir)
+        self.keep = keep
+        self.pages_per_step = pages_per_step
+        self.step_sleep = step_sleep
+        self.max_restarts = max_restarts
+
+    def run_backup(self) -> Optional[str]:
+        """
+        备份数据库：先写入临时文件，校验通过后再改名，最后清理多余的旧备份
+        :return: 备份文件路径，校验失败返回None
+        """
+        self.backup_dir.mkdir(parents=True, exist_ok=True)
+        name = f"{self.FILE_PREFIX}{time.strftime('%Y%m%d_%H%M%S')}{self.FILE_SUFFIX}"
+        target = self.backup_dir / name
+        partial = self.backup_dir / (name + ".part")
+
+        start = time.perf_counter()
+        # 使用独立连接，不影响各线程连接上正在进行的事务
+        source = sqlite3.connect(self.database_manager.db_path)
+        try:
+            destination = sqlite3.connect(str(partial))
+            try:
+                try:
+                    self._copy_in_steps(source, destination)
+                except _BackupRestarted:
+                    # 交易频繁时分批复制可能一直被打断，改为一次性复制（只短暂持有读锁）
+                    source.backup(destination)
+
+                result = destination.execute("PRAGMA integrity_check").fetchone()[0]
+            finally:
+                destination.close()
+        finally:
+            source.close()
+
+        if result != "ok":
+            os.remove(partial)
+            print(f"[UpAndDown] 数据库备份校验失败: {result}")
+            return None
+
+        os.replace(partial, target)
+        self.rotate()
+        print(f"[UpAndDown] 数据库已备份到 {target} ({(time.perf_counter() - start) * 1000:.0f}ms)")
+        return str(target)
+
+    def _copy_in_steps(self, source: sqlite3.Connection, destination: sqlite3.Connection) -> None:
+        """
+        分批复制页面，每批之间休眠，让交易线程可以获得写锁
+        其他连接修改源数据库时 SQLite 会从头开始复制
+        """
+        state = {"remaining": None, "restarts": 0}
+
+        def progress(status, remaining, total):
+            if state["remaining"] is not None and remaining > state["remaining"]:
+                state["restarts"] += 1
+                if state["restarts"] > self.max_restarts:
+                    raise _BackupRestarted()
+            state["remaining"] = remaining
+            time.sleep(self.step_sleep)
+
+        source.backup(destination, pages=self.pages_per_step, progress=progress)
+
+    def rotate(self) -> None:
+        """只保留最新的 keep 个备份"""
+        for path in self.list_backups()[self.keep:]:
+            os.remove(path)
+
+    def list_backups(self) -> List[str]:
+        """
+        获取所有备份文件
+        :return: 备份文件路径，最新的在前
+        """
+        if not self.backup_dir.exists():
+            return []
+        return sorted(
+            (str(path) for path in self.backup_dir.glob(f"{self.FILE_PREFIX}*{self.FILE_SUFFIX}")),
+            reverse=True
+        )
@@ -1,17 +1,23 @@
 import sqlite3
-from typing import Any, List, Dict, Optional, Union
+from contextlib import contextmanager
+from typing import Any, Iterable, Iterator, List, Dict, Optional, Sequence, Union
 import threading
 from pathlib import Path
 
+from .query_stats import InstrumentedConnection, QueryStats
+
 
 class DatabaseManager:
-    def __init__(self, db_path: str):
+    def __init__(self, db_path: str, slow_query_threshold_ms: float = 100):
         """
         初始化数据库管理器
         :param db_path: 数据库文件路径
+        :param slow_query_threshold_ms: 慢查询阈值（毫秒），超过时打印执行计划
         """
         self.db_path = db_path
         self._local = threading.local()  # 线程本地存储
+        # 所有线程的连接共享同一份SQL统计
+        self.query_stats = QueryStats(slow_query_threshold_ms)
         self._ensure_db_exists()
 
     def _ensure_db_exists(self):
@@ -24,11 +30,67 @@ class DatabaseManager:
     def connection(self) -> sqlite3.Connection:
         """获取当前线程的数据库连接"""
         if not hasattr(self._local, 'connection'):
-            self._local.connection = sqlite3.connect(self.db_path)
+            # 锁等待由 InstrumentedConnection 重试并计时
+            self._local.connection = sqlite3.connect(self.db_path, timeout=0, factory=InstrumentedConnection)
+            self._local.connection.query_stats = self.query_stats
             # 设置行工厂为字典类型
             self._local.connection.row_factory = sqlite3.Row
         return self._local.connection
 
+    @property
+    def _transaction_depth(self) -> int:
+        """当前线程 transaction() 的嵌套层数"""
+        return getattr(self._local, 'transaction_depth', 0)
+
+    @contextmanager
+    def transaction(self, immediate: bool = True) -> Iterator[sqlite3.Connection]:
+        """
+        事务上下文管理器，块内的写操作在退出时一次提交，出现异常时回滚
+        可以嵌套：内层使用 SAVEPOINT，内层失败只回滚内层的修改
+        事务内调用 execute/insert/update 等方法不会单独提交
+        :param immediate: 最外层是否使用 BEGIN IMMEDIATE，开始时就取得写锁，
+                          避免先读后写时与其他写事务互相等待；只读的快照传 False
+        :return: 当前线程的数据库连接
+        """
+        conn = self.connection
+        depth = self._transaction_depth
+
+        if depth == 0:
+            if not conn.in_transaction:
+                conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+            self._local.transaction_depth = 1
+            try:
+                yield conn
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            finally:
+                self._local.transaction_depth = 0
+        else:
+            savepoint = f"sp_{depth}"
+            conn.execute(f"SAVEPOINT {savepoint}")
+            self._local.transaction_depth = depth + 1
+            try:
+                yield conn
+                conn.execute(f"RELEASE SAVEPOINT {savepoint}")
+            except BaseException:
+                conn.execute(f"ROLLBACK TO SAVEPOINT {savepoint}")
+                conn.execute(f"RELEASE SAVEPOINT {savepoint}")
+                raise
+            finally:
+                self._local.transaction_depth = depth
+
+    def _commit(self):
+        """不在 transaction() 中时提交"""
+        if self._transaction_depth == 0:
+            self.connection.commit()
+
+    def _rollback(self):
+        """不在 transaction() 中时回滚，事务中的错误交给 transaction() 处理"""
+        if self._transaction_depth == 0:
+            self.connection.rollback()
+
     def close(self):
         """关闭当前线程的数据库连接"""
         if hasattr(self._local, 'connection'):
@@ -43,13 +105,28 @@ class DatabaseManager:
         :return: 是否执行成功
         """
         try:
-            cursor = self.connection.cursor()
-            cursor.execute(sql, params)
-            self.connection.commit()
+            self.connection.execute(sql, params)
+            self._commit()
             return True
         except Exception as e:
             print(f"Execute SQL error: {str(e)}")
-            self.connection.rollback()
+            self._rollback()
+            raise e
+
+    def execute_many(self, sql: str, params_list: Iterable[Sequence]) -> int:
+        """
+        使用同一条SQL批量执行，只提交一次
+        :param sql: SQL语句
+        :param params_list: 每一行的SQL参数
+        :return: 影响的行数
+        """
+        try:
+            cursor = self.connection.executemany(sql, params_list)
+            self._commit()
+            return cursor.rowcount
+        except Exception as e:
+            print(f"Execute many error: {str(e)}")
+            self._rollback()
             raise e
 
     def query_one(self, sql: str, params: tuple = ()) -> Optional[Dict[str, Any]]:
@@ -60,9 +137,7 @@ class DatabaseManager:
         :return: 查询结果字典或None
         """
         try:
-            cursor = self.connection.cursor()
-            cursor.execute(sql, params)
-            row = cursor.fetchone()
+            row = self.connection.query(sql, params, lambda cursor: cursor.fetchone())
             return dict(row) if row else None
         except Exception as e:
             print(f"Query one error: {str(e)}")
@@ -76,9 +151,8 @@ class DatabaseManager:
         :return: 查询结果列表
         """
         try:
-            cursor = self.connection.cursor()
-            cursor.execute(sql, params)
-            return [dict(row) for row in cursor.fetchall()]
+            rows = self.connection.query(sql, params, lambda cursor: cursor.fetchall())
+            return [dict(row) for row in rows]
         except Exception as e:
             print(f"Query all error: {str(e)}")
             raise e
@@ -95,6 +169,66 @@ class DatabaseManager:
         sql = f"INSERT INTO {table} ({fields}) VALUES ({placeholders})"
         return self.execute(sql, tuple(data.values()))
 
+    def insert_many(self, table: str, rows: List[Dict[str, Any]]) -> int:
+        """
+        批量插入数据，只提交一次
+        :param table: 表名
+        :param rows: 要插入的数据字典列表，字段以第一行为准
+        :return: 插入的行数
+        """
+        if not rows:
+            return 0
+        fields = list(rows[0].keys())
+        placeholders = ','.join(['?' for _ in fields])
+        sql = f"INSERT INTO {table} ({','.join(fields)}) VALUES ({placeholders})"
+        return self.execute_many(sql, [tuple(row[field] for field in fields) for row in rows])
+
+    def insert_returning_id(self, table: str, data: Dict[str, Any]) -> int:
+        """
+        插入数据并返回新记录的主键
+        :param table: 表名
+        :param data: 要插入的数据字典
+        :return: 新记录的 id
+        """
+        fields = ','.join(data.keys())
+        placeholders = ','.join(['?' for _ in data])
+        sql = f"INSERT INTO {table} ({fields}) VALUES ({placeholders})"
+        try:
+            if sqlite3.sqlite_version_info >= (3, 35, 0):
+                new_id = self.connection.query(
+                    f"{sql} RETURNING id", tuple(data.values()), lambda cursor: cursor.fetchone()[0]
+                )
+            else:
+                # 旧版本 SQLite 不支持 RETURNING，lastrowid 同样只属于当前连接
+                new_id = self.connection.execute(sql, tuple(data.values())).lastrowid
+            self._commit()
+            return new_id
+        except Exception as e:
+            print(f"Insert returning id error: {str(e)}")
+            self._rollback()
+            raise e
+
+    def upsert(self, table: str, data: Dict[str, Any], conflict_fields: Sequence[str],
+               update_fields: Optional[Sequence[str]] = None) -> bool:
+        """
+        插入数据，唯一键冲突时更新
+        :param table: 表名
+        :param data: 要插入的数据字典
+        :param conflict_fields: 唯一约束的字段
+        :param update_fields: 冲突时更新的字段，默认为除唯一约束外的所有字段
+        :return: 是否执行成功
+        """
+        if update_fields is None:
+            update_fields = [k for k in data.keys() if k not in conflict_fields]
+        fields = ','.join(data.keys())
+        placeholders = ','.join(['?' for _ in data])
+        if update_fields:
+            action = "DO UPDATE SET " + ','.join([f"{k}=excluded.{k}" for k in update_fields])
+        else:
+            action = "DO NOTHING"
+        sql = f"INSERT INTO {table} ({fields}) VALUES ({placeholders}) ON CONFLICT({','.join(conflict_fields)}) {action}"
+        return self.execute(sql, tuple(data.values()))
+
     def update(self, table: str, data: Dict[str, Any], where: str, params: tuple = ()) -> bool:
         """
         更新数据
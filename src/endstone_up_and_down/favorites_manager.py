@@ -1,6 +1,8 @@
 """
 股票收藏夹管理器
 """
+import sqlite3
+import threading
 from typing import List, Dict, Optional
 from .databaseManager import DatabaseManager
 
@@ -12,6 +14,9 @@ class FavoritesManager:
         :param database_manager: 数据库管理器实例
         """
         self.database_manager = database_manager
+        # 玩家XUID -> {股票代码: 收藏记录}，按 id 从小到大排列，首次访问时从数据库加载
+        self._favorites: Dict[str, Dict[str, Dict]] = {}
+        self._lock = threading.RLock()
         self._init_favorites_table()
     
     def _init_favorites_table(self) -> None:
@@ -24,6 +29,9 @@ class FavoritesManager:
             "add_time": "REAL NOT NULL",
             "UNIQUE": "(player_xuid, stock_name)"
         })
+        self.database_manager.execute(
+            "CREATE INDEX IF NOT EXISTS idx_stock_favorites_player ON tb_stock_favorites (player_xuid, id)"
+        )
     
     def add_favorite(self, player_xuid: str, stock_name: str, stock_display_name: str = None) -> bool:
         """
@@ -36,17 +44,24 @@ class FavoritesManager:
         try:
             import time
             
-            # 检查是否已经收藏
-            if self.is_favorite(player_xuid, stock_name):
-                return False
-            
-            self.database_manager.insert("tb_stock_favorites", {
-                "player_xuid": player_xuid,
-                "stock_name": stock_name,
-                "stock_display_name": stock_display_name or stock_name,
-                "add_time": time.time()
-            })
+            with self._lock:
+                favorites = self._load(player_xuid)
+                if stock_name in favorites:
+                    return False
+                
+                favorite = {
+                    "player_xuid": player_xuid,
+                    "stock_name": stock_name,
+                    "stock_display_name": stock_display_name or stock_name,
+                    "add_time": time.time()
+                }
+                # 其他途径写入的重复收藏由唯一约束拦截
+                favorite["id"] = self.database_manager.insert_returning_id("tb_stock_favorites", favorite)
+                favorites[stock_name] = favorite
             return True
+        except sqlite3.IntegrityError:
+            self.evict(player_xuid)
+            return False
         except Exception as e:
             print(f"添加收藏失败: {str(e)}")
             return False
@@ -59,11 +74,15 @@ class FavoritesManager:
         :return: 是否取消成功
         """
         try:
-            return self.database_manager.delete(
-                "tb_stock_favorites",
-                "player_xuid = ? AND stock_name = ?",
-                (player_xuid, stock_name)
-            )
+            with self._lock:
+                result = self.database_manager.delete(
+                    "tb_stock_favorites",
+                    "player_xuid = ? AND stock_name = ?",
+                    (player_xuid, stock_name)
+                )
+                if player_xuid in self._favorites:
+                    self._favorites[player_xuid].pop(stock_name, None)
+            return result
         except Exception as e:
             print(f"取消收藏失败: {str(e)}")
             return False
@@ -75,28 +94,27 @@ class FavoritesManager:
         :param stock_name: 股票代码
         :return: 是否已收藏
         """
-        result = self.database_manager.query_one(
-            "SELECT * FROM tb_stock_favorites WHERE player_xuid = ? AND stock_name = ?",
-            (player_xuid, stock_name)
-        )
-        return result is not None
+        return stock_name in self._load(player_xuid)
     
-    def get_favorites(self, player_xuid: str, page: int = 0, page_size: int = 10) -> List[Dict]:
+    def get_favorites(self, player_xuid: str, before_id: Optional[int] = None, page_size: int = 10) -> List[Dict]:
         """
-        获取玩家的收藏列表
+        按游标分页获取玩家的收藏列表（最近收藏的在前）
         :param player_xuid: 玩家UUID
-        :param page: 页码（从0开始）
+        :param before_id: 游标，只返回 id 小于该值的收藏，为空时从第一页开始
         :param page_size: 每页数量
-        :return: 收藏列表
-        """
-        offset = page * page_size
-        sql = """
-            SELECT * FROM tb_stock_favorites 
-            WHERE player_xuid = ? 
-            ORDER BY add_time DESC 
-            LIMIT ? OFFSET ?
+        :return: 收藏列表，最后一条的 id 即下一页的游标
         """
-        return self.database_manager.query_all(sql, (player_xuid, page_size, offset))
+        with self._lock:
+            favorites = list(self._load(player_xuid).values())
+        
+        page = []
+        for favorite in reversed(favorites):
+            if before_id is not None and favorite['id'] >= before_id:
+                continue
+            page.append(dict(favorite))
+            if len(page) >= page_size:
+                break
+        return page
     
     def get_favorites_count(self, player_xuid: str) -> int:
         """
@@ -104,9 +122,22 @@ class FavoritesManager:
         :param player_xuid: 玩家UUID
         :return: 收藏数量
         """
-        result = self.database_manager.query_one(
-            "SELECT COUNT(*) as count FROM tb_stock_favorites WHERE player_xuid = ?",
-            (player_xuid,)
-        )
-        return result['count'] if result else 0
-
+        return len(self._load(player_xuid))
+    
+    def evict(self, player_xuid: str) -> None:
+        """玩家下线时释放缓存，下次访问时重新从数据库加载"""
+        with self._lock:
+            self._favorites.pop(player_xuid, None)
+    
+    def _load(self, player_xuid: str) -> Dict[str, Dict]:
+        """读取内存中的收藏，第一次访问时从数据库加载"""
+        with self._lock:
+            if player_xuid not in self._favorites:
+                self._favorites[player_xuid] = {
+                    row['stock_name']: row
+                    for row in self.database_manager.query_all(
+                        "SELECT * FROM tb_stock_favorites WHERE player_xuid = ? ORDER BY id ASC",
+                        (player_xuid,)
+                    )
+                }
+            return self._favorites[player_xuid]
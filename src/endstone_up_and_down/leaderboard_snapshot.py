@@ -0,0 +1,176 @@
+"""
+排行榜快照 - 计算完成后整体发布的只读排行榜
+"""
+import bisect
+import threading
+import time
+from types import MappingProxyType
+from typing import Callable, Dict, Iterable, List, Mapping, Optional, Tuple
+
+
+class LeaderboardSnapshot:
+    """
+    不可变的排行榜快照
+    发布后不再修改，更新时构建新快照并替换引用，读取方不会看到更新到一半的数据
+    """
+    __slots__ = ("last_updated", "_boards", "_by_xuid", "_sorted_values")
+
+    # 各榜单的排序字段
+    SORT_KEYS = {True: "absolute_profit_loss", False: "relative_profit_loss"}
+
+    def __init__(self, absolute_rows: Tuple[Mapping, ...], relative_rows: Tuple[Mapping, ...], last_updated: float):
+        """
+        :param absolute_rows: 按排名排列的绝对盈亏榜
+        :param relative_rows: 按排名排列的相对盈亏榜
+        :param last_updated: 更新时间
+        """
+        self.last_updated = last_updated
+        self._boards = {True: absolute_rows, False: relative_rows}
+        self._by_xuid = {
+            is_absolute: MappingProxyType({row['player_xuid']: row for row in rows})
+            for is_absolute, rows in self._boards.items()
+        }
+        # 升序排列的排序字段值，用于二分查找百分位
+        self._sorted_values = {
+            is_absolute: sorted(row[self.SORT_KEYS[is_absolute]] for row in rows)
+            for is_absolute, rows in self._boards.items()
+        }
+
+    @classmethod
+    def build(cls, players_data: List[Dict], rankings: Dict[bool, List[int]], last_updated: Optional[float] = None) -> "LeaderboardSnapshot":
+        """
+        根据估值结果构建快照
+        :param players_data: 玩家盈亏数据列表
+        :param rankings: {是否绝对盈亏榜: 按排名排列的 players_data 下标}
+        :param last_updated: 更新时间，默认为当前时间
+        """
+        if last_updated is None:
+            last_updated = time.time()
+
+        boards = {}
+        for is_absolute in (True, False):
+            boards[is_absolute] = tuple(
+                MappingProxyType({
+                    **players_data[idx],
+                    "is_absolute": is_absolute,
+                    "last_updated": last_updated,
+                    "rank": rank
+                })
+                for rank, idx in enumerate(rankings[is_absolute], 1)
+            )
+
+        return cls(boards[True], boards[False], last_updated)
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Dict]) -> Optional["LeaderboardSnapshot"]:
+        """
+        根据数据库中持久化的排行榜记录恢复快照（用于重启后）
+        :param rows: tb_leaderboard 记录
+        :return: 快照，没有记录时返回None
+        """
+        boards = {True: [], False: []}
+        for row in rows:
+            row = dict(row)
+            row.pop("id", None)
+            row["is_absolute"] = bool(row["is_absolute"])
+            boards[row["is_absolute"]].append(MappingProxyType(row))
+
+        if not boards[True] and not boards[False]:
+            return None
+
+        for rows_of_board in boards.values():
+            rows_of_board.sort(key=lambda x: x["rank"])
+
+        last_updated = max(row["last_updated"] for rows_of_board in boards.values() for row in rows_of_board)
+        return cls(tuple(boards[True]), tuple(boards[False]), last_updated)
+
+    def get_board(self, is_absolute: bool) -> Tuple[Mapping, ...]:
+        """获取按排名排列的整个榜单"""
+        return self._boards[is_absolute]
+
+    def get_player(self, player_xuid: str, is_absolute: bool = True) -> Optional[Mapping]:
+        """按XUID获取玩家记录"""
+        return self._by_xuid[is_absolute].get(player_xuid)
+
+    def get_window(self, is_absolute: bool, start_rank: int, end_rank: int) -> Tuple[Mapping, ...]:
+        """
+        获取名次区间内的记录，例如第100到120名
+        :param start_rank: 起始名次（包含），从1开始
+        :param end_rank: 结束名次（包含）
+        """
+        return self._boards[is_absolute][max(start_rank, 1) - 1:max(end_rank, 0)]
+
+    def get_rank(self, player_xuid: str, is_absolute: bool = True) -> Optional[int]:
+        """获取玩家名次，不在榜上返回None"""
+        row = self._by_xuid[is_absolute].get(player_xuid)
+        return row["rank"] if row else None
+
+    def get_percentile(self, player_xuid: str, is_absolute: bool = True) -> Optional[float]:
+        """
+        获取玩家超过了百分之多少的玩家
+        :return: 0-100 的百分比，不在榜上返回None
+        """
+        row = self._by_xuid[is_absolute].get(player_xuid)
+        if row is None:
+            return None
+
+        values = self._sorted_values[is_absolute]
+        if len(values) <= 1:
+            return 100.0
+        below = bisect.bisect_left(values, row[self.SORT_KEYS[is_absolute]])
+        return below / (len(values) - 1) * 100
+
+    def rows(self):
+        """遍历两个榜单的所有记录（用于持久化）"""
+        for is_absolute in (True, False):
+            yield from self._boards[is_absolute]
+
+    def __len__(self):
+        return len(self._boards[True])
+
+
+class LeaderboardPersister:
+    """
+    在后台线程持久化排行榜快照，只保留最新的一个
+    写入较慢时，期间发布的快照互相覆盖，写入完成后只写最新的快照，不占用排行榜锁也不阻塞下一次估值
+    """
+
+    def __init__(self, save_func: Callable[[LeaderboardSnapshot], None]):
+        """
+        :param save_func: 写入快照的函数，例如 StockDao.save_leaderboard_data
+        """
+        self.save_func = save_func
+        self._latest: Optional[LeaderboardSnapshot] = None
+        self._writing = False
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+
+    def submit(self, snapshot: LeaderboardSnapshot) -> None:
+        """提交快照，没有正在进行的写入时启动后台写入线程"""
+        with self._lock:
+            self._latest = snapshot
+            if self._writing:
+                return
+            self._writing = True
+        threading.Thread(target=self._write_loop, daemon=True).start()
+
+    def flush(self, timeout: Optional[float] = None) -> None:
+        """等待已提交的快照写入完成（插件卸载时调用）"""
+        with self._idle:
+            self._idle.wait_for(lambda: not self._writing, timeout)
+
+    def _write_loop(self):
+        while True:
+            with self._lock:
+                snapshot = self._latest
+                self._latest = None
+                if snapshot is None:
+                    self._writing = False
+                    self._idle.notify_all()
+                    return
+            try:
+                self.save_func(snapshot)
+            except Exception as e:
+                import traceback
+                print(f"保存排行榜快照失败: {str(e)}")
+                print(traceback.format_exc())
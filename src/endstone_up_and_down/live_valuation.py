@@ -0,0 +1,125 @@
+"""
+玩家实时估值 - 根据缓存的持仓汇总和最新观察到的价格即时计算单个玩家的财富和盈亏
+"""
+import threading
+from typing import Callable, Dict, Iterable, Optional
+
+from .account_ledger import AccountLedger
+from .databaseManager import DatabaseManager
+from .money import from_micro, to_micro
+from .valuation_engine import PortfolioValuationEngine
+
+
+class LiveValuationService:
+    def __init__(self, database_manager: DatabaseManager, account_ledger: AccountLedger,
+                 valuation_engine: PortfolioValuationEngine, get_stock_prices_func: Callable[[Iterable[str]], Dict]):
+        """
+        初始化实时估值服务
+        :param database_manager: 数据库管理器实例
+        :param account_ledger: 账户账本，余额以账本为准
+        :param valuation_engine: 估值引擎，使用其记录的最新价格
+        :param get_stock_prices_func: 批量获取价格的函数，用于还没有观察到价格的股票
+        """
+        self.database_manager = database_manager
+        self.account_ledger = account_ledger
+        self.valuation_engine = valuation_engine
+        self.get_stock_prices_func = get_stock_prices_func
+
+        # 玩家XUID -> [(股票代码, 股数, 累计买入, 累计卖出)]，金额为微单位
+        self._positions: Dict[str, list] = {}
+        # 玩家XUID -> (余额, 使用的价格, 估值结果)，余额和价格都没变时直接返回
+        self._results: Dict[str, tuple] = {}
+        # 玩家XUID -> 失效次数，查询持仓期间发生交易时不缓存查询结果
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get_valuation(self, player_xuid: str) -> Optional[Dict]:
+        """
+        获取玩家当前的财富和盈亏
+        :param player_xuid: 玩家XUID
+        :return: 与排行榜数据相同的字段（金额为 Decimal），没有账户返回None
+        """
+        balance = self.account_ledger.get_balance(player_xuid)
+        if balance is None:
+            return None
+
+        positions = self._load_positions(player_xuid)
+        held = [stock_name for stock_name, share, _, _ in positions if share > 0]
+
+        prices = self.valuation_engine.get_observed_prices(held)
+        missing = [stock_name for stock_name in held if stock_name not in prices]
+        if missing:
+            fetched = self.get_stock_prices_func(missing)
+            prices.update({stock_name: price for stock_name, price in fetched.items() if price})
+
+        price_key = tuple(sorted(prices.items()))
+        with self._lock:
+            cached = self._results.get(player_xuid)
+        if cached is not None and cached[0] == balance and cached[1] == price_key:
+            return cached[2]
+
+        result = self._value(player_xuid, to_micro(balance), positions, prices)
+        with self._lock:
+            # 期间发生交易时持仓已失效，不缓存旧持仓算出的结果
+            if self._positions.get(player_xuid) is positions:
+                self._results[player_xuid] = (balance, price_key, result)
+        return result
+
+    def invalidate(self, player_xuid: str) -> None:
+        """玩家交易后清除缓存的持仓和估值"""
+        with self._lock:
+            self._positions.pop(player_xuid, None)
+            self._results.pop(player_xuid, None)
+            self._generations[player_xuid] = self._generations.get(player_xuid, 0) + 1
+
+    def evict(self, player_xuid: str) -> None:
+        """玩家下线时释放缓存"""
+        self.invalidate(player_xuid)
+
+    def _load_positions(self, player_xuid: str) -> list:
+        with self._lock:
+            positions = self._positions.get(player_xuid)
+            generation = self._generations.get(player_xuid, 0)
+        if positions is not None:
+            return positions
+
+        positions = [
+            (row['stock_name'], max(row['share'], 0), row['total_buy'], row['total_sell'])
+            for row in self.database_manager.query_all(
+                "SELECT stock_name, share, total_buy, total_sell FROM tb_player_position WHERE player_xuid = ?",
+                (player_xuid,)
+            )
+        ]
+        with self._lock:
+            # 查询期间发生了交易，查询结果可能是交易前的持仓，本次使用但不缓存
+            if self._generations.get(player_xuid, 0) != generation:
+                return positions
+            return self._positions.setdefault(player_xuid, positions)
+
+    @staticmethod
+    def _value(player_xuid: str, balance: int, positions: list, prices: Dict) -> Dict:
+        """与估值引擎相同的公式，整数微单位计算"""
+        holdings_value = 0
+        total_buy = 0
+        total_sell = 0
+        for stock_name, share, position_buy, position_sell in positions:
+            price = prices.get(stock_name)
+            if share and price:
+                holdings_value += share * to_micro(price)
+            total_buy += position_buy
+            total_sell += position_sell
+
+        # 当前盈利 = 持仓市值 - 所有购买股票的成本 + 所有出售股票的收入
+        absolute_profit_loss = holdings_value - total_buy + total_sell
+        relative_profit_loss = absolute_profit_loss / total_buy * 100 if total_buy else 0.0
+
+        return {
+            'player_xuid': player_xuid,
+            'total_wealth': from_micro(holdings_value + balance),
+            'holdings_value': from_micro(holdings_value),
+            'balance': from_micro(balance),
+            'total_buy': from_micro(total_buy),
+            'total_sell': from_micro(total_sell),
+            'absolute_profit_loss': from_micro(absolute_profit_loss),
+            'relative_profit_loss': relative_profit_loss
+        }
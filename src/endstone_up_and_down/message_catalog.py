@@ -0,0 +1,72 @@
+"""
+多语言消息目录 - 每种语言一个消息文件，第一次使用该语言时加载并编译为格式化模板
+"""
+import json
+import string
+import threading
+from typing import Dict, List, Optional
+
+from .tutorial_content import DEFAULT_LOCALE, LOCALES_DIR
+
+
+class MessageTemplate:
+    """编译后的消息：没有参数的消息直接返回原文，有参数的使用 str.format"""
+    __slots__ = ("text", "fields")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.fields = frozenset(name for _, name, _, _ in string.Formatter().parse(text) if name)
+
+    def format(self, params: Dict) -> str:
+        if not self.fields:
+            return self.text
+        return self.text.format(**params)
+
+
+class MessageCatalog:
+    def __init__(self, default_locale: str = DEFAULT_LOCALE):
+        """
+        初始化消息目录，启动时只加载默认语言，其他语言在第一次使用时加载
+        :param default_locale: 默认语言，其他语言缺少的消息从默认语言取
+        """
+        self.default_locale = default_locale
+        # 语言 -> {消息键: 模板}
+        self._catalogs: Dict[str, Dict[str, MessageTemplate]] = {}
+        self._lock = threading.Lock()
+        self._get_catalog(default_locale)
+
+    def format(self, locale: Optional[str], key: str, **params) -> str:
+        """
+        获取指定语言的消息并填入参数
+        :param locale: 语言，为空或不支持时使用默认语言
+        :param key: 消息键
+        :param params: 消息参数
+        :return: 消息文本
+        """
+        template = self._get_catalog(locale or self.default_locale).get(key)
+        if template is None:
+            template = self._get_catalog(self.default_locale)[key]
+        return template.format(params)
+
+    def available_locales(self) -> List[str]:
+        """获取所有提供了消息文件的语言"""
+        return sorted(path.parent.name for path in LOCALES_DIR.glob("*/messages.json"))
+
+    def _get_catalog(self, locale: str) -> Dict[str, MessageTemplate]:
+        catalog = self._catalogs.get(locale)
+        if catalog is not None:
+            return catalog
+
+        with self._lock:
+            if locale not in self._catalogs:
+                path = LOCALES_DIR / locale / "messages.json"
+                if path.exists():
+                    with path.open("r", encoding="utf-8") as f:
+                        self._catalogs[locale] = {
+                            key: MessageTemplate("\n".join(text) if isinstance(text, list) else text)
+                            for key, text in json.load(f).items()
+                        }
+                else:
+                    # 不支持的语言直接使用默认语言的目录，不重复加载
+                    self._catalogs[locale] = self._catalogs.get(self.default_locale, {})
+            return self._catalogs[locale]
@@ -0,0 +1,51 @@
+"""
+金额定点数工具 - 金额统一以百万分之一为单位的整数存储和运算
+"""
+from decimal import Decimal, ROUND_HALF_EVEN
+from typing import Optional
+
+# 1 元 = 1,000,000 微单位
+MICRO = 1_000_000
+_MICRO_DECIMAL = Decimal(MICRO)
+
+
+def to_micro(amount) -> Optional[int]:
+    """
+    将金额转换为整数微单位
+    :param amount: Decimal、int（整元）、float 或数字字符串
+    :return: 微单位整数，输入为None时返回None
+    """
+    if amount is None:
+        return None
+    if isinstance(amount, int):
+        return amount * MICRO
+    if not isinstance(amount, Decimal):
+        amount = Decimal(str(amount))
+    return int((amount * _MICRO_DECIMAL).to_integral_value(rounding=ROUND_HALF_EVEN))
+
+
+def from_micro(micro: Optional[int]) -> Optional[Decimal]:
+    """
+    将整数微单位转换为 Decimal 金额（用于显示和与用户输入比较）
+    :param micro: 微单位整数
+    :return: Decimal 金额，输入为None时返回None
+    """
+    if micro is None:
+        return None
+    return Decimal(micro).scaleb(-6)
+
+
+def prorate(micro: int, part: int, whole: int) -> int:
+    """
+    按比例拆分金额：micro * part / whole，四舍六入五成双
+    :param micro: 微单位金额
+    :param part: 部分数量
+    :param whole: 总数量
+    """
+    if whole == 0:
+        return 0
+    quotient, remainder = divmod(micro * part, whole)
+    # 余数超过一半进位，恰好一半时向偶数舍入
+    if remainder * 2 > whole or (remainder * 2 == whole and quotient % 2 == 1):
+        quotient += 1
+    return quotient
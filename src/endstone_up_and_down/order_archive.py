@@ -0,0 +1,216 @@
+"""
+订单归档管理器 - 将较早的已完成订单按月移入归档表，热表只保留近期订单
+"""
+import time
+from typing import Dict, List, Optional
+
+from .databaseManager import DatabaseManager
+
+
+class OrderArchiveManager:
+    # 归档表名前缀，后接年月，例如 tb_player_order_archive_202401
+    TABLE_PREFIX = "tb_player_order_archive_"
+
+    def __init__(self, database_manager: DatabaseManager, order_fields: Dict[str, str]):
+        """
+        初始化订单归档管理器
+        :param database_manager: 数据库管理器实例
+        :param order_fields: tb_player_order 的字段定义，归档表使用相同结构
+        """
+        self.database_manager = database_manager
+        # 归档表保留原订单号，不再自增
+        self.order_fields = {
+            name: ("INTEGER PRIMARY KEY" if name == "id" else definition)
+            for name, definition in order_fields.items()
+        }
+        self.columns = list(self.order_fields)
+        self._init_archive_tables()
+
+    def _init_archive_tables(self) -> None:
+        """创建归档分区登记表和按玩家、月份汇总的归档订单统计表"""
+        self.database_manager.create_table("tb_order_archive", {
+            "table_name": "TEXT PRIMARY KEY",
+            "month": "TEXT NOT NULL",
+            "min_id": "INTEGER NOT NULL",
+            "max_id": "INTEGER NOT NULL",
+            "order_count": "INTEGER NOT NULL DEFAULT 0",
+            "archived_time": "REAL"
+        })
+
+        # 金额为整数微单位，与 tb_player_order 相同
+        self.database_manager.create_table("tb_order_archive_summary", {
+            "id": "INTEGER PRIMARY KEY AUTOINCREMENT",
+            "player_xuid": "TEXT NOT NULL",
+            "month": "TEXT NOT NULL",
+            "order_count": "INTEGER NOT NULL DEFAULT 0",
+            "buy_share": "INTEGER NOT NULL DEFAULT 0",
+            "sell_share": "INTEGER NOT NULL DEFAULT 0",
+            "buy_total": "INTEGER NOT NULL DEFAULT 0",
+            "sell_total": "INTEGER NOT NULL DEFAULT 0",
+            "tax_total": "INTEGER NOT NULL DEFAULT 0",
+            "UNIQUE": "(player_xuid, month)"
+        })
+
+    def archive_orders(self, horizon_days: int, batch_size: int = 1000) -> int:
+        """
+        将完成时间早于 horizon_days 天前的订单移入对应月份的归档表
+        每批在一个事务内完成复制、汇总和删除，避免长时间占用数据库
+        :param horizon_days: 热表保留的天数
+        :param batch_size: 每批归档的订单数量
+        :return: 归档的订单数量
+        """
+        cutoff = time.time() - horizon_days * 86400
+        column_list = ", ".join(self.columns)
+        placeholders = ", ".join("?" for _ in self.columns)
+        archived = 0
+
+        while True:
+            orders = self.database_manager.query_all(
+                f"""
+                SELECT {column_list} FROM tb_player_order
+                WHERE total IS NOT NULL AND finish_time < ?
+                ORDER BY id ASC LIMIT ?
+                """,
+                (cutoff, batch_size)
+            )
+            if not orders:
+                break
+
+            orders_by_month: Dict[str, List[Dict]] = {}
+            for order in orders:
+                month = time.strftime("%Y%m", time.localtime(order["finish_time"]))
+                orders_by_month.setdefault(month, []).append(order)
+
+            # 建表语句不能放在事务中间，先建好本批需要的分区
+            for month in orders_by_month:
+                self._ensure_partition(month)
+
+            with self.database_manager.transaction() as conn:
+                for month, month_orders in orders_by_month.items():
+                    table = self.TABLE_PREFIX + month
+                    conn.executemany(
+                        f"INSERT OR REPLACE INTO {table} ({column_list}) VALUES ({placeholders})",
+                        [tuple(order[column] for column in self.columns) for order in month_orders]
+                    )
+                    conn.executemany(
+                        """
+                        INSERT INTO tb_order_archive_summary (player_xuid, month, order_count, buy_share, sell_share,
+                                                              buy_total, sell_total, tax_total)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                        ON CONFLICT(player_xuid, month) DO UPDATE SET
+                            order_count = order_count + excluded.order_count,
+                            buy_share = buy_share + excluded.buy_share,
+                            sell_share = sell_share + excluded.sell_share,
+                            buy_total = buy_total + excluded.buy_total,
+                            sell_total = sell_total + excluded.sell_total,
+                            tax_total = tax_total + excluded.tax_total
+                        """,
+                        self._summarize(month, month_orders)
+                    )
+                    ids = [order["id"] for order in month_orders]
+                    conn.execute(
+                        """
+                        INSERT INTO tb_order_archive (table_name, month, min_id, max_id, order_count, archived_time)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                        ON CONFLICT(table_name) DO UPDATE SET
+                            min_id = MIN(min_id, excluded.min_id),
+                            max_id = MAX(max_id, excluded.max_id),
+                            order_count = order_count + excluded.order_count,
+                            archived_time = excluded.archived_time
+                        """,
+                        (table, month, min(ids), max(ids), len(ids), time.time())
+                    )
+
+                conn.executemany(
+                    "DELETE FROM tb_player_order WHERE id = ?",
+                    [(order["id"],) for order in orders]
+                )
+
+            archived += len(orders)
+
+        return archived
+
+    def get_orders(self, player_xuid: str, before_id: Optional[int], limit: int) -> List[Dict]:
+        """
+        从归档分区中按游标读取玩家订单（从新到旧），只访问需要的分区
+        :param player_xuid: 玩家XUID
+        :param before_id: 游标，只返回 id 小于该值的订单，为空表示不限
+        :param limit: 最多返回的数量
+        :return: 订单列表
+        """
+        if limit <= 0:
+            return []
+        if before_id is None:
+            before_id = (1 << 63) - 1
+
+        orders = []
+        for partition in self.get_partitions():
+            if partition["min_id"] >= before_id:
+                continue
+            # 已经凑满一页，且之后的分区订单号都更小，不需要继续读取
+            if len(orders) >= limit and partition["max_id"] < orders[limit - 1]["id"]:
+                break
+
+            orders.extend(self.database_manager.query_all(
+                f"""
+                SELECT * FROM {partition['table_name']}
+                WHERE player_xuid = ? AND id < ?
+                ORDER BY id DESC LIMIT ?
+                """,
+                (player_xuid, before_id, limit)
+            ))
+            orders.sort(key=lambda order: order["id"], reverse=True)
+
+        return orders[:limit]
+
+    def has_orders(self, player_xuid: str) -> bool:
+        """
+        玩家是否有已归档的订单（按汇总表判断，不访问归档分区）
+        :param player_xuid: 玩家XUID
+        :return: 是否有已归档的订单
+        """
+        return self.database_manager.query_one(
+            "SELECT 1 FROM tb_order_archive_summary WHERE player_xuid = ? LIMIT 1",
+            (player_xuid,)
+        ) is not None
+
+    def get_partitions(self) -> List[Dict]:
+        """获取所有归档分区，按最大订单号从大到小排列"""
+        return self.database_manager.query_all(
+            "SELECT * FROM tb_order_archive ORDER BY max_id DESC"
+        )
+
+    def get_summary(self, player_xuid: str) -> List[Dict]:
+        """
+        获取玩家已归档订单的按月汇总
+        :param player_xuid: 玩家XUID
+        :return: 按月份从新到旧排列的汇总列表
+        """
+        return self.database_manager.query_all(
+            "SELECT * FROM tb_order_archive_summary WHERE player_xuid = ? ORDER BY month DESC",
+            (player_xuid,)
+        )
+
+    def _ensure_partition(self, month: str) -> None:
+        table = self.TABLE_PREFIX + month
+        self.database_manager.create_table(table, self.order_fields)
+        self.database_manager.execute(
+            f"CREATE INDEX IF NOT EXISTS idx_{table}_player ON {table} (player_xuid, id)"
+        )
+
+    @staticmethod
+    def _summarize(month: str, orders: List[Dict]) -> List[tuple]:
+        """按玩家汇总一个月的订单"""
+        summary: Dict[str, List[int]] = {}
+        for order in orders:
+            totals = summary.setdefault(order["player_xuid"], [0, 0, 0, 0, 0, 0])
+            totals[0] += 1
+            if order["type"] in ("buy_flex", "buy_fix"):
+                totals[1] += order["share"]
+                totals[3] += order["total"]
+            else:
+                totals[2] += order["share"]
+                totals[4] += order["total"]
+            totals[5] += order["tax"] or 0
+
+        return [(player_xuid, month, *totals) for player_xuid, totals in summary.items()]
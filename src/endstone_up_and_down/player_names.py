@@ -0,0 +1,88 @@
+"""
+玩家名称缓存 - 玩家进服时记录名称，排行榜按批解析，渲染时不再逐行调用 arc_core
+"""
+import threading
+import time
+from typing import Dict, Iterable, Tuple
+
+
+class PlayerNameCache:
+    def __init__(self, plugin, ttl: float = 3600):
+        """
+        初始化玩家名称缓存
+        :param plugin: 插件实例，用于获取 arc_core 插件
+        :param ttl: 名称缓存有效期（秒），过期后重新解析，以便获取改名后的名称
+        """
+        self.plugin = plugin
+        self.ttl = ttl
+        # 玩家XUID -> (名称, 过期时间)
+        self._names: Dict[str, Tuple[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def remember(self, player_xuid: str, name: str) -> None:
+        """
+        记录玩家名称（玩家进服时调用）
+        :param player_xuid: 玩家XUID
+        :param name: 玩家名称
+        """
+        if not name:
+            return
+        with self._lock:
+            self._names[player_xuid] = (name, time.time() + self.ttl)
+
+    def get_name(self, player_xuid: str) -> str:
+        """
+        获取单个玩家名称
+        :param player_xuid: 玩家XUID
+        :return: 玩家名称，如果获取不到则返回XUID前8位
+        """
+        return self.get_names([player_xuid])[player_xuid]
+
+    def get_names(self, player_xuids: Iterable[str]) -> Dict[str, str]:
+        """
+        批量获取玩家名称，缓存中没有或已过期的一次性解析
+        :param player_xuids: 玩家XUID列表
+        :return: {玩家XUID: 名称}，获取不到的为XUID前8位
+        """
+        player_xuids = list(player_xuids)
+        now = time.time()
+        names = {}
+        missing = []
+        with self._lock:
+            for player_xuid in player_xuids:
+                cached = self._names.get(player_xuid)
+                if cached and cached[1] > now:
+                    names[player_xuid] = cached[0]
+                else:
+                    missing.append(player_xuid)
+
+        if missing:
+            names.update(self._resolve(missing))
+
+        return {player_xuid: names[player_xuid] for player_xuid in player_xuids}
+
+    def _resolve(self, player_xuids) -> Dict[str, str]:
+        """
+        使用arc_core插件解析玩家名称并写入缓存
+        获取失败时使用XUID的前8位作为标识，同样缓存到过期，避免每次渲染都重新调用 arc_core
+        """
+        player_xuids = list(dict.fromkeys(player_xuids))
+        resolved = {}
+        try:
+            arc_core = self.plugin.server.plugin_manager.get_plugin('arc_core')
+            if arc_core:
+                for player_xuid in player_xuids:
+                    player_name = arc_core.get_player_name_by_xuid(player_xuid)
+                    if player_name:
+                        resolved[player_xuid] = player_name
+        except Exception as e:
+            print(f"获取玩家名称失败: {str(e)}")
+
+        for player_xuid in player_xuids:
+            resolved.setdefault(player_xuid, f"玩家{player_xuid[:8]}")
+
+        expires = time.time() + self.ttl
+        with self._lock:
+            for player_xuid, player_name in resolved.items():
+                self._names[player_xuid] = (player_name, expires)
+        return resolved
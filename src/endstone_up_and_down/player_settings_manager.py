@@ -1,10 +1,44 @@
 """
 玩家个人设置管理器
 """
+import threading
 from typing import Dict, Optional
 from .databaseManager import DatabaseManager
 
 
+class ColorPalette:
+    """解析后的涨跌配色，渲染面板时整面板共用一个"""
+    __slots__ = ("scheme", "up", "down", "flat")
+
+    def __init__(self, scheme: str, up: str, down: str, flat: str = "§7"):
+        object.__setattr__(self, "scheme", scheme)
+        object.__setattr__(self, "up", up)
+        object.__setattr__(self, "down", down)
+        object.__setattr__(self, "flat", flat)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ColorPalette is immutable")
+
+    def for_change(self, change) -> str:
+        """
+        根据涨跌值获取颜色代码
+        :param change: 涨跌值（正数为涨，负数为跌）
+        :return: Minecraft 颜色代码
+        """
+        if change > 0:
+            return self.up
+        elif change < 0:
+            return self.down
+        return self.flat
+
+
+# 配色方案 -> 配色，只有两种方案，所有玩家共用
+PALETTES = {
+    'red_up': ColorPalette('red_up', up="§c", down="§a"),
+    'green_up': ColorPalette('green_up', up="§a", down="§c"),
+}
+
+
 class PlayerSettingsManager:
     def __init__(self, database_manager: DatabaseManager):
         """
@@ -12,6 +46,9 @@ class PlayerSettingsManager:
         :param database_manager: 数据库管理器实例
         """
         self.database_manager = database_manager
+        # 玩家XUID -> {配色方案, 语言}，首次读取时从数据库加载，修改设置时失效
+        self._settings_cache: Dict[str, Dict] = {}
+        self._cache_lock = threading.Lock()
         self._init_settings_table()
     
     def _init_settings_table(self) -> None:
@@ -20,9 +57,39 @@ class PlayerSettingsManager:
             "id": "INTEGER PRIMARY KEY AUTOINCREMENT",
             "player_xuid": "TEXT NOT NULL UNIQUE",
             "color_scheme": "TEXT NOT NULL DEFAULT 'red_up'",  # 'red_up' 或 'green_up'
+            "locale": "TEXT",  # 为空时使用默认语言
             "created_time": "REAL NOT NULL",
             "updated_time": "REAL NOT NULL"
         })
+        
+        # 旧版本的设置表没有语言字段
+        columns = {column['name'] for column in self.database_manager.query_all("PRAGMA table_info(tb_player_settings)")}
+        if "locale" not in columns:
+            self.database_manager.execute("ALTER TABLE tb_player_settings ADD COLUMN locale TEXT")
+    
+    def _get_settings(self, player_xuid: str) -> Dict:
+        """读取缓存的玩家设置，第一次访问时从数据库加载"""
+        settings = self._settings_cache.get(player_xuid)
+        if settings is not None:
+            return settings
+        
+        setting = self.database_manager.query_one(
+            "SELECT color_scheme, locale FROM tb_player_settings WHERE player_xuid = ?",
+            (player_xuid,)
+        )
+        
+        settings = {
+            # 默认红涨绿跌（中国习惯）
+            "color_scheme": setting['color_scheme'] if setting else 'red_up',
+            "locale": setting['locale'] if setting else None
+        }
+        with self._cache_lock:
+            return self._settings_cache.setdefault(player_xuid, settings)
+    
+    def _invalidate(self, player_xuid: str) -> None:
+        """写入后再让缓存失效，写入期间读到旧值的缓存也会被清除"""
+        with self._cache_lock:
+            self._settings_cache.pop(player_xuid, None)
     
     def get_color_scheme(self, player_xuid: str) -> str:
         """
@@ -30,16 +97,51 @@ class PlayerSettingsManager:
         :param player_xuid: 玩家XUID
         :return: 'red_up' (红涨绿跌) 或 'green_up' (绿涨红跌)
         """
-        setting = self.database_manager.query_one(
-            "SELECT color_scheme FROM tb_player_settings WHERE player_xuid = ?",
-            (player_xuid,)
-        )
-        
-        if setting:
-            return setting['color_scheme']
+        return self._get_settings(player_xuid)['color_scheme']
+    
+    def get_palette(self, player_xuid: str) -> ColorPalette:
+        """
+        获取玩家的涨跌配色，渲染面板前获取一次，逐行调用 palette.for_change
+        :param player_xuid: 玩家XUID
+        :return: 配色
+        """
+        return PALETTES.get(self.get_color_scheme(player_xuid), PALETTES['red_up'])
+    
+    def get_locale(self, player_xuid: str) -> Optional[str]:
+        """
+        获取玩家选择的语言
+        :param player_xuid: 玩家XUID
+        :return: 语言，例如 zh_CN；没有选择过返回None
+        """
+        return self._get_settings(player_xuid)['locale']
+    
+    def set_locale(self, player_xuid: str, locale: str) -> bool:
+        """
+        设置玩家的语言
+        :param player_xuid: 玩家XUID
+        :param locale: 语言，例如 en_US
+        :return: 是否设置成功
+        """
+        import time
         
-        # 默认返回红涨绿跌（中国习惯）
-        return 'red_up'
+        current_time = time.time()
+        result = self.database_manager.upsert(
+            "tb_player_settings",
+            {
+                "player_xuid": player_xuid,
+                "locale": locale,
+                "created_time": current_time,
+                "updated_time": current_time
+            },
+            ("player_xuid",),
+            ("locale", "updated_time")
+        )
+        self._invalidate(player_xuid)
+        return result
+    
+    def evict(self, player_xuid: str) -> None:
+        """玩家下线时释放缓存"""
+        self._invalidate(player_xuid)
     
     def set_color_scheme(self, player_xuid: str, color_scheme: str) -> bool:
         """
@@ -63,7 +165,7 @@ class PlayerSettingsManager:
         
         if existing:
             # 更新现有设置
-            return self.database_manager.update(
+            result = self.database_manager.update(
                 "tb_player_settings",
                 {
                     "color_scheme": color_scheme,
@@ -74,12 +176,15 @@ class PlayerSettingsManager:
             )
         else:
             # 插入新设置
-            return self.database_manager.insert("tb_player_settings", {
+            result = self.database_manager.insert("tb_player_settings", {
                 "player_xuid": player_xuid,
                 "color_scheme": color_scheme,
                 "created_time": current_time,
                 "updated_time": current_time
             })
+        
+        self._invalidate(player_xuid)
+        return result
     
     def get_up_color(self, player_xuid: str) -> str:
         """
@@ -87,8 +192,7 @@ class PlayerSettingsManager:
         :param player_xuid: 玩家XUID
         :return: Minecraft 颜色代码
         """
-        scheme = self.get_color_scheme(player_xuid)
-        return "§c" if scheme == 'red_up' else "§a"
+        return self.get_palette(player_xuid).up
     
     def get_down_color(self, player_xuid: str) -> str:
         """
@@ -96,8 +200,7 @@ class PlayerSettingsManager:
         :param player_xuid: 玩家XUID
         :return: Minecraft 颜色代码
         """
-        scheme = self.get_color_scheme(player_xuid)
-        return "§a" if scheme == 'red_up' else "§c"
+        return self.get_palette(player_xuid).down
     
     def get_color_for_change(self, player_xuid: str, change: float) -> str:
         """
@@ -106,10 +209,5 @@ class PlayerSettingsManager:
         :param change: 涨跌值（正数为涨，负数为跌）
         :return: Minecraft 颜色代码
         """
-        if change > 0:
-            return self.get_up_color(player_xuid)
-        elif change < 0:
-            return self.get_down_color(player_xuid)
-        else:
-            return "§7"  # 平盘为灰色
+        return self.get_palette(player_xuid).for_change(change)
 
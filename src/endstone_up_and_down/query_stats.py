@@ -0,0 +1,237 @@
+"""
+SQL 执行统计 - 按归一化语句记录耗时分布、行数和锁等待时间，并记录慢查询的执行计划
+"""
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+
+# 耗时分布的分桶上限（毫秒），最后一个桶收集超过上限的记录
+LATENCY_BUCKETS_MS = (1, 5, 20, 100, 500)
+
+# 同一条慢查询的执行计划最多每隔这么多秒打印一次
+SLOW_LOG_INTERVAL = 60
+
+_WHITESPACE = re.compile(r"\s+")
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+# 归档分区等按名称区分的表，统计时合并为一条
+_PARTITION_SUFFIX = re.compile(r"(tb_player_order_archive_)\d+")
+
+
+def normalize_sql(sql: str) -> str:
+    """
+    归一化SQL语句：合并空白，将字面量和 IN (?, ?, ...) 替换为占位符
+    :param sql: SQL语句
+    :return: 归一化后的语句
+    """
+    sql = _WHITESPACE.sub(" ", sql).strip()
+    sql = _STRING_LITERAL.sub("?", sql)
+    sql = _PARTITION_SUFFIX.sub(r"\1*", sql)
+    sql = _NUMBER_LITERAL.sub("?", sql)
+    return _PLACEHOLDER_LIST.sub("IN (?...)", sql)
+
+
+class StatementStats:
+    """单条归一化语句的累计统计"""
+    __slots__ = ("sql", "count", "total_ms", "max_ms", "rows", "lock_wait_ms", "slow_count", "buckets",
+                 "last_plan", "last_slow_log")
+
+    def __init__(self, sql: str):
+        self.sql = sql
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.lock_wait_ms = 0.0
+        self.slow_count = 0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.last_plan: Optional[str] = None
+        self.last_slow_log = 0.0
+
+    def percentile(self, fraction: float) -> float:
+        """根据分桶估算耗时的百分位（返回所在桶的上限，毫秒）"""
+        target = self.count * fraction
+        seen = 0
+        for idx, bucket_count in enumerate(self.buckets):
+            seen += bucket_count
+            if seen >= target and bucket_count:
+                return LATENCY_BUCKETS_MS[idx] if idx < len(LATENCY_BUCKETS_MS) else self.max_ms
+        return self.max_ms
+
+
+class QueryStats:
+    def __init__(self, slow_threshold_ms: float = 100):
+        """
+        初始化SQL执行统计
+        :param slow_threshold_ms: 超过该耗时（毫秒）的语句记为慢查询
+        """
+        self.slow_threshold_ms = slow_threshold_ms
+        self.started = time.time()
+        self._stats: Dict[str, StatementStats] = {}
+        self._lock = threading.Lock()
+
+    def record(self, sql: str, elapsed_ms: float, lock_wait_ms: float = 0.0, rows: int = 0) -> StatementStats:
+        """
+        记录一次语句执行
+        :param sql: 原始SQL语句
+        :param elapsed_ms: 执行耗时（毫秒，含锁等待）
+        :param lock_wait_ms: 等待数据库锁的时间（毫秒）
+        :param rows: 影响的行数
+        :return: 该语句的统计
+        """
+        key = normalize_sql(sql)
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = StatementStats(key)
+
+            stats.count += 1
+            stats.total_ms += elapsed_ms
+            stats.max_ms = max(stats.max_ms, elapsed_ms)
+            stats.rows += max(rows, 0)
+            stats.lock_wait_ms += lock_wait_ms
+            if elapsed_ms >= self.slow_threshold_ms:
+                stats.slow_count += 1
+
+            for idx, upper in enumerate(LATENCY_BUCKETS_MS):
+                if elapsed_ms < upper:
+                    stats.buckets[idx] += 1
+                    break
+            else:
+                stats.buckets[-1] += 1
+
+        return stats
+
+    def should_log_slow(self, stats: StatementStats) -> bool:
+        """同一条语句的慢查询日志限频，避免刷屏"""
+        now = time.time()
+        with self._lock:
+            if now - stats.last_slow_log < SLOW_LOG_INTERVAL:
+                return False
+            stats.last_slow_log = now
+            return True
+
+    def top(self, limit: int = 10, order_by: str = "total_ms") -> List[StatementStats]:
+        """
+        获取累计耗时（或其他字段）最高的语句
+        :param limit: 数量
+        :param order_by: 排序字段：total_ms、max_ms、count、lock_wait_ms、slow_count
+        """
+        with self._lock:
+            stats = list(self._stats.values())
+        return sorted(stats, key=lambda item: getattr(item, order_by), reverse=True)[:limit]
+
+    def reset(self) -> None:
+        """清空统计"""
+        with self._lock:
+            self._stats.clear()
+            self.started = time.time()
+
+    def format_summary(self, limit: int = 10, order_by: str = "total_ms") -> str:
+        """生成用于管理员指令的统计摘要"""
+        lines = [f"§e=== SQL 统计 (最近 {(time.time() - self.started) / 60:.0f} 分钟, 按 {order_by} 排序) ==="]
+        for idx, stats in enumerate(self.top(limit, order_by), 1):
+            average = stats.total_ms / stats.count if stats.count else 0
+            lines.append(
+                f"§g#{idx}§r 次数 {stats.count} | 总计 {stats.total_ms:.0f}ms | 平均 {average:.2f}ms | "
+                f"p95≤{stats.percentile(0.95):.0f}ms | 最大 {stats.max_ms:.0f}ms | 行数 {stats.rows} | "
+                f"锁等待 {stats.lock_wait_ms:.0f}ms | 慢查询 {stats.slow_count}"
+            )
+            lines.append(f"§7  {stats.sql[:160]}")
+            if stats.last_plan:
+                lines.append(f"§7  计划: {stats.last_plan[:160]}")
+        return "\n".join(lines)
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """
+    记录每条语句耗时的数据库连接
+    连接本身不等待锁（timeout=0），遇到锁时在这里重试，从而把锁等待时间单独统计出来
+    事务内已有语句执行成功后（连接可能持有读锁），之后的语句遇到锁不重试（COMMIT 除外）：
+    另一个连接提交时正在等这个读锁释放，重试只会互相等到超时，直接抛出让事务回滚
+    """
+    query_stats: QueryStats = None
+    busy_timeout = 5.0
+    # 当前事务内是否已有语句执行成功
+    _holds_lock = False
+
+    def execute(self, sql, parameters=()):
+        return self._run(sql, parameters, super().execute)
+
+    def executemany(self, sql, seq_of_parameters):
+        # 遇到锁需要重试时参数要能再遍历一次
+        seq_of_parameters = list(seq_of_parameters)
+        return self._run(sql, None, lambda s, _: super(InstrumentedConnection, self).executemany(s, seq_of_parameters))
+
+    def query(self, sql, parameters, fetch):
+        """
+        执行查询并读取结果，耗时包含读取结果的时间
+        :param fetch: 读取结果的函数，参数为游标
+        """
+        return self._run(sql, parameters, lambda s, p: fetch(super(InstrumentedConnection, self).execute(s, p)))
+
+    def commit(self):
+        self._run("COMMIT", None, lambda s, _: super(InstrumentedConnection, self).commit())
+
+    def rollback(self):
+        super().rollback()
+        self._holds_lock = False
+
+    def _run(self, sql, parameters, runner):
+        start = time.perf_counter()
+        lock_wait = 0.0
+        delay = 0.001
+
+        while True:
+            try:
+                result = runner(sql, parameters)
+                break
+            except sqlite3.OperationalError as e:
+                message = str(e)
+                waited = time.perf_counter() - start
+                if ("locked" not in message and "busy" not in message) or waited >= self.busy_timeout:
+                    raise
+                if self._holds_lock and self.in_transaction and sql != "COMMIT":
+                    raise
+                time.sleep(delay)
+                lock_wait += delay
+                delay = min(delay * 2, 0.05)
+
+        # 延迟事务的 BEGIN 不取得任何锁
+        self._holds_lock = self.in_transaction and sql != "BEGIN"
+
+        if self.query_stats is not None:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            if isinstance(result, sqlite3.Cursor):
+                rows = result.rowcount
+            elif isinstance(result, list):
+                rows = len(result)
+            else:
+                rows = int(result is not None)
+            stats = self.query_stats.record(sql, elapsed_ms, lock_wait * 1000, rows)
+            if elapsed_ms >= self.query_stats.slow_threshold_ms:
+                self._log_slow(sql, parameters, elapsed_ms, stats)
+
+        return result
+
+    def _log_slow(self, sql, parameters, elapsed_ms, stats):
+        """打印慢查询及其执行计划"""
+        if not self.query_stats.should_log_slow(stats):
+            return
+
+        plan = None
+        if parameters is not None and sql.lstrip().split(None, 1)[0].upper() in ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH"):
+            try:
+                rows = super().execute(f"EXPLAIN QUERY PLAN {sql}", parameters).fetchall()
+                plan = "; ".join(row[3] for row in rows)
+                stats.last_plan = plan
+            except sqlite3.Error:
+                pass
+
+        print(f"[UpAndDown] 慢查询 {elapsed_ms:.1f}ms: {stats.sql}")
+        if plan:
+            print(f"[UpAndDown]   执行计划: {plan}")
@@ -2,11 +2,77 @@
 股票插件配置管理器
 """
 import os
+import threading
+from decimal import Decimal
 from pathlib import Path
+from types import MappingProxyType
+from typing import Callable, Dict, Mapping
+
+
+def _parse_bool(value: str) -> bool:
+    if value.lower() not in ("true", "false"):
+        raise ValueError(value)
+    return value.lower() == "true"
+
+
+def _int_at_least(minimum: int) -> Callable[[str], int]:
+    def parse(value: str) -> int:
+        return max(int(value), minimum)
+    return parse
+
+
+# 配置项: (解析函数, 默认值)，配置文件中缺失、为空或无法解析时使用默认值
+SETTING_FIELDS = {
+    "proxy": (str, ""),
+    "enable_proxy": (_parse_bool, True),
+    "update_interval": (int, 60),
+    "trading_fee_rate": (float, 1.0),
+    "leaderboard_incremental_interval": (int, 60),
+    "leaderboard_price_threshold": (float, 0.5),
+    "leaderboard_use_process": (_parse_bool, False),
+    "ledger_flush_interval_ms": (_int_at_least(10), 200),
+    "order_archive_days": (_int_at_least(0), 0),
+    "slow_query_threshold_ms": (float, 100.0),
+    "backup_interval_minutes": (_int_at_least(0), 0),
+    "backup_keep": (_int_at_least(1), 24),
+}
+
+
+class StockSettings:
+    """
+    解析并校验后的配置快照，创建后不可修改
+    配置文件变化时构建新快照并整体替换，交易等热路径只读取属性
+    """
+    __slots__ = tuple(SETTING_FIELDS) + ("trading_fee_ratio", "raw")
+
+    def __init__(self, values: Mapping[str, str]):
+        """
+        :param values: 配置文件中的原始键值
+        """
+        for key, (parse, default) in SETTING_FIELDS.items():
+            value = values.get(key, "")
+            if value:
+                try:
+                    parsed = parse(value)
+                except ValueError:
+                    print(f"[UpAndDown] 配置项 {key}={value} 无效，使用默认值 {default}")
+                    parsed = default
+            else:
+                parsed = default
+            object.__setattr__(self, key, parsed)
+
+        # 交易时直接使用的手续费比例，例如 1.0% -> Decimal('0.01')
+        object.__setattr__(self, "trading_fee_ratio", Decimal(str(self.trading_fee_rate)) / 100)
+        # 未定义字段的配置项保留原始字符串，供 get_setting 读取
+        object.__setattr__(self, "raw", MappingProxyType(dict(values)))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("StockSettings is immutable")
 
 
 class StockSettingManager:
-    setting_dict = {}  # 类变量存储所有配置
+    # 检查配置文件是否被修改的间隔（秒）
+    WATCH_INTERVAL = 2.0
     
     def __init__(self, main_path: str):
         """
@@ -14,10 +80,13 @@ class StockSettingManager:
         :param main_path: 插件主目录路径
         """
         self.setting_file_path = Path(main_path) / "stock_setting.yml"
-        self._load_setting_file()
+        self._file_stamp = None
+        self._stop_event = threading.Event()
+        self._watch_thread = None
+        self.settings = self._load_setting_file()
     
-    def _load_setting_file(self):
-        """加载配置文件"""
+    def _load_setting_file(self) -> StockSettings:
+        """加载并解析配置文件"""
         # 创建配置目录（如果不存在）
         self.setting_file_path.parent.mkdir(parents=True, exist_ok=True)
         
@@ -26,13 +95,23 @@ class StockSettingManager:
             # 创建默认配置
             self._create_default_config()
         
-        # 加载配置文件内容
-        with self.setting_file_path.open("r", encoding="utf-8") as f:
+        self._file_stamp = self._stamp()
+        return StockSettings(self._read_values())
+    
+    def _read_values(self) -> Dict[str, str]:
+        """读取配置文件中的原始键值"""
+        values = {}
+        with self.setting_file_path.open("r", encoding="utf-8-sig") as f:
             for line in f:
                 line = line.strip()
                 if line and "=" in line and not line.startswith("#"):
                     key, value = line.split("=", 1)
-                    StockSettingManager.setting_dict[key.strip()] = value.strip()
+                    values[key.strip()] = value.strip()
+        return values
+    
+    def _stamp(self):
+        stat = os.stat(self.setting_file_path)
+        return stat.st_mtime_ns, stat.st_size
     
     def _create_default_config(self):
         """创建默认配置文件"""
@@ -57,56 +136,128 @@ update_interval=60
 # 交易手续费率（百分比，例如：2.0 表示2%）
 # Trading fee rate (percentage, e.g.: 2.0 means 2%)
 trading_fee_rate=1.0
+
+# 排行榜增量更新间隔（秒），0 表示只进行每30分钟一次的全量更新
+# 默认开启：只重新估值价格变动或有交易的玩家，结果只更新内存中的排行榜，不写数据库
+# Leaderboard incremental update interval (seconds), 0 disables incremental updates
+# On by default: only players whose holdings moved or who traded are revalued, and only the in-memory leaderboard is updated
+leaderboard_incremental_interval=60
+
+# 股票价格变动超过该百分比时重新估值持有者
+# Revalue holders when a stock price moves more than this percentage
+leaderboard_price_threshold=0.5
+
+# 是否在独立进程中计算排行榜，避免与服务器争用GIL（true/false）
+# Compute the leaderboard in a separate process to keep it off the server's GIL (true/false)
+leaderboard_use_process=false
+
+# 账户余额日志批量写入数据库的间隔（毫秒）
+# Interval for group-committing the balance journal to the database (milliseconds)
+ledger_flush_interval_ms=200
+
+# 完成超过该天数的订单移入按月归档的表，0 表示不归档（默认），例如 180
+# Finished orders older than this many days are moved into monthly archive tables, 0 disables archiving (default), e.g. 180
+order_archive_days=0
+
+# 慢查询阈值（毫秒），超过时在控制台打印语句和执行计划
+# Slow query threshold (milliseconds), slower statements are logged with their query plan
+slow_query_threshold_ms=100
+
+# 数据库在线备份间隔（分钟），0 表示不自动备份（默认），例如 60
+# Online database backup interval (minutes), 0 disables scheduled backups (default), e.g. 60
+backup_interval_minutes=0
+
+# 保留的备份数量
+# Number of backups to keep
+backup_keep=24
 """
         with self.setting_file_path.open("w", encoding="utf-8") as f:
             f.write(default_config)
+    
+    def reload(self) -> bool:
+        """
+        配置文件有变化时重新解析，并整体替换当前配置
+        :return: 是否重新加载
+        """
+        try:
+            stamp = self._stamp()
+            if stamp == self._file_stamp:
+                return False
+            settings = StockSettings(self._read_values())
+        except OSError as e:
+            print(f"[UpAndDown] 读取配置文件失败: {str(e)}")
+            return False
         
-        # 同时加载默认值到内存
-        StockSettingManager.setting_dict["proxy"] = "127.0.0.1:5555"
-        StockSettingManager.setting_dict["enable_proxy"] = "false"
-        StockSettingManager.setting_dict["update_interval"] = "60"
-        StockSettingManager.setting_dict["trading_fee_rate"] = "2.0"
+        self._file_stamp = stamp
+        # 单次赋值，读取方看到的总是完整的旧配置或新配置
+        self.settings = settings
+        print("[UpAndDown] 配置文件已重新加载")
+        return True
+    
+    def start_watching(self) -> None:
+        """启动后台线程监视配置文件的修改"""
+        if self._watch_thread is not None:
+            return
+        self._stop_event.clear()
+        self._watch_thread = threading.Thread(target=self._watch_loop, daemon=True)
+        self._watch_thread.start()
+    
+    def stop_watching(self) -> None:
+        """停止监视配置文件（插件卸载时调用）"""
+        self._stop_event.set()
+        if self._watch_thread is not None:
+            self._watch_thread.join(timeout=5)
+            self._watch_thread = None
+    
+    def _watch_loop(self):
+        while not self._stop_event.wait(self.WATCH_INTERVAL):
+            try:
+                self.reload()
+            except Exception as e:
+                import traceback
+                print(f"重新加载配置文件失败: {str(e)}")
+                print(traceback.format_exc())
     
     def get_setting(self, key: str, default_value: str = None):
         """
-        获取配置项
+        获取配置项的原始字符串（不会修改配置文件）
         :param key: 配置键
         :param default_value: 默认值
         :return: 配置值
         """
-        # 如果配置项不存在，添加它
-        if key not in StockSettingManager.setting_dict:
-            with self.setting_file_path.open("a", encoding="utf-8") as f:
-                f.write(f"\n{key}=")
-            StockSettingManager.setting_dict[key] = ""
-        
-        value = StockSettingManager.setting_dict[key]
+        value = self.settings.raw.get(key)
         return default_value if not value else value
     
     def set_setting(self, key: str, value: str):
         """
-        设置配置项
+        设置配置项，保留配置文件中的注释和其他配置项
         :param key: 配置键
         :param value: 配置值
         """
-        # 更新内存中的配置
-        StockSettingManager.setting_dict[key] = str(value)
+        with self.setting_file_path.open("r", encoding="utf-8-sig") as f:
+            lines = f.read().splitlines()
+        
+        for idx, line in enumerate(lines):
+            stripped = line.strip()
+            if not stripped.startswith("#") and "=" in stripped and stripped.split("=", 1)[0].strip() == key:
+                lines[idx] = f"{key}={value}"
+                break
+        else:
+            lines.append(f"{key}={value}")
         
-        # 重写整个文件
         with self.setting_file_path.open("w", encoding="utf-8") as f:
-            for k, v in StockSettingManager.setting_dict.items():
-                f.write(f"{k}={v}\n")
+            f.write("\n".join(lines) + "\n")
+        
+        self.reload()
     
     def get_proxy_config(self):
         """
         获取代理配置
         :return: (是否启用代理, 代理地址) 或 (False, None)
         """
-        enable_proxy = self.get_setting("enable_proxy", "true").lower() == "true"
-        proxy = self.get_setting("proxy", "")
-        
-        if enable_proxy and proxy:
-            return True, proxy
+        settings = self.settings
+        if settings.enable_proxy and settings.proxy:
+            return True, settings.proxy
         return False, None
     
     def get_update_interval(self):
@@ -114,18 +265,67 @@ trading_fee_rate=1.0
         获取更新间隔（秒）
         :return: 更新间隔
         """
-        try:
-            return int(self.get_setting("update_interval", "60"))
-        except ValueError:
-            return 60
+        return self.settings.update_interval
     
     def get_trading_fee_rate(self):
         """
         获取交易手续费率（百分比）
         :return: 手续费率，例如 2.0 表示 2%
         """
-        try:
-            return float(self.get_setting("trading_fee_rate", "1.0"))
-        except ValueError:
-            return 1.0
+        return self.settings.trading_fee_rate
+
+    def get_leaderboard_incremental_interval(self):
+        """
+        获取排行榜增量更新间隔（秒）
+        :return: 更新间隔，0 表示不进行增量更新
+        """
+        return self.settings.leaderboard_incremental_interval
+
+    def get_leaderboard_price_threshold(self):
+        """
+        获取触发重新估值的价格变动百分比
+        :return: 百分比，例如 0.5 表示 0.5%
+        """
+        return self.settings.leaderboard_price_threshold
+
+    def get_leaderboard_use_process(self):
+        """
+        是否在独立进程中计算排行榜
+        :return: True/False
+        """
+        return self.settings.leaderboard_use_process
 
+    def get_ledger_flush_interval_ms(self):
+        """
+        获取账户余额日志批量写入数据库的间隔（毫秒）
+        :return: 间隔毫秒数
+        """
+        return self.settings.ledger_flush_interval_ms
+
+    def get_order_archive_days(self):
+        """
+        获取订单归档的天数
+        :return: 天数，0 表示不归档
+        """
+        return self.settings.order_archive_days
+
+    def get_slow_query_threshold_ms(self):
+        """
+        获取慢查询阈值（毫秒）
+        :return: 阈值
+        """
+        return self.settings.slow_query_threshold_ms
+
+    def get_backup_interval_minutes(self):
+        """
+        获取数据库备份间隔（分钟）
+        :return: 间隔，0 表示不自动备份
+        """
+        return self.settings.backup_interval_minutes
+
+    def get_backup_keep(self):
+        """
+        获取保留的备份数量
+        :return: 数量
+        """
+        return self.settings.backup_keep
@@ -2,6 +2,8 @@ import time
 from decimal import *
 
 from endstone_up_and_down.databaseManager import DatabaseManager
+from endstone_up_and_down.money import to_micro, from_micro, prorate
+from endstone_up_and_down.order_archive import OrderArchiveManager
 
 class StockDao:
     def __init__(self, database_manager):
@@ -17,26 +19,41 @@ class StockDao:
             "share": "int",
             "time": "float"
         })
+        self.database_manager.execute(
+            "CREATE INDEX IF NOT EXISTS idx_player_stock_player ON tb_player_stock (player_xuid, id)"
+        )
 
         '''Player order table'''
-        self.database_manager.create_table("tb_player_order", {
+        order_fields = {
             "id": "INTEGER primary key autoincrement",
             "player_xuid": "TEXT",
             "stock_name": "nvarchar",
             "share": "int",
-            "single_price": "float",
+            "single_price": "INTEGER",
             "type": "nvarchar",
             "create_time": "float",
             "finish_time": "float",
-            "tax": "float",
-            "total": "float"
-        })
+            "tax": "INTEGER",
+            "total": "INTEGER"
+        }
+        self.database_manager.create_table("tb_player_order", order_fields)
+        # 旧版本的已完成订单可能没有记录手续费，迁移时记为0
+        self._migrate_money_columns("tb_player_order", order_fields, ("single_price", "tax", "total"), ("tax",))
+        # 按玩家的游标分页走索引，翻到多深都只读取一页的数据
+        self.database_manager.execute(
+            "CREATE INDEX IF NOT EXISTS idx_player_order_player ON tb_player_order (player_xuid, id)"
+        )
+        # 较早的订单按月归档，归档表与订单表结构相同
+        self.order_archive = OrderArchiveManager(self.database_manager, order_fields)
         
         '''Player account table'''
-        self.database_manager.create_table("tb_player_account",{
+        # 金额字段均以百万分之一为单位的整数存储，见 money.py
+        account_fields = {
             "player_xuid": "TEXT",
-            "balance": "float"
-        })
+            "balance": "INTEGER"
+        }
+        self.database_manager.create_table("tb_player_account", account_fields)
+        self._migrate_money_columns("tb_player_account", account_fields, ("balance",))
             
         # Leaderboard table
         self.database_manager.create_table("tb_leaderboard", {
@@ -54,6 +71,47 @@ class StockDao:
             "rank": "int"
         })
 
+        # Position summary table, maintained in the same transaction as each trade
+        position_table_exists = self.database_manager.table_exists("tb_player_position")
+        tax_lot_table_exists = self.database_manager.table_exists("tb_tax_lot")
+        position_fields = {
+            "id": "INTEGER primary key autoincrement",
+            "player_xuid": "TEXT NOT NULL",
+            "stock_name": "nvarchar NOT NULL",
+            "share": "int NOT NULL DEFAULT 0",
+            "buy_share": "int NOT NULL DEFAULT 0",
+            "cost_basis": "INTEGER NOT NULL DEFAULT 0",
+            "realized_pnl": "INTEGER NOT NULL DEFAULT 0",
+            "total_buy": "INTEGER NOT NULL DEFAULT 0",
+            "total_sell": "INTEGER NOT NULL DEFAULT 0",
+            "updated_time": "float",
+            "UNIQUE": "(player_xuid, stock_name)"
+        }
+        self.database_manager.create_table("tb_player_position", position_fields)
+        self._migrate_money_columns("tb_player_position", position_fields,
+                                    ("cost_basis", "realized_pnl", "total_buy", "total_sell"))
+
+        # Tax lot table: buys open lots, sells consume them in FIFO order
+        tax_lot_fields = {
+            "id": "INTEGER primary key autoincrement",
+            "order_id": "int",
+            "player_xuid": "TEXT NOT NULL",
+            "stock_name": "nvarchar NOT NULL",
+            "share": "int NOT NULL",
+            "remaining_share": "int NOT NULL",
+            "cost": "INTEGER NOT NULL",
+            "remaining_cost": "INTEGER NOT NULL",
+            "open_time": "float"
+        }
+        self.database_manager.create_table("tb_tax_lot", tax_lot_fields)
+        self._migrate_money_columns("tb_tax_lot", tax_lot_fields, ("cost", "remaining_cost"))
+        self.database_manager.execute(
+            "CREATE INDEX IF NOT EXISTS idx_tax_lot_open ON tb_tax_lot (player_xuid, stock_name, remaining_share, id)"
+        )
+        
+        if not position_table_exists or not tax_lot_table_exists:
+            self.rebuild_positions()
+
         """QQ Notice record Table"""
         self.database_manager.create_table("tb_qq_notice", {
             "id": "INTEGER primary key autoincrement",
@@ -61,144 +119,259 @@ class StockDao:
         })
         
         
+    def _migrate_money_columns(self, table, fields, money_columns, zero_if_null=()):
+        """
+        将旧版本以浮点数存储的金额字段迁移为整数微单位
+        SQLite 不支持修改列类型，因此重建表后按原值乘以 1,000,000 取整复制数据
+        :param table: 表名
+        :param fields: 新的字段定义（与 create_table 相同）
+        :param money_columns: 金额字段名
+        :param zero_if_null: 为空时迁移为0的金额字段
+        """
+        column_types = {
+            column["name"]: (column["type"] or "").upper()
+            for column in self.database_manager.query_all(f"PRAGMA table_info({table})")
+        }
+        if all(column_types.get(column) == "INTEGER" for column in money_columns):
+            return
+        
+        columns = [name for name in fields if name != "UNIQUE" and name in column_types]
+        select_items = []
+        for name in columns:
+            item = name
+            if name in money_columns:
+                item = f"CAST(ROUND({name} * 1000000) AS INTEGER)"
+                if name in zero_if_null:
+                    item = f"COALESCE({item}, 0)"
+            select_items.append(item)
+        select_list = ", ".join(select_items)
+        field_defs = ",".join(f"{k} {v}" for k, v in fields.items())
+        
+        with self.database_manager.transaction() as conn:
+            conn.execute(f"ALTER TABLE {table} RENAME TO {table}_float_old")
+            conn.execute(f"CREATE TABLE {table} ({field_defs})")
+            conn.execute(
+                f"INSERT INTO {table} ({', '.join(columns)}) SELECT {select_list} FROM {table}_float_old"
+            )
+            conn.execute(f"DROP TABLE {table}_float_old")
+        
+        print(f"[UpAndDown] 已将 {table} 的金额字段迁移为整数存储")
+        
+        
     def create_order(self, xuid, stock_name, share, type):
         stock_name = stock_name.upper()
         
-        self.database_manager.insert("tb_player_order", {
+        return self.database_manager.insert_returning_id("tb_player_order", {
             "player_xuid": xuid,
             "stock_name": stock_name,
-            "share": share,
+            "share": int(share),
             "type": type,
             "create_time": time.time(),
         })
 
-        result = self.database_manager.query_one(
-            "SELECT id FROM tb_player_order WHERE player_xuid = ? ORDER BY id DESC LIMIT 1",
-            (xuid,)
-        )
-        order_id = result["id"] if result else None
-        
-        return order_id
-
     def buy(self, order_id, stock_name, xuid, share, price, tax, total):
         stock_name = stock_name.upper()
-        
-        # Buy
-        exists_share = self.database_manager.query_one("SELECT * FROM tb_player_stock WHERE player_xuid = ? AND stock_name = ?", (xuid, stock_name))
-        if exists_share == None:
-            self.database_manager.insert("tb_player_stock", {
-                "player_xuid": xuid,
-                "stock_name": stock_name,
-                "share": share,
-                "time": time.time()
-            })
-        else:
-            new_share = exists_share["share"] + share
-            id = exists_share["id"]
+        now = time.time()
+        share = int(share)
+        price, tax, total = to_micro(price), to_micro(tax or 0), to_micro(total)
+        
+        # 持股、订单和持仓汇总在同一个事务内更新
+        with self.database_manager.transaction() as conn:
+            exists_share = conn.execute(
+                "SELECT id, share FROM tb_player_stock WHERE player_xuid = ? AND stock_name = ?",
+                (xuid, stock_name)
+            ).fetchone()
             
-            self.database_manager.update("tb_player_stock",{
-                "share": new_share
-            }, f"id = {id}")
+            if exists_share == None:
+                conn.execute(
+                    "INSERT INTO tb_player_stock (player_xuid, stock_name, share, time) VALUES (?, ?, ?, ?)",
+                    (xuid, stock_name, int(share), now)
+                )
+            else:
+                conn.execute(
+                    "UPDATE tb_player_stock SET share = ? WHERE id = ?",
+                    (exists_share["share"] + int(share), exists_share["id"])
+                )
 
-        self.database_manager.update("tb_player_order", {
-            "single_price": price,
-            "finish_time": time.time(),
-            "tax": tax,
-            "total": total
-        }, f"id = {order_id}")
+            conn.execute(
+                "UPDATE tb_player_order SET single_price = ?, finish_time = ?, tax = ?, total = ? WHERE id = ?",
+                (price, now, tax, total, order_id)
+            )
+            
+            self._apply_trade_to_position(conn, order_id, xuid, stock_name, True, share, price, tax, total, now)
         
         
     def sell(self, order_id, stock_name, xuid, share, price, tax, total):
         stock_name = stock_name.upper()
+        now = time.time()
+        share = int(share)
+        price, tax, total = to_micro(price), to_micro(tax or 0), to_micro(total)
+        
+        with self.database_manager.transaction() as conn:
+            # Sell stock
+            # 查询玩家当前持股记录
+            exists_share = conn.execute(
+                "SELECT id, share FROM tb_player_stock WHERE player_xuid = ? AND stock_name = ?",
+                (xuid, stock_name)
+            ).fetchone()
+            
+            if exists_share is None:
+                # 理论上不会发生，因为调用前已检查持股
+                raise ValueError(f"Player {xuid} has no stock {stock_name} to sell")
+            
+            # 更新持股数量
+            conn.execute(
+                "UPDATE tb_player_stock SET share = ? WHERE id = ?",
+                (exists_share["share"] - int(share), exists_share["id"])
+            )
+            
+            # 更新订单状态
+            conn.execute(
+                "UPDATE tb_player_order SET single_price = ?, finish_time = ?, tax = ?, total = ? WHERE id = ?",
+                (price, now, tax, total, order_id)
+            )
+            
+            self._apply_trade_to_position(conn, order_id, xuid, stock_name, False, share, price, tax, total, now)
+            
+            
+    def _apply_trade_to_position(self, conn, order_id, xuid, stock_name, is_buy, share, price, tax, total, now):
+        """
+        将一笔成交记入税批次和持仓汇总表（需在调用方的事务内执行）
+        买入：total 为含手续费的总成本；卖出：total 为未扣手续费的成交额
+        price、tax、total 均为整数微单位
+        """
+        share = int(share)
+        tax = tax or 0
         
-        # Sell stock
-        # 查询玩家当前持股记录
-        exists_share = self.database_manager.query_one(
-            "SELECT * FROM tb_player_stock WHERE player_xuid = ? AND stock_name = ?", 
+        position = conn.execute(
+            "SELECT * FROM tb_player_position WHERE player_xuid = ? AND stock_name = ?",
             (xuid, stock_name)
-        )
-        
-        if exists_share is None:
-            # 理论上不会发生，因为调用前已检查持股
-            raise ValueError(f"Player {xuid} has no stock {stock_name} to sell")
-        
-        current_share = exists_share["share"]
-        record_id = exists_share["id"]
-        
-        # 计算卖出后的持股数量
-        new_share = current_share - share
+        ).fetchone()
         
-        # 更新持股数量
-        self.database_manager.update(
-            "tb_player_stock",
-            {"share": new_share},
-            f"id = {record_id}"
+        if position is None:
+            current_share = buy_share = cost_basis = realized_pnl = total_buy = total_sell = 0
+        else:
+            current_share = position['share']
+            buy_share = position['buy_share']
+            cost_basis = position['cost_basis']
+            realized_pnl = position['realized_pnl']
+            total_buy = position['total_buy']
+            total_sell = position['total_sell']
+        
+        if is_buy:
+            current_share += share
+            buy_share += share
+            cost_basis += total
+            conn.execute(
+                """
+                INSERT INTO tb_tax_lot (order_id, player_xuid, stock_name, share, remaining_share, cost, remaining_cost, open_time)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (order_id, xuid, stock_name, share, share, total, total, now)
+            )
+            # 累计买入 = 买入总金额 + 手续费
+            total_buy += (share * price) + tax
+        else:
+            # 按先进先出（FIFO）消耗税批次，结转卖出部分的成本
+            removed_cost = self._consume_tax_lots(conn, xuid, stock_name, share)
+            cost_basis -= removed_cost
+            if current_share - share <= 0:
+                cost_basis = 0
+            realized_pnl += (total - tax) - removed_cost
+            current_share -= share
+            # 累计卖出 = 卖出总金额 + 手续费
+            total_sell += (share * price) + tax
+        
+        conn.execute(
+            """
+            INSERT INTO tb_player_position (player_xuid, stock_name, share, buy_share, cost_basis, realized_pnl,
+                                            total_buy, total_sell, updated_time)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(player_xuid, stock_name) DO UPDATE SET
+                share = excluded.share,
+                buy_share = excluded.buy_share,
+                cost_basis = excluded.cost_basis,
+                realized_pnl = excluded.realized_pnl,
+                total_buy = excluded.total_buy,
+                total_sell = excluded.total_sell,
+                updated_time = excluded.updated_time
+            """,
+            (xuid, stock_name, current_share, buy_share, cost_basis, realized_pnl,
+             total_buy, total_sell, now)
         )
         
-        # 更新订单状态
-        self.database_manager.update(
-            "tb_player_order",
-            {
-                "single_price": price,
-                "finish_time": time.time(),
-                "tax": tax,
-                "total": total
-            },
-            f"id = {order_id}"
-        )
         
-    def check_user_account(self, xuid):
-        user_count = self.database_manager.query_one('SELECT COUNT(*) as count FROM tb_player_account WHERE player_xuid = ? ', (xuid,))
-        return user_count["count"] == 1
+    def _consume_tax_lots(self, conn, xuid, stock_name, share):
+        """
+        按先进先出顺序从未平仓的税批次中扣减股数
+        :return: 被卖出部分的成本（整数微单位）
+        """
+        remaining = int(share)
+        removed_cost = 0
         
+        open_lots = conn.execute(
+            """
+            SELECT id, remaining_share, remaining_cost FROM tb_tax_lot
+            WHERE player_xuid = ? AND stock_name = ? AND remaining_share > 0
+            ORDER BY id ASC
+            """,
+            (xuid, stock_name)
+        )
         
-    def get_balance(self, xuid):
-        account = self.database_manager.query_one("SELECT * FROM tb_player_account WHERE player_xuid = ? ", (xuid,))
-
-        if account == None or account["balance"] == None:
-            return None
-        return account["balance"]
+        updates = []
+        for lot in open_lots:
+            if remaining <= 0:
+                break
+            
+            lot_share = lot['remaining_share']
+            lot_cost = lot['remaining_cost']
+            
+            if remaining >= lot_share:
+                # 整个批次平仓
+                consumed_share = lot_share
+                consumed_cost = lot_cost
+            else:
+                consumed_share = remaining
+                consumed_cost = prorate(lot_cost, consumed_share, lot_share)
+            
+            remaining -= consumed_share
+            removed_cost += consumed_cost
+            updates.append((lot_share - consumed_share, lot_cost - consumed_cost, lot['id']))
         
+        conn.executemany("UPDATE tb_tax_lot SET remaining_share = ?, remaining_cost = ? WHERE id = ?", updates)
         
-    def increase_balance(self, xuid, amount, is_transfer_in=False):
+        return removed_cost
+    
+    
+    def rebuild_positions(self):
         """
-        增加余额
-        :param xuid: 玩家XUID
-        :param amount: 金额
-        :param is_transfer_in: 是否为转入操作（影响累计投入）
+        根据历史订单重建持仓汇总表和税批次
+        仅在汇总表或税批次表首次创建时调用，用于迁移已有数据
         """
-        account = self.database_manager.query_one("SELECT * FROM tb_player_account WHERE player_xuid = ? ", (xuid,))
+        # 已归档的订单同样需要重放
+        tables = ["tb_player_order"] + [partition["table_name"] for partition in self.order_archive.get_partitions()]
+        orders = self.database_manager.query_all(
+            " UNION ALL ".join(
+                f"""
+                SELECT id, player_xuid, stock_name, share, single_price, type, finish_time, tax, total
+                FROM {table}
+                WHERE total IS NOT NULL
+                """
+                for table in tables
+            ) + " ORDER BY id ASC"
+        )
+        
+        with self.database_manager.transaction() as conn:
+            conn.execute("DELETE FROM tb_player_position")
+            conn.execute("DELETE FROM tb_tax_lot")
+            for order in orders:
+                is_buy = order['type'] in ('buy_flex', 'buy_fix')
+                self._apply_trade_to_position(
+                    conn, order['id'], order['player_xuid'], order['stock_name'].upper(), is_buy,
+                    order['share'], order['single_price'], order['tax'], order['total'],
+                    order['finish_time'] or time.time()
+                )
         
-        if account == None:
-            # 新账户
-            self.database_manager.insert("tb_player_account", {
-                "player_xuid": xuid,
-                "balance": amount
-            })
-        else:
-            new_balance = float(Decimal(str(account["balance"])) + Decimal(str(amount)))
-            self.database_manager.update("tb_player_account", {
-                "balance": new_balance
-            }, f"player_xuid='{xuid}'")
-
-
-    def decrease_balance(self, xuid, amount, is_transfer_out=False):
-        """
-        减少余额
-        :param xuid: 玩家XUID
-        :param amount: 金额
-        :param is_transfer_out: 是否为转出操作（影响累计投入）
-        """
-        account = self.database_manager.query_one("SELECT * FROM tb_player_account WHERE player_xuid = ? ", (xuid,))
-        if account is None:
-            raise Exception("User not found")
-        else:
-            new_balance = float(Decimal(str(account["balance"])) - Decimal(str(amount)))
-            self.database_manager.update("tb_player_account", {
-                "balance": new_balance
-            }, f"player_xuid='{xuid}'")
-            
-            
     def get_player_stock_holding(self, xuid, stock_name):
         stock_name = stock_name.upper()
         
@@ -213,269 +386,157 @@ class StockDao:
         return exists_share["share"]
     
     
-    def get_orders(self, player_xuid, page=1, page_size=10):
+    def get_orders(self, player_xuid, before_id=None, page_size=10, has_archived=None):
         """
-        分页查询玩家订单
+        按游标分页查询玩家订单（从新到旧）
         :param player_xuid: 玩家XUID
-        :param page: 页码，从1开始
+        :param before_id: 游标，只返回 id 小于该值的订单，为空时从最新的订单开始
         :param page_size: 每页数量
-        :return: 订单列表
+        :param has_archived: 玩家是否有已归档的订单，为空时按需查询
+        :return: 订单列表，最后一条的 id 即下一页的游标（已归档的订单也会按顺序返回）
+        """
+        sql =  """
+            SELECT * FROM tb_player_order
+            WHERE player_xuid = ? AND id < ? AND total IS NOT NULL
+            ORDER BY id DESC LIMIT ?
         """
-        offset = (page - 1) * page_size
-        sql =  "SELECT * FROM tb_player_order WHERE player_xuid = ? AND total IS NOT NULL ORDER BY id DESC LIMIT ? OFFSET ?"
-        return self.database_manager.query_all(sql, (player_xuid, page_size, offset))
+        orders = self.database_manager.query_all(sql, (player_xuid, self._cursor(before_id), page_size))
+        
+        # 热表中的订单不足一页且玩家有已归档的订单时，继续从归档分区读取更早的订单
+        if len(orders) < page_size and (
+            has_archived if has_archived is not None else self.has_archived_orders(player_xuid)
+        ):
+            archive_cursor = orders[-1]['id'] if orders else before_id
+            orders += self.order_archive.get_orders(player_xuid, archive_cursor, page_size - len(orders))
+        
+        orders = [self._money_to_decimal(order, ("single_price", "tax", "total")) for order in orders]
+        for order in orders:
+            # 已按旧版本迁移过的数据库中仍可能有没有手续费的订单
+            if order["tax"] is None:
+                order["tax"] = Decimal(0)
+        return orders
     
     
-    def get_shares(self, player_xuid, page=1, page_size=10):
-        offset = (page - 1) * page_size
-        sql =  "SELECT * FROM tb_player_stock WHERE player_xuid = ? AND share > 0 ORDER BY id DESC LIMIT ? OFFSET ?"
-        return self.database_manager.query_all(sql, (player_xuid, page_size, offset))
+    def has_archived_orders(self, player_xuid):
+        """
+        玩家是否有已归档的订单
+        :param player_xuid: 玩家XUID
+        :return: 是否有已归档的订单
+        """
+        return self.order_archive.has_orders(player_xuid)
     
     
-    def get_average_cost(self, player_xuid, stock_name):
+    def get_archived_order_summary(self, player_xuid):
         """
-        计算玩家持有某股票的平均成本
+        获取玩家已归档订单的按月汇总（热表只保留近期订单，更早的订单在历史订单中按月显示汇总）
         :param player_xuid: 玩家XUID
-        :param stock_name: 股票名称
-        :return: 平均成本价格，如果没有持仓返回None
+        :return: 按月份从新到旧排列的汇总列表
         """
-        # 查询所有买入订单
-        buy_orders = self.database_manager.query_all(
-            """
-            SELECT share, single_price, total 
-            FROM tb_player_order 
-            WHERE player_xuid = ? 
-            AND stock_name = ? 
-            AND (type = 'buy_flex' OR type = 'buy_fix')
-            AND total IS NOT NULL
-            ORDER BY finish_time ASC
-            """,
-            (player_xuid, stock_name)
-        )
-        
-        # 查询所有卖出订单
-        sell_orders = self.database_manager.query_all(
+        return [
+            self._money_to_decimal(summary, ("buy_total", "sell_total", "tax_total"))
+            for summary in self.order_archive.get_summary(player_xuid)
+        ]
+    
+    
+    def get_shares(self, player_xuid, before_id=None, page_size=10):
+        """
+        按游标分页查询玩家持股（从新到旧）
+        :param player_xuid: 玩家XUID
+        :param before_id: 游标，只返回 id 小于该值的记录，为空时从第一页开始
+        :param page_size: 每页数量
+        :return: 持股列表，最后一条的 id 即下一页的游标
+        """
+        sql =  "SELECT * FROM tb_player_stock WHERE player_xuid = ? AND id < ? AND share > 0 ORDER BY id DESC LIMIT ?"
+        return self.database_manager.query_all(sql, (player_xuid, self._cursor(before_id), page_size))
+    
+    
+    def get_holdings_with_cost(self, player_xuid, before_id=None, page_size=10):
+        """
+        按游标分页查询玩家持股及其持仓成本（一次查询）
+        :param player_xuid: 玩家XUID
+        :param before_id: 游标，只返回 id 小于该值的记录，为空时从第一页开始
+        :param page_size: 每页数量
+        :return: 持股列表，包含 cost_basis（Decimal，没有持仓汇总时为None）和 average_cost（Decimal 或 None）
+        """
+        holdings = self.database_manager.query_all(
             """
-            SELECT share 
-            FROM tb_player_order 
-            WHERE player_xuid = ? 
-            AND stock_name = ? 
-            AND (type = 'sell_flex' OR type = 'sell_fix')
-            AND total IS NOT NULL
-            ORDER BY finish_time ASC
+            SELECT s.id, s.stock_name, s.share, p.cost_basis, p.share AS position_share
+            FROM tb_player_stock s
+            LEFT JOIN tb_player_position p
+                ON p.player_xuid = s.player_xuid AND p.stock_name = UPPER(s.stock_name)
+            WHERE s.player_xuid = ? AND s.id < ? AND s.share > 0
+            ORDER BY s.id DESC LIMIT ?
             """,
-            (player_xuid, stock_name)
+            (player_xuid, self._cursor(before_id), page_size)
         )
-        
-        if not buy_orders:
-            return None
-        
-        # 计算总买入成本和总买入股数
-        total_cost = Decimal('0')
-        total_buy_shares = Decimal('0')
-        
-        for order in buy_orders:
-            share = Decimal(str(order['share']))
-            # 总成本包含手续费
-            cost = Decimal(str(order['total']))
-            total_cost += cost
-            total_buy_shares += share
-        
-        # 计算总卖出股数
-        total_sell_shares = Decimal('0')
-        for order in sell_orders:
-            total_sell_shares += Decimal(str(order['share']))
-        
-        # 当前持有股数
-        current_shares = total_buy_shares - total_sell_shares
-        
-        if current_shares <= 0:
-            return None
-        
-        # 按比例计算剩余持仓的成本
-        # 假设先进先出（FIFO），按比例分摊成本
-        remaining_cost = total_cost * (current_shares / total_buy_shares)
-        average_cost = remaining_cost / current_shares
-        
-        return float(average_cost)
+        for holding in holdings:
+            self._money_to_decimal(holding, ("cost_basis",))
+            position_share = holding.pop('position_share')
+            if holding['cost_basis'] is not None and position_share:
+                holding['average_cost'] = holding['cost_basis'] / Decimal(position_share)
+            else:
+                holding['average_cost'] = None
+        return holdings
     
-
-    def get_leaderboard_cached_data(self, is_absolute):
-        # Get current timestamp
-        current_time = time.time()
-        
-        # Get data from cache if it's fresh enough (less than 1 hour old)
-        cached_data = self.database_manager.query_all(
-            "SELECT * FROM tb_leaderboard WHERE is_absolute = ? AND last_updated > ? ORDER BY rank LIMIT 10",
-            (is_absolute, current_time - 3600)
-        )
-
-        return cached_data
+    
+    @staticmethod
+    def _cursor(before_id):
+        """游标为空时取 SQLite 整数最大值，第一页和后续页使用同一条查询"""
+        return (1 << 63) - 1 if before_id is None else int(before_id)
     
     
-    def get_all_players_profit_loss(self, get_stock_price_func):
+    def get_position(self, player_xuid, stock_name):
         """
-        获取所有玩家的盈亏数据
-        :param get_stock_price_func: 获取股票价格的函数
-        :return: 包含玩家盈亏信息的列表
+        获取玩家某只股票的持仓汇总
+        :param player_xuid: 玩家XUID
+        :param stock_name: 股票名称
+        :return: 持仓汇总字典（share, cost_basis, average_cost, realized_pnl, total_buy, total_sell 等，金额为 Decimal），
+                 没有记录返回None；average_cost 为剩余持仓的平均成本（先进先出，含手续费），没有持股时为None
         """
-        # 获取所有有账户的玩家
-        all_accounts = self.database_manager.query_all(
-            "SELECT player_xuid, balance FROM tb_player_account"
+        position = self.database_manager.query_one(
+            "SELECT * FROM tb_player_position WHERE player_xuid = ? AND stock_name = ?",
+            (player_xuid, stock_name.upper())
         )
-        
-        if not all_accounts:
-            return []
-        
-        players_data = []
-
-        price_cache_dict = {}
-        
-        for account in all_accounts:
-            player_xuid = account['player_xuid']
-            balance = Decimal(str(account['balance']))
-            
-            # 实时计算累计投入：通过查询买入订单的总成本
-            buy_orders = self.database_manager.query_all(
-                """
-                SELECT share, single_price, tax 
-                FROM tb_player_order 
-                WHERE player_xuid = ? 
-                AND (type = 'buy_flex' OR type = 'buy_fix')
-                AND total IS NOT NULL
-                """,
-                (player_xuid,)
-            )
-
-            sell_orders = self.database_manager.query_all(
-                """
-                SELECT share, single_price, tax 
-                FROM tb_player_order 
-                WHERE player_xuid = ? 
-                AND (type = 'sell_flex' OR type = 'sell_fix')
-                AND total IS NOT NULL
-                """,
-                (player_xuid,)
-            )
-            
-            total_buy = Decimal('0')
-            for order in buy_orders:
-                # 累计买入 = 买入总金额 + 手续费
-                share = Decimal(str(order['share']))
-                price = Decimal(str(order['single_price']))
-                tax = Decimal(str(order['tax'])) if order['tax'] else Decimal('0')
-                total_buy += (share * price) + tax
-
-            total_sell = Decimal('0')
-            for order in sell_orders:
-                # 累计卖出 = 买入总金额 + 手续费
-                share = Decimal(str(order['share']))
-                price = Decimal(str(order['single_price']))
-                tax = Decimal(str(order['tax'])) if order['tax'] else Decimal('0')
-                total_sell += (share * price) + tax
-            
-            # 如果累计投入为0，跳过（没有实际投资过）
-            if total_buy == 0:
-                continue
-            
-            # 计算持仓市值
-            holdings_value = Decimal('0')
-            holdings = self.database_manager.query_all(
-                "SELECT stock_name, share FROM tb_player_stock WHERE player_xuid = ? AND share > 0",
-                (player_xuid,)
-            )
-            
-            for holding in holdings:
-                stock_name = holding['stock_name']
-                share = Decimal(str(holding['share']))
-                
-                # 获取当前股票价格
-                if stock_name not in price_cache_dict:
-                    current_price, _ = get_stock_price_func(stock_name)
-                    price_cache_dict[stock_name] = current_price
-                else:
-                    current_price = price_cache_dict[stock_name]
-                if current_price:
-                    holdings_value += current_price * share
-            
-            # 当前盈利 = 持仓市值 - 所有购买股票的成本 + 所有出售股票的收入
-            absolute_profit_loss = holdings_value - total_buy + total_sell
-            
-            # 相对盈亏（百分比） = 绝对盈亏 / 累计投入 * 100
-            if total_buy > 0:
-                relative_profit_loss = float((absolute_profit_loss / total_buy) * 100)
-            else:
-                relative_profit_loss = 0.0
-            
-            players_data.append({
-                'player_xuid': player_xuid,
-                'total_wealth': float(holdings_value) + float(balance),
-                'holdings_value': float(holdings_value),
-                'balance': float(balance),
-                'total_buy': float(total_buy),
-                'total_sell': float(total_sell),
-                'absolute_profit_loss': float(absolute_profit_loss),
-                'relative_profit_loss': relative_profit_loss
-            })
-        
-        return players_data
+        if position is None:
+            return None
+        self._money_to_decimal(position, ("cost_basis", "realized_pnl", "total_buy", "total_sell"))
+        # 剩余持仓成本 = 未平仓税批次的剩余成本之和
+        position['average_cost'] = position['cost_basis'] / Decimal(position['share']) if position['share'] > 0 else None
+        return position
+    
+    
+    @staticmethod
+    def _money_to_decimal(row, money_columns):
+        """将查询结果中的整数微单位金额字段转换为 Decimal"""
+        for column in money_columns:
+            row[column] = from_micro(row[column])
+        return row
     
 
-    def get_cached_single_player_profit_loss(self, player_xuid):
-        current_time = time.time()        
-        cached_data = self.database_manager.query_one(
-            "SELECT * FROM tb_leaderboard WHERE is_absolute = ? AND last_updated > ? AND player_xuid = ? ORDER BY rank LIMIT 10",
-            (True, current_time - 3600, player_xuid), 
+    def load_leaderboard_data(self):
+        """
+        读取持久化的排行榜数据（仅用于重启后恢复排行榜快照）
+        :return: tb_leaderboard 的所有记录
+        """
+        return self.database_manager.query_all(
+            "SELECT * FROM tb_leaderboard ORDER BY is_absolute DESC, rank ASC"
         )
 
-        if cached_data == None:
-            return None
-
-        return {
-            'player_xuid': player_xuid,
-            'total_wealth': cached_data["total_wealth"],
-            'holdings_value': cached_data["holdings_value"],
-            'balance': cached_data["balance"],
-            'total_buy': cached_data["total_buy"],
-            'total_sell': cached_data["total_sell"],
-            'absolute_profit_loss': cached_data["absolute_profit_loss"],
-            'relative_profit_loss': cached_data["relative_profit_loss"]
-        }
-
 
-    def save_leaderboard_data(self, players_data, is_absolute):
+    def save_leaderboard_data(self, snapshot):
         """
-        保存排行榜数据到数据库
-        :param players_data: 玩家数据列表
-        :param is_absolute: 是否为绝对盈亏排行榜
+        持久化排行榜快照（绝对盈亏榜和相对盈亏榜）
+        两个榜单在同一个事务内整体替换
+        :param snapshot: LeaderboardSnapshot 排行榜快照
         """
-        # 先清空旧数据
-        self.database_manager.execute(
-            "DELETE FROM tb_leaderboard WHERE is_absolute = ?", 
-            (is_absolute,)
-        )
-        
-        # 按指定字段排序（绝对盈亏或相对盈亏）
-        if is_absolute:
-            sorted_data = sorted(players_data, key=lambda x: x['absolute_profit_loss'], reverse=True)
-        else:
-            sorted_data = sorted(players_data, key=lambda x: x['relative_profit_loss'], reverse=True)
-        
-        # 插入新数据
-        for rank, player_data in enumerate(sorted_data, 1):
-            self.database_manager.insert("tb_leaderboard", {
-                "player_xuid": player_data['player_xuid'],
-                "total_wealth": player_data['total_wealth'],
-                "holdings_value": player_data['holdings_value'],
-                "balance": player_data['balance'],
-                "total_buy": player_data['total_buy'],
-                "total_sell": player_data['total_sell'],
-                "absolute_profit_loss": player_data['absolute_profit_loss'],
-                "relative_profit_loss": player_data['relative_profit_loss'],
-                "is_absolute": is_absolute,
-                "last_updated": time.time(),
-                "rank": rank
-            })
+        columns = ('player_xuid', 'total_wealth', 'holdings_value', 'balance', 'total_buy', 'total_sell',
+                   'absolute_profit_loss', 'relative_profit_loss', 'is_absolute', 'last_updated', 'rank')
+        rows = [{column: row[column] for column in columns} for row in snapshot.rows()]
+        
+        # 清空旧数据并写入新数据，单次提交
+        with self.database_manager.transaction():
+            self.database_manager.execute("DELETE FROM tb_leaderboard")
+            self.database_manager.insert_many("tb_leaderboard", rows)
 
         
     def insert_qq_send_log(self, date_str):
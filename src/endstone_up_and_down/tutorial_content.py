@@ -0,0 +1,93 @@
+"""
+教学指引内容 - 从数据文件加载各页面，启动时编译为可直接发送的表单模板
+"""
+import json
+import string
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+# 数据文件目录：locales/<语言>/tutorial.json
+LOCALES_DIR = Path(__file__).parent / "locales"
+DEFAULT_LOCALE = "zh_CN"
+
+
+class TutorialPage:
+    """编译后的页面：标题、正文模板和按钮（显示文本, 跳转目标）"""
+    __slots__ = ("page_id", "title", "content", "buttons", "params")
+
+    def __init__(self, page_id: str, title: str, content: str, buttons: Tuple[Tuple[str, str], ...]):
+        self.page_id = page_id
+        self.title = title
+        self.content = content
+        self.buttons = buttons
+        # 正文中需要填入的参数，例如 fee_rate；没有参数的页面正文可以直接发送
+        self.params = frozenset(
+            name for _, name, _, _ in string.Formatter().parse(content) if name
+        )
+
+
+class TutorialContent:
+    def __init__(self, default_locale: str = DEFAULT_LOCALE):
+        """
+        加载并编译默认语言的教学指引内容，其他语言在第一次使用时加载
+        :param default_locale: 默认语言，没有教学指引文件的语言使用默认语言
+        """
+        self.default_locale = default_locale
+        # 语言 -> {页面ID: 页面}
+        self._pages: Dict[str, Dict[str, TutorialPage]] = {}
+        # (语言, 页面ID, 参数) -> 填好参数的正文，参数只有少数几种取值（例如手续费率）
+        self._rendered: Dict[tuple, str] = {}
+        self._lock = threading.Lock()
+        self.pages = self._get_pages(default_locale)
+    
+    def _get_pages(self, locale: str) -> Dict[str, TutorialPage]:
+        pages = self._pages.get(locale)
+        if pages is not None:
+            return pages
+        
+        with self._lock:
+            if locale not in self._pages:
+                path = LOCALES_DIR / locale / "tutorial.json"
+                if path.exists():
+                    self._pages[locale] = self._compile(path)
+                else:
+                    self._pages[locale] = self._pages.get(self.default_locale, {})
+            return self._pages[locale]
+
+    @staticmethod
+    def _compile(path: Path) -> Dict[str, TutorialPage]:
+        """读取数据文件，将每页的正文行合并为一个字符串"""
+        with path.open("r", encoding="utf-8") as f:
+            data = json.load(f)
+
+        return {
+            page_id: TutorialPage(
+                page_id,
+                page["title"],
+                "\n".join(page["content"]),
+                tuple((button["text"], button["target"]) for button in page.get("buttons", ()))
+            )
+            for page_id, page in data.items()
+        }
+
+    def render(self, page_id: str, locale: Optional[str] = None, **params) -> Tuple[TutorialPage, str]:
+        """
+        获取页面和填好参数的正文
+        :param page_id: 页面ID
+        :param locale: 语言，为空时使用默认语言
+        :param params: 正文参数，页面没有用到的参数会被忽略
+        :return: (页面, 正文)
+        """
+        locale = locale or self.default_locale
+        page = self._get_pages(locale).get(page_id) or self.pages[page_id]
+        if not page.params:
+            return page, page.content
+
+        key = (locale, page_id, tuple(sorted((name, params[name]) for name in page.params)))
+        content = self._rendered.get(key)
+        if content is None:
+            content = page.content.format(**params)
+            with self._lock:
+                self._rendered[key] = content
+        return page, content
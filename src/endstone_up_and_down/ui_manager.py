@@ -9,6 +9,8 @@ from typing import Callable, Optional, TYPE_CHECKING
 
 from endstone.form import ActionForm, ModalForm, Label, TextInput, Dropdown
 
+from endstone_up_and_down.ui_requests import UIRequestCoordinator
+
 if TYPE_CHECKING:
     from endstone_up_and_down.up_and_down_plugin import UpAndDownPlugin
 
@@ -20,6 +22,10 @@ class UIManager:
         :param plugin: 插件实例
         """
         self.plugin: "UpAndDownPlugin" = plugin
+        # 后台加载按 (玩家, 面板) 合并，结果在主线程发送
+        self.ui_requests = UIRequestCoordinator(
+            lambda func: self.plugin.server.scheduler.run_task(self.plugin, func, delay=0)
+        )
     
     # ==================== 主面板 ====================
     def show_main_panel(self, player):
@@ -28,29 +34,27 @@ class UIManager:
             xuid = player.xuid
             
             # 检查账户是否已激活
-            if not self.plugin.stock_dao.check_user_account(xuid):
+            if not self.plugin.account_ledger.has_account(xuid):
                 self._show_activate_account_panel(player)
                 return
             
-            # 使用线程加载数据
-            import threading
-            
-            def load_data():
+            def load_data(request):
                 try:
                     # 获取账户信息
-                    balance = self.plugin.stock_dao.get_balance(xuid)
+                    balance = self.plugin.account_ledger.get_balance(xuid)
                     
-                    cached_player_data = self.plugin.stock_dao.get_cached_single_player_profit_loss(xuid)
+                    # 实时估值（交易或价格变化前重复打开直接使用缓存结果）
+                    valuation = self.plugin.live_valuation.get_valuation(xuid)
 
-                    content = f"=== 股票账户概览(每30分钟更新) ===\n\n"
-                    if cached_player_data != None:
-                        total_market_value = cached_player_data['holdings_value']
-                        total_wealth = cached_player_data['total_wealth']
-                        relative_profit_loss = cached_player_data['relative_profit_loss']
-                        absolute_profit_loss = cached_player_data['absolute_profit_loss']
+                    content = f"=== 股票账户概览 ===\n\n"
+                    if valuation is not None:
+                        total_market_value = valuation['holdings_value']
+                        total_wealth = valuation['total_wealth']
+                        relative_profit_loss = valuation['relative_profit_loss']
+                        absolute_profit_loss = valuation['absolute_profit_loss']
 
                         # 获取玩家的颜色配置
-                        profit_color = self.plugin.player_settings_manager.get_color_for_change(xuid, float(absolute_profit_loss))
+                        profit_color = self.plugin.player_settings_manager.get_palette(xuid).for_change(absolute_profit_loss)
                         
                         # 构建内容
                         content += f"账户余额: ${balance:.2f}\n"
@@ -73,6 +77,12 @@ class UIManager:
                         else:
                             content += f"相对盈亏: §7{relative_profit_loss:.2f}%%§r\n"
                         
+                        # 显示我的排名（排行榜每30分钟全量更新）
+                        player_rank = self.plugin.get_player_rank(xuid)
+                        if player_rank is not None:
+                            rank, total_players, percentile = player_rank
+                            content += f"我的排名: 第{rank}/{total_players}名 (超过{percentile:.0f}%%的玩家)\n"
+                        
                     content += f"\n§r提示: 选择下方功能按钮进行操作"
                     
                     # 在主线程显示UI
@@ -114,6 +124,11 @@ class UIManager:
                             on_click=lambda sender: self.show_player_settings_panel(sender)
                         )
                         
+                        main_panel.add_button(
+                            "收益走势",
+                            on_click=lambda sender: self.show_performance_panel(sender)
+                        )
+                        
                         main_panel.add_button(
                             "盈亏排行榜",
                             on_click=lambda sender: self.show_leaderboard_menu(sender)
@@ -126,24 +141,16 @@ class UIManager:
                         
                         player.send_form(main_panel)
                     
-                    self.plugin.server.scheduler.run_task(
-                        self.plugin,
-                        show_panel,
-                        delay=0
-                    )
+                    self.ui_requests.deliver(request, show_panel)
                     
                 except Exception as e:
                     print(f"加载主面板数据错误: {str(e)}")
                     import traceback
                     traceback.print_exc()
-                    self.plugin.server.scheduler.run_task(
-                        self.plugin,
-                        lambda: player.send_message("§c加载数据时发生错误"),
-                        delay=0
-                    )
+                    self.ui_requests.deliver(request, lambda: player.send_message("§c加载数据时发生错误"))
             
-            thread = threading.Thread(target=load_data)
-            thread.start()
+            # 同一面板的加载合并为一个，被新请求取代的结果不再发送
+            self.ui_requests.start(xuid, "main", None, load_data)
             
         except Exception as e:
             print(f"显示主面板错误: {str(e)}")
@@ -190,7 +197,8 @@ class UIManager:
             
             # 执行转账
             self.plugin.economy_plugin.decrease_player_money(player, amount)
-            self.plugin.stock_dao.increase_balance(player.xuid, amount, is_transfer_in=True)
+            self.plugin.account_ledger.increase_balance(player.xuid, amount)
+            self.plugin.valuation_engine.mark_player_dirty(player.xuid)
             
             player.send_message(f"§a成功激活股票账户并转入 ${amount:.2f}")
             
@@ -202,20 +210,22 @@ class UIManager:
             player.send_message("§c激活账户时发生错误")
     
     # ==================== 持仓面板 ====================
-    def show_holdings_panel(self, player):
-        """显示持仓面板"""
+    def show_holdings_panel(self, player, before_id: int = None, cursor_stack: tuple = ()):
+        """
+        显示持仓面板
+        :param before_id: 当前页的游标，为空时显示第一页
+        :param cursor_stack: 之前各页的游标，用于返回上一页
+        """
         try:
             xuid = player.xuid
+            page_size = 10
             
-            # 使用线程加载数据
-            import threading
-            
-            def load_data():
+            def load_data(request):
                 try:
-                    holdings = self.plugin.stock_dao.get_shares(xuid, page=0, page_size=100)
-                    
-                    # 过滤掉股数为0的持仓
-                    holdings = [h for h in holdings if h['share'] > 0]
+                    # 多取一条用于判断是否还有下一页，持仓成本随持股一起查出
+                    holdings = self.plugin.stock_dao.get_holdings_with_cost(xuid, before_id=before_id, page_size=page_size + 1)
+                    has_next_page = len(holdings) > page_size
+                    holdings = holdings[:page_size]
                     
                     if not holdings:
                         def show_no_holdings():
@@ -226,28 +236,28 @@ class UIManager:
                             )
                             player.send_form(no_holdings_form)
                         
-                        self.plugin.server.scheduler.run_task(
-                            self.plugin,
-                            show_no_holdings,
-                            delay=0
-                        )
+                        self.ui_requests.deliver(request, show_no_holdings)
                         return
                     
                     # 构建持仓按钮数据
                     buttons_data = []
+                    palette = self.plugin.player_settings_manager.get_palette(xuid)
+                    
+                    # 一次批量获取本页所有股票的价格
+                    prices = self.plugin.get_stock_last_prices(holding['stock_name'] for holding in holdings)
                     
                     for holding in holdings:
                         stock_name = holding['stock_name']
                         share = holding['share']
                         
                         # 获取当前价格
-                        current_price, _ = self.plugin.get_stock_last_price(stock_name)
+                        current_price = prices.get(stock_name.upper())
                         
                         if current_price:
                             market_value = float(current_price) * share
                             
-                            # 获取平均成本
-                            avg_cost = self.plugin.stock_dao.get_average_cost(xuid, stock_name)
+                            # 平均成本
+                            avg_cost = holding['average_cost']
                             
                             if avg_cost:
                                 cost = float(avg_cost) * share
@@ -255,7 +265,7 @@ class UIManager:
                                 profit_loss_percent = (profit_loss / cost) * 100 if cost > 0 else 0
                                 
                                 # 获取颜色
-                                profit_color = self.plugin.player_settings_manager.get_color_for_change(xuid, profit_loss)
+                                profit_color = palette.for_change(profit_loss)
                                 
                                 if profit_loss > 0:
                                     profit_text = f"{profit_color}+${profit_loss:.2f} (+{profit_loss_percent:.2f}%%)§r"
@@ -286,6 +296,20 @@ class UIManager:
                                 on_click=lambda sender, stock=stock_name: self.show_stock_detail_panel(sender, stock, from_holdings=True)
                             )
                         
+                        if has_next_page:
+                            holdings_panel.add_button(
+                                "下一页",
+                                on_click=lambda sender: self.show_holdings_panel(
+                                    sender, holdings[-1]['id'], cursor_stack + (before_id,)
+                                )
+                            )
+                        
+                        if cursor_stack:
+                            holdings_panel.add_button(
+                                "上一页",
+                                on_click=lambda sender: self.show_holdings_panel(sender, cursor_stack[-1], cursor_stack[:-1])
+                            )
+                        
                         # 添加返回按钮
                         holdings_panel.add_button(
                             "返回主菜单",
@@ -294,24 +318,15 @@ class UIManager:
                         
                         player.send_form(holdings_panel)
                     
-                    self.plugin.server.scheduler.run_task(
-                        self.plugin,
-                        show_panel,
-                        delay=0
-                    )
+                    self.ui_requests.deliver(request, show_panel)
                     
                 except Exception as e:
                     print(f"加载持仓数据错误: {str(e)}")
                     import traceback
                     traceback.print_exc()
-                    self.plugin.server.scheduler.run_task(
-                        self.plugin,
-                        lambda: player.send_message("§c加载持仓数据时发生错误"),
-                        delay=0
-                    )
+                    self.ui_requests.deliver(request, lambda: player.send_message("§c加载持仓数据时发生错误"))
             
-            thread = threading.Thread(target=load_data)
-            thread.start()
+            self.ui_requests.start(xuid, "holdings", (before_id, cursor_stack), load_data)
             
         except Exception as e:
             print(f"显示持仓面板错误: {str(e)}")
@@ -320,17 +335,22 @@ class UIManager:
             player.send_message("§c显示持仓面板时发生错误")
     
     # ==================== 收藏面板 ====================
-    def show_favorites_panel(self, player):
-        """显示收藏面板"""
+    def show_favorites_panel(self, player, before_id: int = None, cursor_stack: tuple = ()):
+        """
+        显示收藏面板
+        :param before_id: 当前页的游标，为空时显示第一页
+        :param cursor_stack: 之前各页的游标，用于返回上一页
+        """
         try:
             xuid = player.xuid
+            page_size = 20
             
-            # 使用线程加载数据
-            import threading
-            
-            def load_data():
+            def load_data(request):
                 try:
-                    favorites = self.plugin.favorites_manager.get_favorites(xuid, page=0, page_size=20)
+                    # 多取一条用于判断是否还有下一页
+                    favorites = self.plugin.favorites_manager.get_favorites(xuid, before_id=before_id, page_size=page_size + 1)
+                    has_next_page = len(favorites) > page_size
+                    favorites = favorites[:page_size]
                     
                     if not favorites:
                         def show_no_favorites():
@@ -341,22 +361,21 @@ class UIManager:
                             )
                             player.send_form(no_favorites_form)
                         
-                        self.plugin.server.scheduler.run_task(
-                            self.plugin,
-                            show_no_favorites,
-                            delay=0
-                        )
+                        self.ui_requests.deliver(request, show_no_favorites)
                         return
                     
                     # 构建收藏按钮数据
                     buttons_data = []
                     
+                    # 一次批量获取本页收藏股票的价格
+                    quotes = self.plugin.get_stock_last_quotes(favorite['stock_name'] for favorite in favorites)
+                    
                     for favorite in favorites:
                         stock_name = favorite['stock_name']
                         stock_display_name = favorite.get('stock_display_name', stock_name)
                         
                         # 获取当前价格
-                        current_price, tradeable = self.plugin.get_stock_last_price(stock_name)
+                        current_price, tradeable = quotes.get(stock_name.upper(), (None, None))
                         
                         if current_price:
                             status = "开盘" if tradeable else "盘后"
@@ -380,6 +399,20 @@ class UIManager:
                                 on_click=lambda sender, stock=stock_name: self.show_stock_detail_panel(sender, stock)
                             )
                         
+                        if has_next_page:
+                            favorites_panel.add_button(
+                                "下一页",
+                                on_click=lambda sender: self.show_favorites_panel(
+                                    sender, favorites[-1]['id'], cursor_stack + (before_id,)
+                                )
+                            )
+                        
+                        if cursor_stack:
+                            favorites_panel.add_button(
+                                "上一页",
+                                on_click=lambda sender: self.show_favorites_panel(sender, cursor_stack[-1], cursor_stack[:-1])
+                            )
+                        
                         # 添加返回按钮
                         favorites_panel.add_button(
                             "返回主菜单",
@@ -388,24 +421,15 @@ class UIManager:
                         
                         player.send_form(favorites_panel)
                     
-                    self.plugin.server.scheduler.run_task(
-                        self.plugin,
-                        show_panel,
-                        delay=0
-                    )
+                    self.ui_requests.deliver(request, show_panel)
                     
                 except Exception as e:
                     print(f"加载收藏数据错误: {str(e)}")
                     import traceback
                     traceback.print_exc()
-                    self.plugin.server.scheduler.run_task(
-                        self.plugin,
-                        lambda: player.send_message("§c加载收藏数据时发生错误"),
-                        delay=0
-                    )
+                    self.ui_requests.deliver(request, lambda: player.send_message("§c加载收藏数据时发生错误"))
             
-            thread = threading.Thread(target=load_data)
-            thread.start()
+            self.ui_requests.start(xuid, "favorites", (before_id, cursor_stack), load_data)
             
         except Exception as e:
             print(f"显示收藏面板错误: {str(e)}")
@@ -441,10 +465,7 @@ class UIManager:
                 player.send_message("§c请输入有效的股票代码")
                 return
             
-            # 使用线程验证股票
-            import threading
-            
-            def search_stock():
+            def search_stock(request):
                 try:
                     # 验证股票是否存在
                     price, tradeable = self.plugin.get_stock_last_price(stock_name)
@@ -458,32 +479,19 @@ class UIManager:
                             )
                             player.send_form(error_form)
                         
-                        self.plugin.server.scheduler.run_task(
-                            self.plugin,
-                            show_error,
-                            delay=0
-                        )
+                        self.ui_requests.deliver(request, show_error)
                         return
                     
                     # 显示股票详情
-                    self.plugin.server.scheduler.run_task(
-                        self.plugin,
-                        lambda: self.show_stock_detail_panel(player, stock_name),
-                        delay=0
-                    )
+                    self.ui_requests.deliver(request, lambda: self.show_stock_detail_panel(player, stock_name))
                     
                 except Exception as e:
                     print(f"搜索股票线程错误: {str(e)}")
                     import traceback
                     traceback.print_exc()
-                    self.plugin.server.scheduler.run_task(
-                        self.plugin,
-                        lambda: player.send_message("§c搜索股票时发生错误"),
-                        delay=0
-                    )
+                    self.ui_requests.deliver(request, lambda: player.send_message("§c搜索股票时发生错误"))
             
-            thread = threading.Thread(target=search_stock)
-            thread.start()
+            self.ui_requests.start(player.xuid, "search", stock_name, search_stock)
             
         except Exception as e:
             print(f"搜索股票错误: {str(e)}")
@@ -497,24 +505,17 @@ class UIManager:
         try:
             xuid = player.xuid
             
-            # 使用线程加载数据
-            import threading
-            
-            def load_data():
+            def load_data(request):
                 try:
                     # 获取股票信息
                     current_price, tradeable = self.plugin.get_stock_last_price(stock_name)
                     
                     if current_price is None:
-                        self.plugin.server.scheduler.run_task(
-                            self.plugin,
-                            lambda: player.send_message(f"§c无法获取股票 {stock_name} 的价格信息"),
-                            delay=0
-                        )
+                        self.ui_requests.deliver(request, lambda: player.send_message(f"§c无法获取股票 {stock_name} 的价格信息"))
                         return
                     
                     # 获取持仓信息
-                    holding = self.plugin.stock_dao.get_player_stock_holding(xuid, stock_name)
+                    holding = self.plugin.account_ledger.get_holding(xuid, stock_name)
                     
                     # 构建详情内容
                     content = f"=== {stock_name} ===\n\n"
@@ -522,8 +523,10 @@ class UIManager:
                     content += f"市场状态: {'开盘交易中' if tradeable else '盘后'}\n\n"
                     
                     if holding > 0:
+                        palette = self.plugin.player_settings_manager.get_palette(xuid)
                         market_value = float(current_price) * holding
-                        avg_cost = self.plugin.stock_dao.get_average_cost(xuid, stock_name)
+                        position = self.plugin.stock_dao.get_position(xuid, stock_name)
+                        avg_cost = position['average_cost'] if position else None
                         
                         content += f"持有股数: {holding}\n"
                         content += f"持仓市值: ${market_value:.2f}\n"
@@ -534,7 +537,7 @@ class UIManager:
                             profit_loss_percent = (profit_loss / cost) * 100 if cost > 0 else 0
                             
                             # 获取颜色
-                            profit_color = self.plugin.player_settings_manager.get_color_for_change(xuid, profit_loss)
+                            profit_color = palette.for_change(profit_loss)
                             
                             content += f"平均成本: ${avg_cost:.2f}\n"
                             
@@ -544,6 +547,12 @@ class UIManager:
                                 content += f"盈亏: {profit_color}${profit_loss:.2f} ({profit_loss_percent:.2f}%%)§r\n"
                             else:
                                 content += f"盈亏: §7${profit_loss:.2f} (0.00%%)§r\n"
+                        
+                        if position and position['realized_pnl']:
+                            realized_pnl = position['realized_pnl']
+                            realized_color = palette.for_change(realized_pnl)
+                            realized_sign = "+" if realized_pnl > 0 else ""
+                            content += f"已实现盈亏: {realized_color}{realized_sign}${realized_pnl:.2f}§r\n"
                     else:
                         content += f"您目前未持有该股票\n"
                     
@@ -603,24 +612,15 @@ class UIManager:
                         
                         player.send_form(detail_panel)
                     
-                    self.plugin.server.scheduler.run_task(
-                        self.plugin,
-                        show_panel,
-                        delay=0
-                    )
+                    self.ui_requests.deliver(request, show_panel)
                     
                 except Exception as e:
                     print(f"加载股票详情数据错误: {str(e)}")
                     import traceback
                     traceback.print_exc()
-                    self.plugin.server.scheduler.run_task(
-                        self.plugin,
-                        lambda: player.send_message("§c加载股票详情时发生错误"),
-                        delay=0
-                    )
+                    self.ui_requests.deliver(request, lambda: player.send_message("§c加载股票详情时发生错误"))
             
-            thread = threading.Thread(target=load_data)
-            thread.start()
+            self.ui_requests.start(xuid, "stock_detail", (stock_name, from_holdings), load_data)
             
         except Exception as e:
             print(f"显示股票详情错误: {str(e)}")
@@ -656,10 +656,7 @@ class UIManager:
         """显示价格走势面板"""
         player.send_message(f"正在查询 {stock_name} 的价格走势...")
         
-        # 使用线程执行查询，然后用调度器在主线程显示UI
-        import threading
-        
-        def show_history(unit):
+        def show_history(request):
             try:
                 xuid = player.xuid
                 if unit == "minute":
@@ -674,11 +671,7 @@ class UIManager:
                 
                 if price_list is None:
                     # 使用调度器在主线程发送消息
-                    self.plugin.server.scheduler.run_task(
-                        self.plugin,
-                        lambda: player.send_message(f"无法获取 {stock_name} 的价格数据"),
-                        delay=0
-                    )
+                    self.ui_requests.deliver(request, lambda: player.send_message(f"无法获取 {stock_name} 的价格数据"))
                     return
                 
                 # 构建价格走势内容
@@ -686,6 +679,7 @@ class UIManager:
                 content += f"近{unit_zh}价格变化:\n\n"
                 
                 price_list = price_list[-11:]  # 取最后11天（包括基准日）
+                palette = self.plugin.player_settings_manager.get_palette(xuid)
                 
                 for idx in range(1, len(price_list)):
                     prev_price = price_list[idx - 1]
@@ -694,7 +688,7 @@ class UIManager:
                     change_percent = (change / prev_price * 100) if prev_price > 0 else 0
                     
                     # 获取颜色
-                    color = self.plugin.player_settings_manager.get_color_for_change(xuid, change)
+                    color = palette.for_change(change)
                     
                     # 格式化显示
                     if change > 0:
@@ -740,25 +734,16 @@ class UIManager:
                     
                     player.send_form(history_panel)
                 
-                self.plugin.server.scheduler.run_task(
-                    self.plugin,
-                    show_panel,
-                    delay=0
-                )
+                self.ui_requests.deliver(request, show_panel)
                 
             except Exception as e:
                 print(f"查询价格走势错误: {str(e)}")
                 import traceback
                 traceback.print_exc()
                 # 使用调度器在主线程发送消息
-                self.plugin.server.scheduler.run_task(
-                    self.plugin,
-                    lambda: player.send_message("查询价格走势时发生错误"),
-                    delay=0
-                )
+                self.ui_requests.deliver(request, lambda: player.send_message("查询价格走势时发生错误"))
         
-        thread = threading.Thread(target=show_history, args=[unit])
-        thread.start()
+        self.ui_requests.start(player.xuid, "price_history", (stock_name, unit), show_history)
     
     # ==================== 买入面板 ====================
     def show_buy_panel(self, player, stock_name: str, market_price:float):
@@ -767,8 +752,8 @@ class UIManager:
             xuid = player.xuid
             
             # 获取账户余额（这个不需要实时价格）
-            balance = self.plugin.stock_dao.get_balance(xuid)
-            fee_rate = self.plugin.setting_manager.get_trading_fee_rate()
+            balance = self.plugin.account_ledger.get_balance(xuid)
+            fee_rate = self.plugin.setting_manager.settings.trading_fee_rate
             fee = Decimal(str(market_price)) * Decimal(0.01) * Decimal(str(fee_rate))
             
             # 直接显示UI，不获取价格
@@ -807,7 +792,7 @@ class UIManager:
 
     def _confirm_buy_stock(self, player, stock_name: str, json_str: str, market_price: float):
         try:            
-            fee_rate = self.plugin.setting_manager.get_trading_fee_rate()
+            fee_rate = self.plugin.setting_manager.settings.trading_fee_rate
             fee = Decimal(str(market_price)) * Decimal('0.01') * Decimal(str(fee_rate))
 
             data = json.loads(json_str)
@@ -849,7 +834,7 @@ class UIManager:
 
     def _confirm_sell_stock(self, player, stock_name: str, json_str: str, market_price: float, holding):
         try:            
-            fee_rate = self.plugin.setting_manager.get_trading_fee_rate()
+            fee_rate = self.plugin.setting_manager.settings.trading_fee_rate
             fee = Decimal(str(market_price)) * Decimal('0.01') * Decimal(str(fee_rate))
 
             data = json.loads(json_str)
@@ -961,8 +946,8 @@ class UIManager:
             xuid = player.xuid
             
             # 获取持仓（这个不需要实时价格）
-            holding = self.plugin.stock_dao.get_player_stock_holding(xuid, stock_name)
-            fee_rate = self.plugin.setting_manager.get_trading_fee_rate()
+            holding = self.plugin.account_ledger.get_holding(xuid, stock_name)
+            fee_rate = self.plugin.setting_manager.settings.trading_fee_rate
             fee = Decimal(str(market_price)) * Decimal(0.01) * Decimal(str(fee_rate))
             
             if holding <= 0:
@@ -1061,11 +1046,24 @@ class UIManager:
         player.send_form(result_form)
     
     # ==================== 历史订单面板 ====================
-    def show_orders_panel(self, player, page: int = 0):
-        """显示历史订单面板"""
+    def show_orders_panel(self, player, before_id: int = None, cursor_stack: tuple = (), has_archived: bool = None):
+        """
+        显示历史订单面板
+        :param before_id: 当前页的游标，为空时显示第一页
+        :param cursor_stack: 之前各页的游标，用于返回上一页
+        :param has_archived: 玩家是否有已归档的订单，打开面板时查询一次，翻页时沿用
+        """
         try:
             xuid = player.xuid
-            orders = self.plugin.stock_dao.get_orders(xuid, page=page, page_size=10)
+            page_size = 10
+            if has_archived is None:
+                has_archived = self.plugin.stock_dao.has_archived_orders(xuid)
+            # 多取一条用于判断是否还有下一页
+            orders = self.plugin.stock_dao.get_orders(
+                xuid, before_id=before_id, page_size=page_size + 1, has_archived=has_archived
+            )
+            has_next_page = len(orders) > page_size
+            orders = orders[:page_size]
             
             if not orders:
                 no_orders_form = ActionForm(
@@ -1099,17 +1097,28 @@ class UIManager:
             )
             
             # 如果有下一页，添加按钮
-            if len(orders) >= 10:
+            if has_next_page:
                 orders_panel.add_button(
                     "下一页",
-                    on_click=lambda sender: self.show_orders_panel(sender, page + 1)
+                    on_click=lambda sender: self.show_orders_panel(
+                        sender, orders[-1]['id'], cursor_stack + (before_id,), has_archived
+                    )
                 )
             
             # 如果不是第一页，添加上一页按钮
-            if page > 0:
+            if cursor_stack:
                 orders_panel.add_button(
                     "上一页",
-                    on_click=lambda sender: self.show_orders_panel(sender, page - 1)
+                    on_click=lambda sender: self.show_orders_panel(
+                        sender, cursor_stack[-1], cursor_stack[:-1], has_archived
+                    )
+                )
+            
+            # 有已归档的订单时，添加按月汇总按钮
+            if has_archived:
+                orders_panel.add_button(
+                    "归档订单月度汇总",
+                    on_click=lambda sender: self.show_archived_orders_summary_panel(sender)
                 )
             
             # 添加返回按钮
@@ -1126,12 +1135,42 @@ class UIManager:
             traceback.print_exc()
             player.send_message("§c显示订单面板时发生错误")
     
+    def show_archived_orders_summary_panel(self, player):
+        """显示已归档订单的按月汇总"""
+        try:
+            summaries = self.plugin.stock_dao.get_archived_order_summary(player.xuid)
+            
+            content = "=== 归档订单月度汇总 ===\n\n"
+            for summary in summaries:
+                month = summary['month']
+                content += f"{month[:4]}年{month[4:]}月 | 订单: {summary['order_count']}笔\n"
+                content += f"  买入: {summary['buy_share']}股 | ${summary['buy_total']:.2f}\n"
+                content += f"  卖出: {summary['sell_share']}股 | ${summary['sell_total']:.2f}\n"
+                content += f"  手续费: ${summary['tax_total']:.2f}\n\n"
+            
+            summary_panel = ActionForm(
+                title="归档订单月度汇总",
+                content=content,
+                on_close=lambda sender: self.show_orders_panel(sender)
+            )
+            summary_panel.add_button(
+                "返回历史订单",
+                on_click=lambda sender: self.show_orders_panel(sender)
+            )
+            player.send_form(summary_panel)
+            
+        except Exception as e:
+            print(f"显示归档订单汇总错误: {str(e)}")
+            import traceback
+            traceback.print_exc()
+            player.send_message("§c显示归档订单汇总时发生错误")
+    
     # ==================== 账户管理面板 ====================
     def show_account_panel(self, player):
         """显示账户管理面板"""
         try:
             xuid = player.xuid
-            balance = self.plugin.stock_dao.get_balance(xuid)
+            balance = self.plugin.account_ledger.get_balance(xuid)
             game_balance = self.plugin.economy_plugin.get_player_money(player)
             
             content = f"=== 账户管理 ===\n\n"
@@ -1210,7 +1249,8 @@ class UIManager:
             
             # 执行转账
             self.plugin.economy_plugin.decrease_player_money(player, amount)
-            self.plugin.stock_dao.increase_balance(player.xuid, amount, is_transfer_in=True)
+            self.plugin.account_ledger.increase_balance(player.xuid, amount)
+            self.plugin.valuation_engine.mark_player_dirty(player.xuid)
             
             player.send_message(f"§a成功转入 ${amount:.2f} 到股票账户")
             self.show_account_panel(player)
@@ -1221,7 +1261,7 @@ class UIManager:
     
     def show_transfer_out_panel(self, player):
         """显示转出面板"""
-        stock_balance = self.plugin.stock_dao.get_balance(player.xuid)
+        stock_balance = self.plugin.account_ledger.get_balance(player.xuid)
         
         transfer_form = ModalForm(
             title="转出资金",
@@ -1254,14 +1294,15 @@ class UIManager:
                 return
             
             # 检查余额
-            stock_balance = self.plugin.stock_dao.get_balance(player.xuid)
+            stock_balance = self.plugin.account_ledger.get_balance(player.xuid)
             if stock_balance < amount:
                 player.send_message(f"§c股票账户余额不足，当前余额: ${stock_balance:.2f}")
                 self.show_transfer_out_panel(player)
                 return
             
             # 执行转账
-            self.plugin.stock_dao.decrease_balance(player.xuid, amount, is_transfer_out=True)
+            self.plugin.account_ledger.decrease_balance(player.xuid, amount)
+            self.plugin.valuation_engine.mark_player_dirty(player.xuid)
             self.plugin.economy_plugin.increase_player_money(player, amount)
             
             player.send_message(f"§a成功转出 ${amount:.2f} 到游戏账户")
@@ -1303,6 +1344,15 @@ class UIManager:
                 on_click=lambda sender: self._set_color_scheme(sender, 'green_up')
             )
             
+            # 语言选项，每种提供了消息文件的语言一个按钮
+            current_locale = self.plugin.player_settings_manager.get_locale(xuid) or self.plugin.message_catalog.default_locale
+            for locale in self.plugin.message_catalog.available_locales():
+                marker = " (当前)" if locale == current_locale else ""
+                settings_panel.add_button(
+                    f"语言: {self.plugin.message_catalog.format(locale, 'locale.name')}{marker}",
+                    on_click=lambda sender, locale=locale: self._set_locale(sender, locale)
+                )
+            
             settings_panel.add_button(
                 "返回主菜单",
                 on_click=lambda sender: self.show_main_panel(sender)
@@ -1329,6 +1379,82 @@ class UIManager:
         # 返回设置面板
         self.show_player_settings_panel(player)
     
+    def _set_locale(self, player, locale: str):
+        """设置语言"""
+        if self.plugin.player_settings_manager.set_locale(player.xuid, locale):
+            player.send_message(f"已设置语言为: {self.plugin.message_catalog.format(locale, 'locale.name')}")
+        else:
+            player.send_message("设置语言失败")
+        
+        # 返回设置面板
+        self.show_player_settings_panel(player)
+    
+    # ==================== 收益走势面板 ====================
+    def show_performance_panel(self, player, days: int = 30):
+        """显示玩家每日财富和盈亏走势"""
+        try:
+            xuid = player.xuid
+            history = self.plugin.wealth_history_manager.get_recent_history(xuid, days)
+            
+            content = f"=== 近{days}天收益走势 ===\n\n"
+            
+            if not history:
+                content += "暂无数据，每日排行榜更新后会记录您的财富快照\n"
+            
+            palette = self.plugin.player_settings_manager.get_palette(xuid)
+            prev_wealth = None
+            for record in history:
+                total_wealth = record['total_wealth']
+                profit_loss = record['absolute_profit_loss']
+                
+                if prev_wealth is None:
+                    content += f"{record['date']:%m-%d} ${total_wealth:.2f} §7━§r\n"
+                else:
+                    change = total_wealth - prev_wealth
+                    color = palette.for_change(change)
+                    if change > 0:
+                        content += f"{record['date']:%m-%d} ${total_wealth:.2f} {color}▲+${abs(change):.2f}§r\n"
+                    elif change < 0:
+                        content += f"{record['date']:%m-%d} ${total_wealth:.2f} {color}▼-${abs(change):.2f}§r\n"
+                    else:
+                        content += f"{record['date']:%m-%d} ${total_wealth:.2f} §7━§r\n"
+                prev_wealth = total_wealth
+            
+            if history:
+                profit_loss = history[-1]['absolute_profit_loss']
+                color = palette.for_change(profit_loss)
+                sign = "+" if profit_loss > 0 else ""
+                content += f"\n当前累计盈亏: {color}{sign}${profit_loss:.2f}§r\n"
+            
+            performance_panel = ActionForm(
+                title="收益走势",
+                content=content
+            )
+            
+            if days < 365:
+                performance_panel.add_button(
+                    "查看近一年",
+                    on_click=lambda sender: self.show_performance_panel(sender, 365)
+                )
+            else:
+                performance_panel.add_button(
+                    "查看近30天",
+                    on_click=lambda sender: self.show_performance_panel(sender, 30)
+                )
+            
+            performance_panel.add_button(
+                "返回主菜单",
+                on_click=lambda sender: self.show_main_panel(sender)
+            )
+            
+            player.send_form(performance_panel)
+            
+        except Exception as e:
+            print(f"显示收益走势面板错误: {str(e)}")
+            import traceback
+            traceback.print_exc()
+            player.send_message("§c显示收益走势时发生错误")
+    
     # ==================== 排行榜面板 ====================
     def show_leaderboard_menu(self, player):
         """显示排行榜菜单"""
@@ -1395,19 +1521,22 @@ class UIManager:
             last_updated = stored_data[0]['last_updated'] if stored_data else time.time()
             
             # 获取玩家颜色配置
-            up_color = self.plugin.player_settings_manager.get_up_color(xuid)
-            down_color = self.plugin.player_settings_manager.get_down_color(xuid)
+            palette = self.plugin.player_settings_manager.get_palette(xuid)
+            # 一次性获取上榜玩家的名称
+            names = self.plugin.player_name_cache.get_names(
+                data['player_xuid'] for data in (*stored_data[:5], *stored_data[-5:])
+            )
             
             # 构建内容
             content = f"=== 绝对盈亏排行榜 (更新时间: {datetime.datetime.fromtimestamp(last_updated).strftime('%Y-%m-%d %H:%M:%S')} ===\n\n"
             
             # 显示前5名
             for idx, data in enumerate(stored_data[:5], 1):
-                player_name = self._get_player_name(data['player_xuid'])
+                player_name = names[data['player_xuid']]
                 profit_loss = data['absolute_profit_loss']
                 
                 # 使用统一的颜色逻辑
-                color = self.plugin.player_settings_manager.get_color_for_change(xuid, profit_loss)
+                color = palette.for_change(profit_loss)
                 if profit_loss > 0:
                     sign = "+"
                 elif profit_loss < 0:
@@ -1422,14 +1551,13 @@ class UIManager:
             content += "§l§7倒数5名 (韭菜榜)§r\n\n"
             
             # 显示倒数5名
-            bottom_5 = stored_data[-5:]
-            bottom_5.reverse()
+            bottom_5 = list(reversed(stored_data[-5:]))
             for idx, data in enumerate(bottom_5, 1):
-                player_name = self._get_player_name(data['player_xuid'])
+                player_name = names[data['player_xuid']]
                 profit_loss = data['absolute_profit_loss']
                 
                 # 使用统一的颜色逻辑
-                color = self.plugin.player_settings_manager.get_color_for_change(xuid, profit_loss)
+                color = palette.for_change(profit_loss)
                 if profit_loss > 0:
                     sign = "+"
                 elif profit_loss < 0:
@@ -1449,6 +1577,11 @@ class UIManager:
                     content=content
                 )
                 
+                leaderboard_panel.add_button(
+                    "查看完整榜单",
+                    on_click=lambda sender: self.show_leaderboard_page(sender, is_absolute=True)
+                )
+                
                 leaderboard_panel.add_button(
                     "返回排行榜菜单",
                     on_click=lambda sender: self.show_leaderboard_menu(sender)
@@ -1501,8 +1634,11 @@ class UIManager:
             last_updated = stored_data[0]['last_updated'] if stored_data else time.time()
             
             # 获取玩家颜色配置
-            up_color = self.plugin.player_settings_manager.get_up_color(xuid)
-            down_color = self.plugin.player_settings_manager.get_down_color(xuid)
+            palette = self.plugin.player_settings_manager.get_palette(xuid)
+            # 一次性获取上榜玩家的名称
+            names = self.plugin.player_name_cache.get_names(
+                data['player_xuid'] for data in (*stored_data[:5], *stored_data[-5:])
+            )
             
             # 构建内容
             content = f"=== 相对盈亏排行榜 (更新时间: {datetime.datetime.fromtimestamp(last_updated).strftime('%Y-%m-%d %H:%M:%S')} ===\n\n"
@@ -1510,12 +1646,12 @@ class UIManager:
             
             # 显示前5名
             for idx, data in enumerate(stored_data[:5], 1):
-                player_name = self._get_player_name(data['player_xuid'])
+                player_name = names[data['player_xuid']]
                 profit_loss_percent = data['relative_profit_loss']
                 profit_loss = data['absolute_profit_loss']
                 
                 # 使用统一的颜色逻辑
-                color = self.plugin.player_settings_manager.get_color_for_change(xuid, profit_loss)
+                color = palette.for_change(profit_loss)
                 if profit_loss_percent > 0:
                     sign = "+"
                 elif profit_loss_percent < 0:
@@ -1530,15 +1666,14 @@ class UIManager:
             content += "§l§7倒数5名 (接盘侠榜)§r\n\n"
             
             # 显示倒数5名
-            bottom_5 = stored_data[-5:]
-            bottom_5.reverse()
+            bottom_5 = list(reversed(stored_data[-5:]))
             for idx, data in enumerate(bottom_5, 1):
-                player_name = self._get_player_name(data['player_xuid'])
+                player_name = names[data['player_xuid']]
                 profit_loss_percent = data['relative_profit_loss']
                 profit_loss = data['absolute_profit_loss']
                 
                 # 使用统一的颜色逻辑
-                color = self.plugin.player_settings_manager.get_color_for_change(xuid, profit_loss)
+                color = palette.for_change(profit_loss)
                 if profit_loss_percent > 0:
                     sign = "+"
                 elif profit_loss_percent < 0:
@@ -1558,6 +1693,11 @@ class UIManager:
                     content=content
                 )
                 
+                leaderboard_panel.add_button(
+                    "查看完整榜单",
+                    on_click=lambda sender: self.show_leaderboard_page(sender, is_absolute=False)
+                )
+                
                 leaderboard_panel.add_button(
                     "返回排行榜菜单",
                     on_click=lambda sender: self.show_leaderboard_menu(sender)
@@ -1582,260 +1722,118 @@ class UIManager:
             )
     
     
-    def _get_player_name(self, player_xuid: str) -> str:
+    def show_leaderboard_page(self, player, is_absolute: bool, page: int = None, page_size: int = 10):
         """
-        根据XUID获取玩家名称
-        :param player_xuid: 玩家XUID
-        :return: 玩家名称，如果获取不到则返回XUID前8位
+        分页显示完整排行榜
+        :param is_absolute: 是否为绝对盈亏榜
+        :param page: 页码（从0开始），为空时跳转到玩家自己所在的页
+        :param page_size: 每页数量
         """
         try:
-            # 使用arc_core插件获取玩家名称
-            arc_core = self.plugin.server.plugin_manager.get_plugin('arc_core')
-            if arc_core:
-                player_name = arc_core.get_player_name_by_xuid(player_xuid)
-                if player_name:
-                    return player_name
-            
-            # 如果获取失败，返回XUID的前8位作为标识
-            return f"玩家{player_xuid[:8]}"
-        except:
-            return f"玩家{player_xuid[:8]}"
-    
-    # ==================== 教学指引面板 ====================
-    def show_help_panel(self, player):
-        """显示教学指引面板"""
-        try:
-            # 获取当前手续费率
-            fee_rate = self.plugin.setting_manager.get_trading_fee_rate()
-            
-            help_content = f'''§c警告：本插件为模拟美股交易插件，您的所有操作均为模拟操作，不会产生真实交易。您只能将股票买卖的利润转为游戏币，您永远无法将其提现为现实中可交易的货币。
-
-§6欢迎来到"荣辱浮沉 (Ups and Downs)" 股票插件，在这里，你可以让自己的财富名列服务器榜首，又或者跟随某个臭名昭著的企业的股票一夜蒸发。
-
-§6这里的一切股票价格都跟实时同步美股市场，所以我强烈推荐你用现实中的股票软件选股和盯盘。股票价格是非常珍贵的数据，我们所提供的数据也仅供参考。
-
-§6如果你不会查股票？那我建议你学起来，毕竟在这里验证你的智商后，你也会迈向亏光家产，哦不，我是说盆满钵满的那一天，你说对吧？
-
-§h=== 股票基础知识 ===
-
-§a• 股票价格：反映市场对公司价值的评估
-§a• 成交量：交易活跃度，量大说明关注度高
-§a• 基本面：公司财务状况、盈利能力等
-§a• 技术面：价格走势、图表形态等
-§a• 消息面：新闻、公告对股价的影响
-
-§h=== 交易策略 ===
-
-§a• 价值投资：买入被低估的优质公司
-§a• 趋势交易：跟随价格趋势进行买卖
-§a• 短线交易：利用短期价格波动获利
-§a• 分散投资：不要把所有资金投入一只股票
-§a• 止损止盈：设定合理的盈亏目标
-
-§h=== 风险提示 ===
-
-§a• 股市有风险，投资需谨慎
-§a• 不要借钱炒股，只用闲钱投资
-§a• 保持冷静，不要被情绪左右
-§a• 学习为主，盈利为辅
-
-§h=== 功能说明 ===
-
-§a• 手续费：每笔交易收取{fee_rate}%%手续费
-§a• 市价单：按当前市场价格立即成交
-§a• 限价单：指定价格，只有价格合适时才成交
-§a• 时间范围：支持查看10分钟、10天、10个月的价格走势
-
-§s提示：建议使用专业股票软件查询最新价格'''
+            xuid = player.xuid
+            title = "绝对盈亏榜" if is_absolute else "相对盈亏榜"
             
-            help_panel = ActionForm(
-                title="教学指引",
-                content=help_content
-            )
+            if page is None:
+                player_rank = self.plugin.get_player_rank(xuid, is_absolute)
+                page = (player_rank[0] - 1) // page_size if player_rank else 0
             
-            help_panel.add_button(
-                "基础知识详解",
-                on_click=lambda sender: self.show_basic_knowledge_panel(sender)
-            )
+            start_rank = page * page_size + 1
+            window = self.plugin.get_leaderboard_window(is_absolute, start_rank, start_rank + page_size - 1)
             
-            help_panel.add_button(
-                "交易技巧进阶",
-                on_click=lambda sender: self.show_trading_tips_panel(sender)
-            )
-            
-            help_panel.add_button(
-                "风险管理指南",
-                on_click=lambda sender: self.show_risk_management_panel(sender)
-            )
+            if not window or not window[0]:
+                no_data_form = ActionForm(
+                    title=title,
+                    content="暂无数据",
+                    on_close=lambda sender: self.show_leaderboard_menu(sender)
+                )
+                player.send_form(no_data_form)
+                return
             
-            help_panel.add_button(
-                "返回主菜单",
-                on_click=lambda sender: self.show_main_panel(sender)
-            )
+            rows, total_players = window
+            total_pages = (total_players + page_size - 1) // page_size
             
-            player.send_form(help_panel)
+            content = f"=== {title} 第{page + 1}/{total_pages}页 ===\n\n"
+            palette = self.plugin.player_settings_manager.get_palette(xuid)
+            names = self.plugin.player_name_cache.get_names(data['player_xuid'] for data in rows)
             
-        except Exception as e:
-            print(f"显示教学指引面板错误: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            player.send_message("§c显示教学指引时发生错误")
-    
-    def show_basic_knowledge_panel(self, player):
-        """显示基础知识详解面板"""
-        try:
-            content = '''§h=== 股票基础知识详解 ===
-
-§6什么是股票？
-§a股票是公司所有权的凭证，持有股票就是公司的股东。
-
-§6股票价格如何决定？
-§a• 供需关系：买的人多价格涨，卖的人多价格跌
-§a• 公司业绩：盈利增长通常推动股价上涨
-§a• 市场情绪：投资者信心影响买卖决策
-§a• 宏观经济：经济环境对股市整体影响
-
-§6重要概念解释：
-§a• 市值 = 股价 × 总股本
-§a• 市盈率 = 股价 ÷ 每股收益
-§a• 成交量：某时间段内的交易数量
-§a• 换手率：成交量 ÷ 流通股本
-
-§6基本面分析：
-§a• 财务报表：收入、利润、负债等
-§a• 行业地位：公司在行业中的竞争力
-§a• 管理层：公司领导层的能力和诚信
-§a• 发展前景：公司未来增长潜力
-
-§6技术面分析：
-§a• K线图：显示价格走势的图表
-§a• 支撑位：价格下跌时的支撑点
-§a• 阻力位：价格上涨时的阻力点
-§a• 趋势线：价格运行的主要方向
-
-§s记住：投资需要不断学习，理论与实践相结合！'''
+            for data in rows:
+                player_name = names[data['player_xuid']]
+                profit_loss = data['absolute_profit_loss']
+                profit_loss_percent = data['relative_profit_loss']
+                
+                # 使用统一的颜色逻辑
+                color = palette.for_change(profit_loss)
+                sign = "+" if profit_loss > 0 else ""
+                
+                # 标记玩家自己
+                marker = "§e>> " if data['player_xuid'] == xuid else ""
+                content += f"{marker}#{data['rank']} {player_name}§r\n"
+                content += f"   盈亏: {color}{sign}${profit_loss:.2f} ({sign}{profit_loss_percent:.2f}%%)§r\n"
             
-            panel = ActionForm(
-                title="基础知识详解",
+            page_panel = ActionForm(
+                title=title,
                 content=content
             )
             
-            panel.add_button(
-                "返回教学指引",
-                on_click=lambda sender: self.show_help_panel(sender)
-            )
-            
-            player.send_form(panel)
-            
-        except Exception as e:
-            print(f"显示基础知识面板错误: {str(e)}")
-            player.send_message("§c显示基础知识时发生错误")
-    
-    def show_trading_tips_panel(self, player):
-        """显示交易技巧进阶面板"""
-        try:
-            content = '''§h=== 交易技巧进阶 ===
-
-§6买入时机选择：
-§a• 低位买入：价格相对较低时买入
-§a• 突破买入：价格突破重要阻力位时
-§a• 回调买入：上涨趋势中的回调机会
-§a• 消息面买入：利好消息发布后
-
-§6卖出时机选择：
-§a• 高位卖出：价格相对较高时卖出
-§a• 止损卖出：价格跌破支撑位时
-§a• 获利了结：达到预期收益目标
-§a• 消息面卖出：利空消息发布后
-
-§6订单类型使用：
-§a• 市价单：急于成交时使用
-§a• 限价单：希望控制成交价格时
-§a• 止损单：自动止损保护资金
-§a• 止盈单：自动获利了结
-
-§6资金管理技巧：
-§a• 分批建仓：不要一次性全仓买入
-§a• 仓位控制：单只股票不超过总资金的30%%
-§a• 加仓策略：盈利时适当加仓
-§a• 减仓策略：亏损时及时减仓
-
-§6心理控制：
-§a• 保持冷静：不要被情绪左右
-§a• 制定计划：按计划执行交易
-§a• 接受亏损：亏损是交易的一部分
-§a• 持续学习：不断提升交易技能
-
-§s记住：没有完美的交易策略，适合自己的才是最好的！'''
+            if page + 1 < total_pages:
+                page_panel.add_button(
+                    "下一页",
+                    on_click=lambda sender: self.show_leaderboard_page(sender, is_absolute, page + 1, page_size)
+                )
             
-            panel = ActionForm(
-                title="交易技巧进阶",
-                content=content
-            )
+            if page > 0:
+                page_panel.add_button(
+                    "上一页",
+                    on_click=lambda sender: self.show_leaderboard_page(sender, is_absolute, page - 1, page_size)
+                )
             
-            panel.add_button(
-                "返回教学指引",
-                on_click=lambda sender: self.show_help_panel(sender)
+            page_panel.add_button(
+                "返回排行榜菜单",
+                on_click=lambda sender: self.show_leaderboard_menu(sender)
             )
             
-            player.send_form(panel)
+            player.send_form(page_panel)
             
         except Exception as e:
-            print(f"显示交易技巧面板错误: {str(e)}")
-            player.send_message("§c显示交易技巧时发生错误")
+            print(f"显示完整排行榜错误: {str(e)}")
+            import traceback
+            traceback.print_exc()
+            player.send_message("显示完整排行榜时发生错误")
+    
     
-    def show_risk_management_panel(self, player):
-        """显示风险管理指南面板"""
+    # ==================== 教学指引面板 ====================
+    def show_help_panel(self, player):
+        """显示教学指引面板"""
+        self.show_tutorial_page(player, "help")
+    
+    def show_tutorial_page(self, player, page_id: str):
+        """
+        显示教学指引中的一页，内容在插件加载时已编译好
+        :param page_id: 页面ID，见 locales/<语言>/tutorial.json
+        """
         try:
-            content = '''§h=== 风险管理指南 ===
-
-§c风险警示：
-§4股市有风险，投资需谨慎！本插件仅为模拟交易，请勿将虚拟经验直接应用于真实投资。
-
-§6主要风险类型：
-§a• 市场风险：整体市场下跌的风险
-§a• 个股风险：单只股票价格波动的风险
-§a• 流动性风险：无法及时买卖的风险
-§a• 政策风险：政策变化对股市的影响
-
-§6风险管理原则：
-§a• 分散投资：不要把所有资金投入一只股票
-§a• 控制仓位：单只股票不超过总资金的30%%
-§a• 设置止损：为每笔交易设定最大亏损额度
-§a• 分批建仓：避免一次性全仓买入
-
-§6止损策略：
-§a• 固定止损：设定固定的亏损比例
-§a• 技术止损：基于技术分析设定止损位
-§a• 时间止损：设定持仓时间限制
-§a• 情绪止损：当情绪失控时及时退出
-
-§6资金管理：
-§a• 只用闲钱：不要借钱或使用生活必需资金
-§a• 控制杠杆：避免过度使用杠杆
-§a• 保留现金：始终保持一定的现金储备
-§a• 定期评估：定期评估投资组合风险
-
-§6心理管理：
-§a• 保持理性：不要被贪婪和恐惧控制
-§a• 接受亏损：亏损是交易的一部分
-§a• 控制情绪：避免情绪化交易
-§a• 持续学习：不断提升风险管理能力
-
-§s记住：保护本金比追求高收益更重要！'''
+            page, content = self.plugin.tutorial_content.render(
+                page_id,
+                self.plugin.player_settings_manager.get_locale(player.xuid),
+                fee_rate=self.plugin.setting_manager.settings.trading_fee_rate
+            )
             
             panel = ActionForm(
-                title="风险管理指南",
+                title=page.title,
                 content=content
             )
             
-            panel.add_button(
-                "返回教学指引",
-                on_click=lambda sender: self.show_help_panel(sender)
-            )
+            for text, target in page.buttons:
+                if target == "main":
+                    on_click = lambda sender: self.show_main_panel(sender)
+                else:
+                    on_click = lambda sender, target=target: self.show_tutorial_page(sender, target)
+                panel.add_button(text, on_click=on_click)
             
             player.send_form(panel)
             
         except Exception as e:
-            print(f"显示风险管理面板错误: {str(e)}")
-            player.send_message("§c显示风险管理时发生错误")
+            print(f"显示教学指引面板错误: {str(e)}")
+            import traceback
+            traceback.print_exc()
+            player.send_message("§c显示教学指引时发生错误")
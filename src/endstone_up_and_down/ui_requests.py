@@ -0,0 +1,103 @@
+"""
+界面加载请求合并 - 同一玩家同一面板的后台加载同时只保留一个，过时的结果直接丢弃
+"""
+import threading
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+
+class UIRequest:
+    """一次面板加载请求"""
+    __slots__ = ("key", "params", "generation", "_coordinator")
+
+    def __init__(self, coordinator: "UIRequestCoordinator", key: Tuple[str, str], params: Hashable, generation: int):
+        self._coordinator = coordinator
+        self.key = key
+        self.params = params
+        self.generation = generation
+
+    def is_current(self) -> bool:
+        """是否仍是该面板最新的请求（没有被之后的请求取代）"""
+        return self._coordinator.is_current(self)
+
+
+class UIRequestCoordinator:
+    def __init__(self, scheduler_func: Callable[[Callable], None]):
+        """
+        初始化请求合并器
+        :param scheduler_func: 在主线程执行函数的方法，结果通过它发送给玩家
+        """
+        self.scheduler_func = scheduler_func
+        # (玩家XUID, 面板) -> 最新请求
+        self._latest: Dict[Tuple[str, str], UIRequest] = {}
+        # 仍在后台加载中的请求
+        self._pending: Dict[Tuple[str, str], UIRequest] = {}
+        self._lock = threading.Lock()
+
+    def begin(self, player_xuid: str, panel: str, params: Hashable = None) -> Optional[UIRequest]:
+        """
+        开始一次面板加载
+        参数相同的请求仍在加载时合并到该请求（返回None，调用方不再启动加载）；
+        参数不同时新请求取代旧请求，旧请求的结果不再发送
+        :param player_xuid: 玩家XUID
+        :param panel: 面板名称
+        :param params: 面板参数，例如页码游标、时间范围
+        :return: 新请求，合并到已有请求时返回None
+        """
+        key = (player_xuid, panel)
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is not None and pending.params == params:
+                return None
+
+            latest = self._latest.get(key)
+            request = UIRequest(self, key, params, latest.generation + 1 if latest else 1)
+            self._latest[key] = request
+            self._pending[key] = request
+            return request
+
+    def start(self, player_xuid: str, panel: str, params: Hashable, load_func: Callable[[UIRequest], None]) -> None:
+        """
+        在后台线程执行加载，重复的请求会被合并
+        :param load_func: 加载函数，参数为请求，结果通过 deliver 发送
+        """
+        request = self.begin(player_xuid, panel, params)
+        if request is None:
+            return
+
+        def run():
+            try:
+                load_func(request)
+            finally:
+                self.finish(request)
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def finish(self, request: UIRequest) -> None:
+        """后台加载结束，之后相同参数的请求会重新加载"""
+        with self._lock:
+            if self._pending.get(request.key) is request:
+                del self._pending[request.key]
+
+    def is_current(self, request: UIRequest) -> bool:
+        with self._lock:
+            return self._latest.get(request.key) is request
+
+    def deliver(self, request: UIRequest, func: Callable[[], None]) -> None:
+        """
+        在主线程发送加载结果，发送前请求已被取代时丢弃
+        :param request: 请求
+        :param func: 发送表单或消息的函数
+        """
+        def run():
+            if request.is_current():
+                func()
+
+        if request.is_current():
+            self.scheduler_func(run)
+
+    def evict(self, player_xuid: str) -> None:
+        """玩家下线时清除记录"""
+        with self._lock:
+            for store in (self._latest, self._pending):
+                for key in [key for key in store if key[0] == player_xuid]:
+                    del store[key]
@@ -1,5 +1,7 @@
 import datetime
 import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from decimal import *
 import threading
 import random
@@ -7,8 +9,9 @@ from typing import Union
 
 
 from endstone.command import Command, CommandSender
-from endstone.event import EventPriority, ServerLoadEvent, event_handler
+from endstone.event import EventPriority, PlayerJoinEvent, PlayerQuitEvent, ServerLoadEvent, event_handler
 from endstone.plugin import Plugin
+import pandas as pd
 import yfinance as yf
 
 from endstone_up_and_down.databaseManager import DatabaseManager
@@ -20,6 +23,15 @@ from endstone_up_and_down.favorites_manager import FavoritesManager
 from endstone_up_and_down.ui_manager import UIManager
 from endstone_up_and_down.setting_manager import StockSettingManager
 from endstone_up_and_down.player_settings_manager import PlayerSettingsManager
+from endstone_up_and_down.valuation_engine import PortfolioValuationEngine
+from endstone_up_and_down.leaderboard_snapshot import LeaderboardPersister, LeaderboardSnapshot
+from endstone_up_and_down.wealth_history import WealthHistoryManager
+from endstone_up_and_down.account_ledger import AccountLedger
+from endstone_up_and_down.backup_manager import BackupManager
+from endstone_up_and_down.player_names import PlayerNameCache
+from endstone_up_and_down.live_valuation import LiveValuationService
+from endstone_up_and_down.tutorial_content import TutorialContent
+from endstone_up_and_down.message_catalog import MessageCatalog
 
 
 class UpAndDownPlugin(Plugin):
@@ -39,10 +51,12 @@ class UpAndDownPlugin(Plugin):
                                "/stock transferout [amount:int]",
                                "/stock buy [stockName: string] [share:int] [price:float]",
                                "/stock sell [stockName: string] [share:int] [price:float]",
-                               "/stock orders [page:int]",
+                               "/stock orders [before_id:int]",
                                "/stock help",
-                               "/stock shares",
-                               "/stock ui"
+                               "/stock shares [before_id:int]",
+                               "/stock ui",
+                               "/stock dbstats [sortBy: string] [limit: int]",
+                               "/stock backup"
                                ],
                     "permissions": ["up_and_down.command.transaction"]
                 }
@@ -52,16 +66,13 @@ class UpAndDownPlugin(Plugin):
         "up_and_down.command.transaction": {
             "description": "Working on it",
             "default": True,
+        },
+        "up_and_down.command.admin": {
+            "description": "Database statistics and other admin commands",
+            "default": "op",
         }
     }
     
-    order_type_dict = {
-        "buy_flex": "市价单购买",
-        "buy_fix": "限价单购买",
-        "sell_flex": "市价单出售",
-        "sell_fix": "限价单出售"
-    }
-
     def on_load(self) -> None:
         # 初始化配置管理器
         self.setting_manager = StockSettingManager(self.MAIN_PATH)
@@ -75,36 +86,74 @@ class UpAndDownPlugin(Plugin):
             self.logger.info("§e未启用代理")
             yf.set_config(proxy=None)
             
-        # 测试 yfinance 连接
-        try:
-            test_price, tradeable = self.get_stock_last_price("NIO")
-            if test_price:
-                self.logger.info(f"§a[成功] yfinance连接测试成功！NIO当前股票价格: ${test_price}")
-            else:
-                self.logger.warning("§c[失败] yfinance连接测试失败：无法获取NIO的股票价格")
-        except Exception as e:
-            self.logger.error(f"§c[错误] yfinance连接测试失败: {str(e)}")
-        
         # 设置数据库路径
         import os
         db_path = os.path.join(self.MAIN_PATH, "up_and_down.db")
         
-        self.database_manager = DatabaseManager(db_path)
+        self.database_manager = DatabaseManager(db_path, self.setting_manager.get_slow_query_threshold_ms())
         self.stock_dao = StockDao(self.database_manager)
         self.stock_dao.init_tables()
+        # 余额和持股以内存账本为准，余额变动通过日志定时批量写入数据库
+        self.account_ledger = AccountLedger(
+            self.database_manager,
+            os.path.join(self.MAIN_PATH, "account_journal.log"),
+            self.setting_manager.get_ledger_flush_interval_ms()
+        )
+        self.backup_manager = BackupManager(
+            self.database_manager,
+            os.path.join(self.MAIN_PATH, "backups"),
+            self.setting_manager.get_backup_keep()
+        )
         self.lock_manager = LockManager()
+        # 股票代码 -> 是否属于支持交易的市场
+        self.market_available = {}
+        self.valuation_engine = PortfolioValuationEngine(
+            self.database_manager,
+            self.setting_manager.get_leaderboard_price_threshold()
+        )
+        # 主面板的实时财富和盈亏，交易后或价格变化时重新计算
+        self.live_valuation = LiveValuationService(
+            self.database_manager,
+            self.account_ledger,
+            self.valuation_engine,
+            self.get_stock_last_prices
+        )
+        self.leaderboard_executor = None
+        # 从上次持久化的数据恢复排行榜快照
+        self.leaderboard_snapshot = LeaderboardSnapshot.from_rows(self.stock_dao.load_leaderboard_data())
+        # 快照在后台线程写入数据库，只写最新的快照
+        self.leaderboard_persister = LeaderboardPersister(self.stock_dao.save_leaderboard_data)
         
         # 初始化收藏夹管理器、玩家设置管理器和UI管理器
         self.favorites_manager = FavoritesManager(self.database_manager)
         self.player_settings_manager = PlayerSettingsManager(self.database_manager)
+        self.wealth_history_manager = WealthHistoryManager(self.database_manager)
+        self.player_name_cache = PlayerNameCache(self)
+        self.tutorial_content = TutorialContent()
+        self.message_catalog = MessageCatalog()
         self.ui_manager = UIManager(self)
         
+        # 测试 yfinance 连接
+        try:
+            test_price, tradeable = self.get_stock_last_price("NIO")
+            if test_price:
+                self.logger.info(f"§a[成功] yfinance连接测试成功！NIO当前股票价格: ${test_price}")
+            else:
+                self.logger.warning("§c[失败] yfinance连接测试失败：无法获取NIO的股票价格")
+        except Exception as e:
+            self.logger.error(f"§c[错误] yfinance连接测试失败: {str(e)}")
+        
         self.logger.info("§e Up and down Loaded!")
         # self.market_state_listener = MarketStatusListener("AAPL")
         # self.market_state_listener.start_listen()
         
 
     def on_enable(self) -> None:
+        self.register_events(self)
+
+        # 配置文件修改后自动重新加载（手续费率等每次读取的配置立即生效）
+        self.setting_manager.start_watching()
+        
         # Schedule leaderboard update every 30 minutes
         self.server.scheduler.run_task(
             self, 
@@ -112,13 +161,54 @@ class UpAndDownPlugin(Plugin):
             delay=0, 
             period=20 * 60 * 30
         )
+        
+        # Patch the leaderboard between full passes for players that traded or whose stocks moved
+        incremental_interval = self.setting_manager.get_leaderboard_incremental_interval()
+        if incremental_interval > 0:
+            self.server.scheduler.run_task(
+                self,
+                self.update_leaderboard_incremental,
+                delay=20 * incremental_interval,
+                period=20 * incremental_interval
+            )
+
+        # Move old finished orders into monthly archive tables once an hour
+        if self.setting_manager.get_order_archive_days() > 0:
+            self.server.scheduler.run_task(
+                self,
+                self.archive_orders,
+                delay=20 * 60,
+                period=20 * 60 * 60
+            )
+
+        # Online database backup
+        backup_interval = self.setting_manager.get_backup_interval_minutes()
+        if backup_interval > 0:
+            self.server.scheduler.run_task(
+                self,
+                self.backup_database,
+                delay=20 * 60 * backup_interval,
+                period=20 * 60 * backup_interval
+            )
 
         self.economy_plugin = self.server.plugin_manager.get_plugin('arc_core')
         self.qqsync = self.server.plugin_manager.get_plugin('qqsync_plugin')
         
 
     def on_disable(self) -> None:
-        pass
+        if self.leaderboard_executor is not None:
+            self.leaderboard_executor.shutdown(wait=False, cancel_futures=True)
+            self.leaderboard_executor = None
+        
+        self.setting_manager.stop_watching()
+        
+        # 保存最新的排行榜快照（包括增量更新修补后的排名），重启后直接使用
+        if self.leaderboard_snapshot is not None:
+            self.leaderboard_persister.submit(self.leaderboard_snapshot)
+            self.leaderboard_persister.flush(timeout=10)
+        
+        # 写入日志中剩余的余额变动
+        self.account_ledger.close()
 
 
     def execute_command(self, sender: CommandSender, args: list[str], return_value:bool, callback=None, callback_args=None):
@@ -130,15 +220,15 @@ class UpAndDownPlugin(Plugin):
                     if player and hasattr(player, 'send_form'):
                         self.ui_manager.show_main_panel(player)
                     else:
-                        sender.send_message("§c只有玩家可以使用UI面板")
+                        sender.send_message(self.message_catalog.format(None, "command.ui_player_only"))
                     return
                 
                 player = self.server.get_player(sender.name)
                 xuid = player.xuid
                 
                 if args[0] != "transferin":
-                    if not self.stock_dao.check_user_account(xuid):
-                        sender.send_message(f"§e请先使用transferin转入初始资金以激活股票账户")
+                    if not self.account_ledger.has_account(xuid):
+                        sender.send_message(self.tr(xuid, "command.account_required"))
                         return
                 
                 command_dict = {
@@ -162,8 +252,10 @@ class UpAndDownPlugin(Plugin):
                     try:
                         with LockWithTimeout(player_lock, 1):
                             rtn = command_func(xuid, sender, args)
+                        self.valuation_engine.mark_player_dirty(xuid)
+                        self.live_valuation.invalidate(xuid)
                     except LockException as ex:
-                        sender.send_error_message("当前账号有其他股票操作正在进行，请稍候操作")
+                        sender.send_error_message(self.tr(xuid, "command.locked"))
                 else:
                     rtn = command_func(xuid, sender, args)
                 
@@ -204,6 +296,18 @@ class UpAndDownPlugin(Plugin):
         '''
             Command router
         '''
+        # 管理员指令，不需要股票账户，控制台也可以使用
+        if args and args[0] == "dbstats":
+            self.show_db_stats(sender, args)
+            return True
+        if args and args[0] == "backup":
+            if not sender.has_permission("up_and_down.command.admin"):
+                sender.send_error_message("你没有权限使用该指令")
+                return True
+            sender.send_message("§e正在备份数据库...")
+            self.backup_database(sender)
+            return True
+        
         self.execute_command(sender, args, False)
 
         
@@ -216,11 +320,15 @@ class UpAndDownPlugin(Plugin):
 
 
     def is_available(self, ticket):
-        info = ticket.info
         if ticket.ticker == "BTC-USD":
             return True
-        
-        return info['market'] in ['us_market'] 
+
+        # 股票所属市场不会变化，查询过的结果直接使用，避免批量查询价格时逐只请求 info
+        available = self.market_available.get(ticket.ticker)
+        if available is None:
+            info = ticket.info
+            available = self.market_available[ticket.ticker] = info['market'] in ['us_market']
+        return available
 
     def get_stock_last_price(self, stock, period="1d", interval="1m", return_period=False):
         '''
@@ -240,9 +348,76 @@ class UpAndDownPlugin(Plugin):
         price = round(df.Close.iloc[-1], 2)
         price = Decimal(str(price))
         
+        self.valuation_engine.observe_price(stock.upper(), price)
+        
         return price, True
+
+    def get_stock_last_prices(self, stocks):
+        '''
+            Return {stock: price} for several stocks with one batched download, price is None when unavailable
+        '''
+        return {stock: price for stock, (price, _) in self.get_stock_last_quotes(stocks).items()}
+
+    def get_stock_last_quotes(self, stocks):
+        '''
+            Return {stock: (price, tradeable)} for several stocks with one batched download,
+            the same values get_stock_last_price returns for each stock
+        '''
+        stocks = list(dict.fromkeys(stock.upper() for stock in stocks))
+        if not stocks:
+            return {}
+
+        # 与单只股票的查询一致，只支持可交易的市场
+        stocks_available = [stock for stock in stocks if self.is_available(yf.Ticker(stock))]
+        quotes = {stock: (None, None) for stock in stocks}
+        if not stocks_available:
+            return quotes
+
+        df = yf.download(stocks_available, period="1d", interval="1m", prepost=True,
+                         group_by="ticker", progress=False, threads=True)
+
+        for stock in stocks_available:
+            closes = self._get_close_column(df, stock, len(stocks_available))
+            if closes is None:
+                continue
+            closes = closes.dropna()
+            if closes.empty:
+                continue
+
+            price = Decimal(str(round(closes.iloc[-1], 2)))
+            self.valuation_engine.observe_price(stock, price)
+            quotes[stock] = (price, True)
+
+        return quotes
+
+    @staticmethod
+    def _get_close_column(df, stock, stock_count):
+        '''
+            Return the Close column of one stock from a yf.download result, None when missing
+
+            Depending on the yfinance version the columns are (ticker, field), (field, ticker),
+            or flat fields when only one ticker was downloaded
+        '''
+        columns = df.columns
+        if isinstance(columns, pd.MultiIndex):
+            if (stock, "Close") in columns:
+                return df[(stock, "Close")]
+            if ("Close", stock) in columns:
+                return df[("Close", stock)]
+            return None
+
+        if stock_count == 1 and "Close" in columns:
+            return df["Close"]
+        return None
     
 
+    def tr(self, xuid, key, **params):
+        '''
+            Format a message in the player's language
+        '''
+        return self.message_catalog.format(self.player_settings_manager.get_locale(xuid), key, **params)
+
+
     # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # # #
     #
     #                     Command Excutors
@@ -260,24 +435,21 @@ class UpAndDownPlugin(Plugin):
         
         if unit == "minute":
             price_list, tradeable = self.get_stock_last_price(args[1], return_period=True)
-            unit_zh = "10分钟"
         elif unit == "day":
             price_list, tradeable = self.get_stock_last_price(args[1], period="1mo", interval="1d", return_period=True)
-            unit_zh = "10天"
         elif unit == "month":
             price_list, tradeable = self.get_stock_last_price(args[1], period="1y",interval="1mo", return_period=True)
-            unit_zh = "10个月"
         else:
-            sender.send_message(f"§4时间范围必须是minute, day, month其中之一, 你输入的{unit}无效")
+            sender.send_message(self.tr(xuid, "stock.invalid_unit", unit=unit))
             return
         
         if price_list == None:
-            sender.send_message(f"你输入了错误的股票名或该股票市场尚不支持:{args[1]}")
+            sender.send_message(self.tr(xuid, "stock.not_supported", stock_name=args[1]))
             return
         
             
         
-        price_str = f"股票{args[1]} 历史{unit_zh}成交价格: "
+        price_str = self.tr(xuid, "stock.history_header", stock_name=args[1], unit=self.tr(xuid, f"stock.unit.{unit}"))
         price_list = price_list[-11:]
         
         for idx, price in enumerate(price_list):
@@ -289,7 +461,7 @@ class UpAndDownPlugin(Plugin):
                 price_str += "§q" + str(round(price, 2)) + '\n'
             else:
                 price_str += "§7" + str(round(price)) + '\n'
-        price_str += "§e以上数据仅供参考，建议使用专业股票软件查询最新价格"
+        price_str += self.tr(xuid, "stock.history_footer")
         
         sender.send_message(price_str)
         
@@ -301,18 +473,18 @@ class UpAndDownPlugin(Plugin):
         player_balance = self.economy_plugin.get_player_money(player)
         
         if player_balance < amount:
-            sender.send_message(f"§e您的经济实力似乎不足以支付 {amount} 元")
+            sender.send_message(self.tr(xuid, "transfer.in_insufficient", amount=amount))
             return
             
         self.economy_plugin.decrease_player_money(player, amount)
-        self.stock_dao.increase_balance(xuid, amount, is_transfer_in=True)
+        self.account_ledger.increase_balance(xuid, amount)
         
-        sender.send_message(f"§e成功向股票账户汇入 {amount} 元")
+        sender.send_message(self.tr(xuid, "transfer.in_success", amount=amount))
         
         
     def my_account(self, xuid, sender, args):
-        amount = self.stock_dao.get_balance(xuid)
-        sender.send_message(f"§e股票账户余额 {amount} 元")
+        amount = self.account_ledger.get_balance(xuid) or 0
+        sender.send_message(self.tr(xuid, "account.balance", amount=amount))
         
     
     def transfer_out(self, xuid, sender, args):
@@ -324,24 +496,24 @@ class UpAndDownPlugin(Plugin):
         player = self.server.get_player(sender.name)
         
         # 获取玩家股票账户余额
-        stock_balance = self.stock_dao.get_balance(xuid)
+        stock_balance = self.account_ledger.get_balance(xuid)
         
         # 检查股票账户余额是否足够
         if stock_balance < amount:
-            sender.send_message(f"§e您的股票账户余额不足，当前余额: {stock_balance} 元")
+            sender.send_message(self.tr(xuid, "transfer.out_insufficient", balance=stock_balance))
             return
         
         # 执行转账操作
         try:
             # 从股票账户扣除金额
-            self.stock_dao.decrease_balance(xuid, amount, is_transfer_out=True)
+            self.account_ledger.decrease_balance(xuid, amount)
             # 增加玩家游戏账户余额
             self.economy_plugin.increase_player_money(player, amount)
             
-            sender.send_message(f"§e成功从股票账户转出 {amount} 元到游戏银行账户")
+            sender.send_message(self.tr(xuid, "transfer.out_success", amount=amount))
         except Exception as e:
             # 如果转账过程中出现错误，回滚操作
-            sender.send_message("§e转账失败，请稍后重试")
+            sender.send_message(self.tr(xuid, "transfer.out_failed"))
             # 可以在这里添加日志记录
             print(f"Transfer out failed for player {xuid}: {str(e)}")
         
@@ -368,7 +540,7 @@ class UpAndDownPlugin(Plugin):
         
         market_price, tradeable = self.get_stock_last_price(stock_name)
         if tradeable == None:
-            message = f"你输入了错误的股票名或该股票市场尚不支持:{args[1]}"
+            message = self.tr(xuid, "stock.not_supported", stock_name=args[1])
             sender.send_message(message)
             return False, message
         
@@ -377,32 +549,36 @@ class UpAndDownPlugin(Plugin):
             type = "buy_fix"
         else:
             price = Decimal(str(market_price)) if tradeable else Decimal(0)
-            sender.send_message(f"市价单单价:{price}")
+            sender.send_message(self.tr(xuid, "trade.market_price", price=price))
             type = "buy_flex"
             
-        market_type = "实时交易" if tradeable else "盘后交易"
+        market_type = self.tr(xuid, "trade.market_type.live" if tradeable else "trade.market_type.after_hours")
         
         order_id = self.stock_dao.create_order(xuid, stock_name, share, type)
-        sender.send_message(f"订单创建成功，订单号: {order_id} 类型: {self.order_type_dict[type]} {market_type}")
+        sender.send_message(self.tr(xuid, "trade.order_created", order_id=order_id,
+                                    order_type=self.tr(xuid, f"order_type.{type}"), market_type=market_type))
         
         if price < market_price:
-            message = f"股票购买失败，当前市场价:{market_price}, 没有人愿意按您的报价{price}元交易"
+            message = self.tr(xuid, "trade.buy_price_rejected", market_price=market_price, price=price)
             sender.send_message(message)
             return False, message
-        player_balance = self.stock_dao.get_balance(xuid)
+        player_balance = self.account_ledger.get_balance(xuid)
         
         share = Decimal(str(share))
-        fee_rate = Decimal(str(self.setting_manager.get_trading_fee_rate() / 100))
+        fee_rate = self.setting_manager.settings.trading_fee_ratio
         tax = price * share * fee_rate
         total_price = price * share + tax
         if player_balance < total_price:
-            message = f"您的经济实力似乎不足以支付 {total_price} 元"
+            message = self.tr(xuid, "trade.buy_insufficient", total=total_price)
             sender.send_message(message)
             return False, message
-        self.stock_dao.decrease_balance(xuid, total_price)
+        self.account_ledger.decrease_balance(xuid, total_price)
+        # 成交写入数据库前加载持股，之后只在内存中叠加本次变动
+        self.account_ledger.get_holding(xuid, stock_name)
         self.stock_dao.buy(order_id, stock_name, xuid, share, price, tax, total_price)
+        self.account_ledger.adjust_holding(xuid, stock_name, share)
 
-        message = f"股票购买成功，总计:{total_price}元"
+        message = self.tr(xuid, "trade.buy_success", total=total_price)
         sender.send_message(message)
         return True, message
             
@@ -417,7 +593,7 @@ class UpAndDownPlugin(Plugin):
         # 获取股票当前价格和可交易状态
         market_price, tradeable = self.get_stock_last_price(stock_name)
         if tradeable is None:
-            message = f"你输入了错误的股票名或该股票市场尚不支持:{args[1]}"
+            message = self.tr(xuid, "stock.not_supported", stock_name=args[1])
             sender.send_message(message)
             return False, message
         
@@ -427,40 +603,42 @@ class UpAndDownPlugin(Plugin):
             order_type = "sell_fix"
         else:
             price = Decimal(str(market_price)) if tradeable else Decimal(0)
-            sender.send_message(f"市价单单价:{price}")
+            sender.send_message(self.tr(xuid, "trade.market_price", price=price))
             order_type = "sell_flex"
         
         # 检查玩家持股数量
-        current_holding = self.stock_dao.get_player_stock_holding(xuid, stock_name)
+        current_holding = self.account_ledger.get_holding(xuid, stock_name)
         if current_holding < Decimal(share):
-            message = f"您的持股不足，当前持有 {current_holding} 股"
+            message = self.tr(xuid, "trade.sell_insufficient_shares", holding=current_holding)
             sender.send_message(message)
             return False, message
         
         
         # 创建出售订单
         order_id = self.stock_dao.create_order(xuid, stock_name, share, order_type)
-        market_type = "实时交易" if tradeable else "盘后交易"
-        sender.send_message(f"订单创建成功，订单号: {order_id} 类型: {self.order_type_dict[order_type]} {market_type}")
+        market_type = self.tr(xuid, "trade.market_type.live" if tradeable else "trade.market_type.after_hours")
+        sender.send_message(self.tr(xuid, "trade.order_created", order_id=order_id,
+                                    order_type=self.tr(xuid, f"order_type.{order_type}"), market_type=market_type))
         
 
         # 检查市场价格是否满足限价要求
         if market_price < price:
-            message = f"股票出售失败，当前市场价:{market_price}, 没有人愿意按您的报价{price}元购买"
+            message = self.tr(xuid, "trade.sell_price_rejected", market_price=market_price, price=price)
             sender.send_message(message)
             return False, message
         
         # 计算总收入（扣除手续费）
         total_price = price * Decimal(share)
-        fee_rate = Decimal(str(self.setting_manager.get_trading_fee_rate() / 100))
+        fee_rate = self.setting_manager.settings.trading_fee_ratio
         tax = total_price * fee_rate
         net_revenue = total_price - tax
         
         # 执行交易
         self.stock_dao.sell(order_id, stock_name, xuid, share, price, tax, total_price)
-        self.stock_dao.increase_balance(xuid, net_revenue)
+        self.account_ledger.adjust_holding(xuid, stock_name, -share)
+        self.account_ledger.increase_balance(xuid, net_revenue)
 
-        message = f"股票出售成功，总计:{net_revenue}元"
+        message = self.tr(xuid, "trade.sell_success", total=net_revenue)
         sender.send_message(message)
 
         return True, message
@@ -473,80 +651,82 @@ class UpAndDownPlugin(Plugin):
             self.ui_manager.show_help_panel(player)
         else:
             # 如果无法显示UI，回退到文本消息
-            help_str = '''
-§c警告：本插件为模拟美股交易插件，您的所有操作均为模拟操作，不会产生真实交易。您只能将股票买卖的利润转为游戏币，您永远无法将其提现为现实中可交易的货币。
-
-§6欢迎来到"荣辱浮沉 (Ups and Downs)" 股票插件，在这里，你可以让自己的财富名列服务器榜首，又或者跟随某个臭名昭著的企业的股票一夜蒸发。
-
-§6这里的一切股票价格都跟实时同步美股市场，所以我强烈推荐你用现实中的股票软件选股和盯盘。股票价格是非常珍贵的数据，我们所提供的数据也仅供参考。
-
-§6如果你不会查股票？那我建议你学起来，毕竟在这里验证你的智商后，你也会迈向亏光家产，哦不，我是说盆满钵满的那一天，你说对吧？
-
-§h指令列表:
-/stock ui           §a打开图形化UI界面（推荐使用）
-/stock transferin   将资金从服务器经济系统中转入股票账户
-/stock transferout  将资金从股票账户中转入服务器经济系统
-/stock show <股票代码> [时间范围]   查看股票变化， 时间范围选项: minute (10分钟), day (10天), month (10个月)，默认为minute
-/stock account  查看我的股票账户余额
-/stock buy <股票代码> <股份数> [价格]   购买股票，份数为整数，不填写价格则为市价单，填写价格则为限价单
-/stock sell <股票代码> <股份数> [价格]   出售股票，份数为整数，不填写价格则为市价单，填写价格则为限价单
-/stock orders [页数]    查看我的历史订单，页数默认为1
-/stock shares [页数]    查看我的持仓，页数默认为1
-
-/stock help 显示本帮助
-
-§s提示：由于屏幕大小限制，↑↑↑请向上滚动阅读完整内容↑↑↑
-        
-        '''
+            help_str = self.tr(xuid, "help.text")
             
             sender.send_message(help_str)
         
     def show_orders(self, xuid, sender, args):
         player = self.server.get_player(sender.name)
         
+        # 参数为上一页最后一条订单的编号，从它之后继续显示
         if len(args) == 1:
-            page = 0
+            before_id = None
         else:
-            page = args[1] - 1
+            before_id = int(args[1])
             
-        order_list = self.stock_dao.get_orders(xuid, page)
+        order_list = self.stock_dao.get_orders(xuid, before_id)
         
         message = ""
         for order in order_list:
-            message += f"§g类型:§h {self.order_type_dict[order['type']]}"
-            message += f'§g股票名:§h {order["stock_name"]}'
-            message += f'§g股数:§h {order["share"]}'
-            message += f'§g单价:§h {order["single_price"]}'
-            message += f'§g手续费:§h {order["tax"]}'
-            message += f'§g总价:§h {order["total"]}'
-            
-            
+            message += self.tr(xuid, "orders.row", order_type=self.tr(xuid, f"order_type.{order['type']}"),
+                               stock_name=order["stock_name"], share=order["share"], single_price=order["single_price"],
+                               tax=order["tax"], total=order["total"])
             message += "\n"
             
         sender.send_message(message)
-        sender.send_message(f"使用/stock orders {page + 2} 显示下一页")
+        if order_list:
+            sender.send_message(self.tr(xuid, "orders.next_page", cursor=order_list[-1]['id']))
         
     
     def show_shares(self, xuid, sender, args):
         player = self.server.get_player(sender.name)
         
         if len(args) == 1:
-            page = 0
+            before_id = None
         else:
-            page = args[1] - 1
+            before_id = int(args[1])
             
-        share_list = self.stock_dao.get_shares(xuid, page)
+        share_list = self.stock_dao.get_shares(xuid, before_id)
         
         message = ""
         for order in share_list:
-            message += f'§g股票名:§h {order["stock_name"]}'
-            message += f'§g股数:§h {order["share"]}'
-            
-            
+            message += self.tr(xuid, "shares.row", stock_name=order["stock_name"], share=order["share"])
             message += "\n"
             
         sender.send_message(message)
-        sender.send_message(f"使用/stock shares {page + 2} 显示下一页")
+        if share_list:
+            sender.send_message(self.tr(xuid, "shares.next_page", cursor=share_list[-1]['id']))
+
+
+    def show_db_stats(self, sender, args):
+        """
+        显示SQL执行统计：/stock dbstats [排序字段] [数量]
+        排序字段: total（累计耗时，默认）、max、count、lock、slow，reset 清空统计
+        """
+        if not sender.has_permission("up_and_down.command.admin"):
+            sender.send_error_message("你没有权限使用该指令")
+            return
+        
+        query_stats = self.database_manager.query_stats
+        sort_key = args[1] if len(args) > 1 else "total"
+        if sort_key == "reset":
+            query_stats.reset()
+            sender.send_message("§eSQL 统计已清空")
+            return
+        
+        order_by = {
+            "total": "total_ms",
+            "max": "max_ms",
+            "count": "count",
+            "lock": "lock_wait_ms",
+            "slow": "slow_count"
+        }.get(sort_key)
+        if order_by is None:
+            sender.send_error_message("排序字段只能是 total、max、count、lock、slow 或 reset")
+            return
+        
+        limit = int(args[2]) if len(args) > 2 else 10
+        sender.send_message(query_stats.format_summary(limit, order_by))
 
 
     def send_to_qq_group(self, message: str):
@@ -572,13 +752,22 @@ class UpAndDownPlugin(Plugin):
             try:
                 self.logger.info("Leaderboard updating")
 
-                # Call get_all_players_profit_loss with is_absolute=True
-                absolute_data = self.stock_dao.get_all_players_profit_loss(self.get_stock_last_price)
-                self.stock_dao.save_leaderboard_data(absolute_data, True)
+                # Balances are read from the database, write out the journal first
+                self.account_ledger.flush()
+
+                # One vectorized valuation pass, ranked both by absolute and relative profit/loss
+                with self.valuation_engine.pass_lock:
+                    if self.setting_manager.get_leaderboard_use_process():
+                        players_data, rankings = self.valuation_engine.value_all_in_process(
+                            self.get_stock_last_price,
+                            self._get_leaderboard_executor()
+                        )
+                    else:
+                        players_data, rankings = self.valuation_engine.value_all(self.get_stock_last_price)
+                    self.publish_leaderboard(players_data, rankings)
                 
-                # Call get_all_players_profit_loss with is_absolute=False
-                relative_data = self.stock_dao.get_all_players_profit_loss(self.get_stock_last_price)
-                self.stock_dao.save_leaderboard_data(relative_data, False)
+                # Keep today's wealth snapshot (the last full pass of the day wins)
+                self.wealth_history_manager.record_daily(players_data)
                 
                 self.logger.info("Leaderboard updated successfully")
 
@@ -586,6 +775,9 @@ class UpAndDownPlugin(Plugin):
                 if self.qqsync is not None and datetime.datetime.now().time() > datetime.time(8, 0):
                     today_str = datetime.datetime.now().strftime("%Y-%m-%d")
                     stored_data = self.get_leaderboard_data(is_absolute=False)
+                    names = self.player_name_cache.get_names(
+                        data['player_xuid'] for data in (*stored_data[:5], *stored_data[-5:])
+                    )
             
                     # 获取最后更新时间
                     last_updated = stored_data[0]['last_updated'] if stored_data else time.time()
@@ -597,7 +789,7 @@ class UpAndDownPlugin(Plugin):
                     
                     # 显示前5名
                     for idx, data in enumerate(stored_data[:5], 1):
-                        player_name = self.ui_manager._get_player_name(data['player_xuid'])
+                        player_name = names[data['player_xuid']]
                         profit_loss_percent = data['relative_profit_loss']
                         profit_loss = data['absolute_profit_loss']
                         
@@ -616,10 +808,9 @@ class UpAndDownPlugin(Plugin):
                     content += "倒数5名 (接盘侠榜)\n\n"
                     
                     # 显示倒数5名
-                    bottom_5 = stored_data[-5:]
-                    bottom_5.reverse()
+                    bottom_5 = list(reversed(stored_data[-5:]))
                     for idx, data in enumerate(bottom_5, 1):
-                        player_name = self.ui_manager._get_player_name(data['player_xuid'])
+                        player_name = names[data['player_xuid']]
                         profit_loss_percent = data['relative_profit_loss']
                         profit_loss = data['absolute_profit_loss']
                         
@@ -649,28 +840,168 @@ class UpAndDownPlugin(Plugin):
         threading.Thread(target=_execute).start()
 
 
+    def archive_orders(self):
+        def _execute():
+            """Archive finished orders older than the configured horizon"""
+            try:
+                archived = self.stock_dao.order_archive.archive_orders(self.setting_manager.get_order_archive_days())
+                if archived:
+                    self.logger.info(f"Archived {archived} orders")
+            except Exception as e:
+                self.logger.error(f"Failed to archive orders: {str(e)}")
+                import traceback
+                self.logger.error(traceback.format_exc())
+
+        threading.Thread(target=_execute).start()
+
+
+    def backup_database(self, sender=None):
+        def _execute():
+            """Copy the live database into a rotated backup file"""
+            try:
+                # Balances still in the journal belong in the backup too
+                self.account_ledger.flush()
+                path = self.backup_manager.run_backup()
+                message = f"§e数据库已备份: {path}" if path else "§c数据库备份校验失败，请查看控制台"
+            except Exception as e:
+                self.logger.error(f"Failed to back up database: {str(e)}")
+                import traceback
+                self.logger.error(traceback.format_exc())
+                message = "§c数据库备份失败，请查看控制台"
+            
+            if sender is not None:
+                self.server.scheduler.run_task(self, lambda: sender.send_message(message), delay=0)
+
+        threading.Thread(target=_execute).start()
+
+
+    def _get_leaderboard_executor(self):
+        """Create the leaderboard worker process on first use"""
+        if self.leaderboard_executor is None:
+            # spawn: never fork the running server process
+            self.leaderboard_executor = ProcessPoolExecutor(
+                max_workers=1,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self.leaderboard_executor
+
+
+    def update_leaderboard_incremental(self):
+        def _execute():
+            """Revalue only the players marked dirty since the last pass"""
+            # Skip this round if a full pass is still running
+            if not self.valuation_engine.pass_lock.acquire(blocking=False):
+                return
+            try:
+                self.account_ledger.flush()
+                result = self.valuation_engine.value_dirty(self.get_stock_last_price)
+                if result is not None:
+                    players_data, rankings, revalued = result
+                    # 增量更新只修补内存中的快照，持久化留给全量更新
+                    self.publish_leaderboard(players_data, rankings, changed_xuids=revalued, persist=False)
+            except Exception as e:
+                self.logger.error(f"Failed to update leaderboard incrementally: {str(e)}")
+                import traceback
+                self.logger.error(traceback.format_exc())
+            finally:
+                self.valuation_engine.pass_lock.release()
+
+        threading.Thread(target=_execute).start()
+
+
+    def publish_leaderboard(self, players_data, rankings, changed_xuids=None, persist=True):
+        """Publish a finished ranking as the new snapshot, then persist it for restarts
+        Args:
+            players_data: List of player profit/loss data
+            rankings: {is_absolute: indices of players_data in rank order}
+            changed_xuids: Players revalued in this pass, None when the whole board was recomputed
+            persist: Whether to write the snapshot to tb_leaderboard
+        """
+        snapshot = LeaderboardSnapshot.build(players_data, rankings)
+        # Resolve names now so rendering never calls arc_core per row; the rest of the board is already cached
+        if changed_xuids is None:
+            changed_xuids = [data['player_xuid'] for data in players_data]
+        self.player_name_cache.get_names(changed_xuids)
+        # Readers always see either the old or the new snapshot, never a partial one
+        self.leaderboard_snapshot = snapshot
+        if persist:
+            # Written by a background thread so a slow write never holds the pass lock
+            self.leaderboard_persister.submit(snapshot)
+
+
+    def _get_fresh_leaderboard_snapshot(self):
+        """Return the current snapshot if it was updated within the last hour, otherwise None"""
+        snapshot = self.leaderboard_snapshot
+        if snapshot is None or len(snapshot) == 0 or snapshot.last_updated <= time.time() - 3600:
+            return None
+        return snapshot
+
+
     def get_leaderboard_data(self, is_absolute=True):
-        """Get leaderboard data from database
+        """Get leaderboard data from the in-memory snapshot
         Args:
             is_absolute: True for absolute leaderboard, False for relative
         Returns:
-            List of player data or empty list
+            Tuple of player data in rank order, or None
         """
-        try:
-            cached_data = self.stock_dao.get_leaderboard_cached_data(is_absolute)
-            if len(cached_data) > 0:
-                return cached_data
-                
-            else:
-                return None
-        except Exception as e:
-            self.logger.error(f"Failed to get leaderboard data: {str(e)}")
-            return []
-            
-        except Exception as e:
-            self.logger.error(f"Leaderboard update failed: {str(e)}")
-            import traceback
-            self.logger.error(traceback.format_exc())
+        snapshot = self._get_fresh_leaderboard_snapshot()
+        if snapshot is None:
+            return None
+        return snapshot.get_board(is_absolute)
+
+
+    def get_player_leaderboard_data(self, player_xuid):
+        """Get a single player's entry on the absolute leaderboard
+        Args:
+            player_xuid: Player XUID
+        Returns:
+            Player data or None
+        """
+        snapshot = self._get_fresh_leaderboard_snapshot()
+        if snapshot is None:
+            return None
+        return snapshot.get_player(player_xuid)
+
+    def get_player_rank(self, player_xuid, is_absolute=True):
+        """Get a player's position on the leaderboard
+        Args:
+            player_xuid: Player XUID
+            is_absolute: True for absolute leaderboard, False for relative
+        Returns:
+            (rank, total players, percentile) or None
+        """
+        snapshot = self._get_fresh_leaderboard_snapshot()
+        if snapshot is None:
+            return None
+        rank = snapshot.get_rank(player_xuid, is_absolute)
+        if rank is None:
+            return None
+        return rank, len(snapshot), snapshot.get_percentile(player_xuid, is_absolute)
+
+
+    def get_leaderboard_window(self, is_absolute, start_rank, end_rank):
+        """Get the players ranked from start_rank to end_rank (inclusive)
+        Returns:
+            (tuple of player data, total players) or None
+        """
+        snapshot = self._get_fresh_leaderboard_snapshot()
+        if snapshot is None:
+            return None
+        return snapshot.get_window(is_absolute, start_rank, end_rank), len(snapshot)
+
+    @event_handler
+    def on_player_join(self, event: PlayerJoinEvent):
+        # 进服时记录玩家名称，排行榜直接使用
+        self.player_name_cache.remember(event.player.xuid, event.player.name)
+
+    @event_handler
+    def on_player_quit(self, event: PlayerQuitEvent):
+        # 玩家下线后释放内存账本、个人设置、收藏和估值缓存中的数据，未完成的界面加载结果不再发送
+        self.account_ledger.evict(event.player.xuid)
+        self.player_settings_manager.evict(event.player.xuid)
+        self.favorites_manager.evict(event.player.xuid)
+        self.live_valuation.evict(event.player.xuid)
+        self.ui_manager.ui_requests.evict(event.player.xuid)
 
     @event_handler
     def on_server_load(self, event: ServerLoadEvent):
@@ -0,0 +1,370 @@
+"""
+全服持仓估值引擎 - 使用 NumPy 向量化计算排行榜
+"""
+import threading
+from decimal import Decimal
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from endstone_up_and_down.databaseManager import DatabaseManager
+from endstone_up_and_down.money import MICRO, to_micro
+
+
+class PortfolioValuationEngine:
+    # 子进程估值时，快照中出现未查询价格的股票后最多重新估值的轮数
+    MAX_PROCESS_ROUNDS = 3
+
+    def __init__(self, database_manager: DatabaseManager, price_change_threshold: float = 0.5):
+        """
+        初始化估值引擎
+        :param database_manager: 数据库管理器实例
+        :param price_change_threshold: 价格变动超过该百分比时，持有该股票的玩家需要重新估值
+        """
+        self.database_manager = database_manager
+        self.price_change_threshold = Decimal(str(price_change_threshold)) / 100
+
+        # 上一次估值的结果，增量更新在此基础上修补
+        self._players: Dict[str, Dict] = {}
+        self._prices: Dict[str, Optional[Decimal]] = {}
+        self._has_full_pass = False
+
+        # 自上次估值以来发生变化的玩家和股票
+        self._dirty_players = set()
+        self._dirty_tickers = set()
+        self._observed_prices: Dict[str, Decimal] = {}
+        self._dirty_lock = threading.Lock()
+
+        # 全量和增量估值不能同时进行
+        self.pass_lock = threading.Lock()
+
+    def mark_player_dirty(self, player_xuid: str):
+        """
+        标记玩家的持仓或余额已变化
+        :param player_xuid: 玩家XUID
+        """
+        with self._dirty_lock:
+            self._dirty_players.add(player_xuid)
+
+    def observe_price(self, stock_name: str, price):
+        """
+        记录最新观察到的股票价格，变动超过阈值时标记该股票
+        :param stock_name: 股票代码
+        :param price: 最新价格
+        """
+        if not price:
+            return
+
+        price = Decimal(str(price))
+        with self._dirty_lock:
+            self._observed_prices[stock_name] = price
+
+            last_price = self._prices.get(stock_name)
+            if last_price is None:
+                return
+            if abs(price - last_price) >= last_price * self.price_change_threshold:
+                self._dirty_tickers.add(stock_name)
+
+    def get_observed_prices(self, stock_names: Iterable[str]) -> Dict[str, Decimal]:
+        """
+        获取最新观察到的股票价格
+        :param stock_names: 股票代码
+        :return: {股票代码: 价格}，还没有观察到价格的股票不包含在内
+        """
+        with self._dirty_lock:
+            return {
+                stock_name: self._observed_prices[stock_name]
+                for stock_name in stock_names
+                if stock_name in self._observed_prices
+            }
+
+    def load_positions(self, player_xuids: Optional[List[str]] = None):
+        """
+        将账户和持仓汇总加载为紧凑的数组形式
+        :param player_xuids: 只加载这些玩家，为空时加载全部
+        :return: (玩家XUID列表, 余额数组, 股票列表, 玩家索引, 股票索引, 股数, 累计买入, 累计卖出)
+        """
+        # 在同一个读事务内读取账户和持仓，保证两者来自同一个一致的快照
+        with self.database_manager.transaction(immediate=False):
+            if player_xuids is None:
+                accounts = self.database_manager.query_all(
+                    "SELECT player_xuid, balance FROM tb_player_account"
+                )
+                positions = self.database_manager.query_all(
+                    "SELECT player_xuid, stock_name, share, total_buy, total_sell FROM tb_player_position"
+                )
+            else:
+                placeholders = ','.join(['?' for _ in player_xuids])
+                accounts = self.database_manager.query_all(
+                    f"SELECT player_xuid, balance FROM tb_player_account WHERE player_xuid IN ({placeholders})",
+                    tuple(player_xuids)
+                )
+                positions = self.database_manager.query_all(
+                    f"""
+                    SELECT player_xuid, stock_name, share, total_buy, total_sell FROM tb_player_position
+                    WHERE player_xuid IN ({placeholders})
+                    """,
+                    tuple(player_xuids)
+                )
+
+        account_xuids = [account['player_xuid'] for account in accounts]
+        player_index = {xuid: idx for idx, xuid in enumerate(account_xuids)}
+        balances = np.array([account['balance'] or 0 for account in accounts], dtype=np.int64)
+
+        tickers: List[str] = []
+        ticker_index: Dict[str, int] = {}
+        player_idx = []
+        ticker_idx = []
+        shares = []
+        total_buys = []
+        total_sells = []
+
+        for position in positions:
+            idx = player_index.get(position['player_xuid'])
+            if idx is None:
+                # 没有账户的持仓不参与排行
+                continue
+
+            stock_name = position['stock_name']
+            if stock_name not in ticker_index:
+                ticker_index[stock_name] = len(tickers)
+                tickers.append(stock_name)
+
+            player_idx.append(idx)
+            ticker_idx.append(ticker_index[stock_name])
+            shares.append(max(position['share'], 0))
+            total_buys.append(position['total_buy'])
+            total_sells.append(position['total_sell'])
+
+        return (
+            account_xuids,
+            balances,
+            tickers,
+            np.array(player_idx, dtype=np.int64),
+            np.array(ticker_idx, dtype=np.int64),
+            np.array(shares, dtype=np.int64),
+            np.array(total_buys, dtype=np.int64),
+            np.array(total_sells, dtype=np.int64),
+        )
+
+    def value_all(self, get_stock_price_func: Callable) -> Tuple[List[Dict], Dict[bool, List[int]]]:
+        """
+        估值全服玩家并生成两种排名
+        :param get_stock_price_func: 获取股票价格的函数
+        :return: (玩家盈亏数据列表, {是否绝对盈亏榜: 按排名排列的玩家数据下标})
+        """
+        with self._dirty_lock:
+            # 本次全量估值之后的变化由下一次增量更新处理
+            self._dirty_players.clear()
+            self._dirty_tickers.clear()
+
+        loaded = self.load_positions()
+        prices = {}
+        self._players = self._value(loaded, prices, get_stock_price_func)
+        self._prices = prices
+        self._has_full_pass = True
+
+        return self.rank()
+
+    def value_all_in_process(self, get_stock_price_func: Callable, executor) -> Tuple[List[Dict], Dict[bool, List[int]]]:
+        """
+        在独立进程中估值全服玩家，服务器进程只负责查询价格和接收最终排名
+        :param get_stock_price_func: 获取股票价格的函数
+        :param executor: concurrent.futures.ProcessPoolExecutor
+        :return: 与 value_all 相同
+        """
+        with self._dirty_lock:
+            self._dirty_players.clear()
+            self._dirty_tickers.clear()
+
+        # 查询价格是网络 I/O，不占用 GIL，留在本进程进行
+        prices = {}
+        stock_names = self.get_held_tickers()
+        for _ in range(self.MAX_PROCESS_ROUNDS):
+            for stock_name in stock_names:
+                current_price, _ = get_stock_price_func(stock_name)
+                prices[stock_name] = Decimal(str(current_price)) if current_price else None
+
+            # 子进程读取快照时可能出现查询价格之后才买入的股票，此时返回这些股票，查询价格后重新估值
+            players_data, rankings, stock_names = executor.submit(
+                compute_rankings_in_worker,
+                self.database_manager.db_path,
+                prices
+            ).result()
+            if not stock_names:
+                break
+        else:
+            raise RuntimeError(f"估值期间持仓持续变化，缺少价格: {', '.join(stock_names)}")
+
+        self._players = {data['player_xuid']: data for data in players_data}
+        self._prices = prices
+        self._has_full_pass = True
+
+        return players_data, rankings
+
+    def get_held_tickers(self) -> List[str]:
+        """获取仍有玩家持有的所有股票代码"""
+        rows = self.database_manager.query_all(
+            "SELECT DISTINCT stock_name FROM tb_player_position WHERE share > 0"
+        )
+        return [row['stock_name'] for row in rows]
+
+    def value_dirty(self, get_stock_price_func: Callable) -> Optional[Tuple[List[Dict], Dict[bool, List[int]], List[str]]]:
+        """
+        只重新估值自上次估值以来交易过的玩家和持有大幅波动股票的玩家，并修补排名
+        :param get_stock_price_func: 获取股票价格的函数
+        :return: (玩家盈亏数据列表, 排名, 重新估值的玩家XUID列表)；没有需要更新的玩家或尚未进行全量估值时返回None
+        """
+        if not self._has_full_pass:
+            return None
+
+        with self._dirty_lock:
+            dirty_players = self._dirty_players
+            dirty_tickers = self._dirty_tickers
+            self._dirty_players = set()
+            self._dirty_tickers = set()
+            observed_prices = dict(self._observed_prices)
+
+        if not dirty_players and not dirty_tickers:
+            return None
+
+        prices = dict(self._prices)
+        affected = set(dirty_players)
+
+        try:
+            if dirty_tickers:
+                for stock_name in dirty_tickers:
+                    prices[stock_name] = observed_prices[stock_name]
+
+                placeholders = ','.join(['?' for _ in dirty_tickers])
+                holders = self.database_manager.query_all(
+                    f"""
+                    SELECT DISTINCT player_xuid FROM tb_player_position
+                    WHERE share > 0 AND stock_name IN ({placeholders})
+                    """,
+                    tuple(dirty_tickers)
+                )
+                affected.update(holder['player_xuid'] for holder in holders)
+
+            affected = list(affected)
+            revalued = self._value(self.load_positions(affected), prices, get_stock_price_func)
+        except Exception:
+            # 估值失败：放回取出的标记，下一次增量更新重试
+            with self._dirty_lock:
+                self._dirty_players |= dirty_players
+                self._dirty_tickers |= dirty_tickers
+            raise
+
+        for player_xuid in affected:
+            if player_xuid in revalued:
+                self._players[player_xuid] = revalued[player_xuid]
+            else:
+                self._players.pop(player_xuid, None)
+        self._prices = prices
+
+        return (*self.rank(), affected)
+
+    def rank(self) -> Tuple[List[Dict], Dict[bool, List[int]]]:
+        """
+        按绝对盈亏和相对盈亏对当前估值结果排名
+        :return: (玩家盈亏数据列表, {是否绝对盈亏榜: 按排名排列的玩家数据下标})
+        """
+        players_data = list(self._players.values())
+        absolute_profit_loss = np.array([data['absolute_profit_loss'] for data in players_data], dtype=np.float64)
+        relative_profit_loss = np.array([data['relative_profit_loss'] for data in players_data], dtype=np.float64)
+
+        # 稳定排序，与 sorted(..., reverse=True) 的并列顺序一致
+        rankings = {
+            True: np.argsort(-absolute_profit_loss, kind='stable').tolist(),
+            False: np.argsort(-relative_profit_loss, kind='stable').tolist(),
+        }
+
+        return players_data, rankings
+
+    def _value(self, loaded, prices: Dict[str, Optional[Decimal]], get_stock_price_func: Callable) -> Dict[str, Dict]:
+        """
+        对加载的持仓进行向量化估值
+        :param loaded: load_positions 的返回值
+        :param prices: 已知价格，缺失的价格会查询后写入
+        :param get_stock_price_func: 获取股票价格的函数
+        :return: {玩家XUID: 玩家盈亏数据}，没有实际投资过的玩家不包含在内
+        """
+        (player_xuids, balances, tickers, player_idx, ticker_idx,
+         shares, total_buys, total_sells) = loaded
+
+        player_count = len(player_xuids)
+        if player_count == 0:
+            return {}
+
+        # 价格向量：每只仍有持仓的股票只查询一次
+        price_vector = np.zeros(len(tickers), dtype=np.int64)
+        for ticker in np.unique(ticker_idx[shares > 0]):
+            stock_name = tickers[ticker]
+            if stock_name not in prices:
+                current_price, _ = get_stock_price_func(stock_name)
+                prices[stock_name] = Decimal(str(current_price)) if current_price else None
+            if prices[stock_name]:
+                price_vector[ticker] = to_micro(prices[stock_name])
+
+        # 稀疏乘法：(玩家 x 股票) 持仓矩阵乘以价格向量，按玩家累加
+        holdings_value = np.zeros(player_count, dtype=np.int64)
+        np.add.at(holdings_value, player_idx, shares * price_vector[ticker_idx])
+
+        total_buy = np.zeros(player_count, dtype=np.int64)
+        np.add.at(total_buy, player_idx, total_buys)
+
+        total_sell = np.zeros(player_count, dtype=np.int64)
+        np.add.at(total_sell, player_idx, total_sells)
+
+        # 如果累计投入为0，跳过（没有实际投资过）
+        active = np.flatnonzero(total_buy != 0)
+
+        # 当前盈利 = 持仓市值 - 所有购买股票的成本 + 所有出售股票的收入
+        absolute_profit_loss = holdings_value - total_buy + total_sell
+        # 相对盈亏（百分比） = 绝对盈亏 / 累计投入 * 100
+        relative_profit_loss = np.zeros(player_count, dtype=np.float64)
+        relative_profit_loss[active] = absolute_profit_loss[active] / total_buy[active] * 100
+
+        players = {}
+        for idx in active:
+            holdings = float(holdings_value[idx]) / MICRO
+            balance = float(balances[idx]) / MICRO
+            players[player_xuids[idx]] = {
+                'player_xuid': player_xuids[idx],
+                'total_wealth': holdings + balance,
+                'holdings_value': holdings,
+                'balance': balance,
+                'total_buy': float(total_buy[idx]) / MICRO,
+                'total_sell': float(total_sell[idx]) / MICRO,
+                'absolute_profit_loss': float(absolute_profit_loss[idx]) / MICRO,
+                'relative_profit_loss': float(relative_profit_loss[idx])
+            }
+
+        return players
+
+
+def compute_rankings_in_worker(db_path: str, prices: Dict[str, Optional[Decimal]]) -> Tuple[Optional[List[Dict]], Optional[Dict[bool, List[int]]], List[str]]:
+    """
+    子进程入口：读取数据库的一致快照，按给定价格估值并排名
+    :param db_path: 数据库文件路径
+    :param prices: {股票代码: 价格}，价格为None表示查询失败
+    :return: (玩家盈亏数据列表, {是否绝对盈亏榜: 按排名排列的玩家数据下标}, 没有提供价格的股票)；
+             快照中有没有提供价格的股票时不估值，前两项为None
+    """
+    missing = []
+
+    def get_price(stock_name):
+        if stock_name not in prices:
+            missing.append(stock_name)
+        return prices.get(stock_name), True
+
+    database_manager = DatabaseManager(db_path)
+    try:
+        engine = PortfolioValuationEngine(database_manager)
+        players_data, rankings = engine.value_all(get_price)
+    finally:
+        database_manager.close()
+
+    if missing:
+        return None, None, missing
+    return players_data, rankings, []
@@ -0,0 +1,164 @@
+"""
+玩家每日财富快照管理器
+"""
+import datetime
+import struct
+import time
+from typing import Dict, List, Optional
+
+from .databaseManager import DatabaseManager
+
+
+class WealthHistoryManager:
+    # 每条记录定长: 日期(自公元1年1月1日起的天数), 总财富(分), 绝对盈亏(分)
+    RECORD = struct.Struct("<iqq")
+
+    def __init__(self, database_manager: DatabaseManager):
+        """
+        初始化财富快照管理器
+        :param database_manager: 数据库管理器实例
+        """
+        self.database_manager = database_manager
+        self._init_history_table()
+
+    def _init_history_table(self) -> None:
+        """创建财富快照表，每个玩家一行，历史记录按日期顺序打包在 data 中"""
+        self.database_manager.create_table("tb_wealth_history", {
+            "player_xuid": "TEXT PRIMARY KEY",
+            "data": "BLOB NOT NULL",
+            "updated_time": "REAL NOT NULL"
+        })
+
+    def record_daily(self, players_data: List[Dict], date: Optional[datetime.date] = None) -> None:
+        """
+        记录当天所有玩家的财富快照，同一天重复记录时覆盖当天的数据
+        只读取每个玩家的最后一条记录，当天的记录没有变化时不写入；
+        新的一天追加一条记录，已有当天记录时只替换最后一条，不读出整段历史
+        （SQLite 的 || 结果为文本，拼接后转换回 BLOB）
+        :param players_data: 玩家盈亏数据列表
+        :param date: 快照日期，默认为今天
+        """
+        day = (date or datetime.date.today()).toordinal()
+        now = time.time()
+        size = self.RECORD.size
+
+        with self.database_manager.transaction() as conn:
+            last_records = {
+                row["player_xuid"]: row["last_record"]
+                for row in conn.execute(f"SELECT player_xuid, substr(data, -{size}) AS last_record FROM tb_wealth_history")
+            }
+
+            inserts = []
+            appends = []
+            replaces = []
+            for player_data in players_data:
+                player_xuid = player_data["player_xuid"]
+                record = self.RECORD.pack(
+                    day,
+                    self._to_cents(player_data["total_wealth"]),
+                    self._to_cents(player_data["absolute_profit_loss"])
+                )
+
+                last_record = last_records.get(player_xuid)
+                if last_record is None:
+                    inserts.append((player_xuid, record, now))
+                elif last_record == record:
+                    continue
+                elif self.RECORD.unpack(last_record)[0] == day:
+                    # 覆盖当天的记录
+                    replaces.append((record, now, player_xuid))
+                else:
+                    appends.append((record, now, player_xuid))
+
+            conn.executemany(
+                "INSERT INTO tb_wealth_history (player_xuid, data, updated_time) VALUES (?, ?, ?)",
+                inserts
+            )
+            conn.executemany(
+                "UPDATE tb_wealth_history SET data = CAST(data || ? AS BLOB), updated_time = ? WHERE player_xuid = ?",
+                appends
+            )
+            conn.executemany(
+                f"""
+                UPDATE tb_wealth_history SET data = CAST(substr(data, 1, length(data) - {size}) || ? AS BLOB), updated_time = ?
+                WHERE player_xuid = ?
+                """,
+                replaces
+            )
+
+    def get_history(self, player_xuid: str, start_date: Optional[datetime.date] = None,
+                    end_date: Optional[datetime.date] = None) -> List[Dict]:
+        """
+        获取玩家在日期范围内的每日财富快照
+        :param player_xuid: 玩家XUID
+        :param start_date: 开始日期（包含），为空表示不限
+        :param end_date: 结束日期（包含），为空表示不限
+        :return: [{date, total_wealth, absolute_profit_loss}]，按日期升序
+        """
+        row = self.database_manager.query_one(
+            "SELECT data FROM tb_wealth_history WHERE player_xuid = ?",
+            (player_xuid,)
+        )
+        if row is None:
+            return []
+
+        data = row["data"]
+        start = self._bisect(data, start_date.toordinal()) if start_date else 0
+        end = self._bisect(data, end_date.toordinal() + 1) if end_date else len(data) // self.RECORD.size
+
+        return [
+            self._decode(day, wealth, profit_loss)
+            for day, wealth, profit_loss in self.RECORD.iter_unpack(
+                data[start * self.RECORD.size:end * self.RECORD.size]
+            )
+        ]
+
+    def get_recent_history(self, player_xuid: str, days: int) -> List[Dict]:
+        """
+        获取玩家最近若干天的财富快照
+        :param player_xuid: 玩家XUID
+        :param days: 天数
+        """
+        start_date = datetime.date.today() - datetime.timedelta(days=days - 1)
+        return self.get_history(player_xuid, start_date=start_date)
+
+    def get_all_on(self, date: datetime.date) -> Dict[str, Dict]:
+        """
+        获取所有玩家在某一天的快照（用于赛季对比分析）
+        :param date: 日期
+        :return: {玩家XUID: 快照}
+        """
+        day = date.toordinal()
+        result = {}
+
+        for row in self.database_manager.query_all("SELECT player_xuid, data FROM tb_wealth_history"):
+            data = row["data"]
+            idx = self._bisect(data, day)
+            if idx * self.RECORD.size < len(data):
+                record = self.RECORD.unpack_from(data, idx * self.RECORD.size)
+                if record[0] == day:
+                    result[row["player_xuid"]] = self._decode(*record)
+
+        return result
+
+    def _bisect(self, data: bytes, day: int) -> int:
+        """二分查找第一条日期不早于 day 的记录下标"""
+        low, high = 0, len(data) // self.RECORD.size
+        while low < high:
+            mid = (low + high) // 2
+            if self.RECORD.unpack_from(data, mid * self.RECORD.size)[0] < day:
+                low = mid + 1
+            else:
+                high = mid
+        return low
+
+    def _decode(self, day: int, wealth: int, profit_loss: int) -> Dict:
+        return {
+            "date": datetime.date.fromordinal(day),
+            "total_wealth": wealth / 100,
+            "absolute_profit_loss": profit_loss / 100
+        }
+
+    @staticmethod
+    def _to_cents(amount: float) -> int:
+        return int(round(amount * 100))
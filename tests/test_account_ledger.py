@@ -0,0 +1,79 @@
+from decimal import Decimal
+
+import pytest
+
+from endstone_up_and_down.account_ledger import AccountLedger
+from endstone_up_and_down.databaseManager import DatabaseManager
+from endstone_up_and_down.stockDao import StockDao
+
+
+@pytest.fixture
+def env(tmp_path):
+    database_manager = DatabaseManager(str(tmp_path / "stock.db"))
+    stock_dao = StockDao(database_manager)
+    stock_dao.init_tables()
+    ledger = AccountLedger(database_manager, str(tmp_path / "ledger.journal"))
+    yield stock_dao, ledger
+    ledger.close()
+
+
+def _buy(stock_dao, xuid, stock_name, share):
+    order_id = stock_dao.create_order(xuid, stock_name, share, "buy_flex")
+    price = Decimal("10")
+    stock_dao.buy(order_id, stock_name, xuid, share, price, Decimal(0), price * share)
+
+
+def test_first_trade_on_cold_cache_is_not_counted_twice(env):
+    stock_dao, ledger = env
+
+    _buy(stock_dao, "p1", "AAPL", 5)
+    ledger.adjust_holding("p1", "AAPL", 5)
+
+    assert ledger.get_holding("p1", "AAPL") == 5
+    assert stock_dao.get_player_stock_holding("p1", "AAPL") == 5
+
+
+def test_trade_on_warm_cache_adds_delta(env):
+    stock_dao, ledger = env
+
+    assert ledger.get_holding("p1", "AAPL") == 0
+    _buy(stock_dao, "p1", "AAPL", 5)
+    ledger.adjust_holding("p1", "AAPL", 5)
+    _buy(stock_dao, "p1", "AAPL", 3)
+    ledger.adjust_holding("p1", "AAPL", 3)
+
+    assert ledger.get_holding("p1", "AAPL") == 8
+
+
+def test_evict_during_trade_reloads_from_database(env):
+    stock_dao, ledger = env
+
+    assert ledger.get_holding("p1", "AAPL") == 0
+    _buy(stock_dao, "p1", "AAPL", 5)
+    ledger.evict("p1")
+    ledger.adjust_holding("p1", "AAPL", 5)
+
+    assert ledger.get_holding("p1", "AAPL") == 5
+
+
+def test_evict_during_flush_keeps_unwritten_balance(env):
+    _, ledger = env
+    ledger.increase_balance("p1", Decimal("100"))
+    ledger.flush()
+    ledger.decrease_balance("p1", Decimal("30"))
+
+    apply_to_database = ledger._apply_to_database
+    seen_during_flush = []
+
+    def quit_and_rejoin_before_commit(balances):
+        ledger.evict("p1")
+        seen_during_flush.append(ledger.get_balance("p1"))
+        apply_to_database(balances)
+
+    ledger._apply_to_database = quit_and_rejoin_before_commit
+    ledger.flush()
+
+    assert seen_during_flush == [Decimal("70")]
+    # 提交后释放下线玩家的余额，重新加载得到已写入的值
+    assert "p1" not in ledger._balances
+    assert ledger.get_balance("p1") == Decimal("70")
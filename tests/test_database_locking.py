@@ -0,0 +1,82 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from endstone_up_and_down.databaseManager import DatabaseManager
+
+
+@pytest.fixture
+def database_manager(tmp_path):
+    database_manager = DatabaseManager(str(tmp_path / "stock.db"))
+    database_manager.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, v INTEGER)")
+    database_manager.execute("INSERT INTO t (id, v) VALUES (1, 0)")
+    return database_manager
+
+
+def _run_concurrently(database_manager, reader_writer):
+    """
+    flush 持有写锁后等待另一个线程先读，再提交；另一个线程由 reader_writer 执行先读后写
+    :return: {线程名: (结果, 耗时)}
+    """
+    results = {}
+    flush_holds_lock = threading.Event()
+    other_has_read = threading.Event()
+
+    def flush():
+        start = time.perf_counter()
+        try:
+            with database_manager.transaction() as conn:
+                conn.execute("UPDATE t SET v = v + 1 WHERE id = 1")
+                flush_holds_lock.set()
+                other_has_read.wait(0.5)
+            results["flush"] = ("ok", time.perf_counter() - start)
+        except Exception as e:
+            results["flush"] = (e, time.perf_counter() - start)
+
+    def trade():
+        flush_holds_lock.wait()
+        start = time.perf_counter()
+        try:
+            reader_writer(other_has_read)
+            results["trade"] = ("ok", time.perf_counter() - start)
+        except Exception as e:
+            results["trade"] = (e, time.perf_counter() - start)
+
+    threads = [threading.Thread(target=flush), threading.Thread(target=trade)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    return results
+
+
+def test_transaction_read_then_write_does_not_stall(database_manager):
+    def reader_writer(has_read):
+        with database_manager.transaction() as conn:
+            conn.execute("SELECT v FROM t WHERE id = 1").fetchone()
+            has_read.set()
+            conn.execute("UPDATE t SET v = v + 10 WHERE id = 1")
+
+    results = _run_concurrently(database_manager, reader_writer)
+
+    assert results["flush"][0] == "ok"
+    assert results["trade"][0] == "ok"
+    assert max(elapsed for _, elapsed in results.values()) < 2
+    assert database_manager.query_one("SELECT v FROM t WHERE id = 1")["v"] == 11
+
+
+def test_deferred_read_lock_holder_fails_fast(database_manager):
+    def reader_writer(has_read):
+        with database_manager.transaction(immediate=False) as conn:
+            conn.execute("SELECT v FROM t WHERE id = 1").fetchone()
+            has_read.set()
+            time.sleep(0.05)
+            conn.execute("UPDATE t SET v = v + 10 WHERE id = 1")
+
+    results = _run_concurrently(database_manager, reader_writer)
+
+    assert results["flush"][0] == "ok"
+    assert isinstance(results["trade"][0], sqlite3.OperationalError)
+    assert max(elapsed for _, elapsed in results.values()) < 2
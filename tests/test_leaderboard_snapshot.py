@@ -0,0 +1,56 @@
+from endstone_up_and_down.leaderboard_snapshot import LeaderboardSnapshot
+
+
+def _snapshot():
+    players_data = [
+        {"player_xuid": f"p{idx}", "absolute_profit_loss": value, "relative_profit_loss": -value}
+        for idx, value in enumerate([30, 10, 20, 0])
+    ]
+    rankings = {True: [0, 2, 1, 3], False: [3, 1, 2, 0]}
+    return LeaderboardSnapshot.build(players_data, rankings, last_updated=1.0)
+
+
+def test_rank_window_and_percentile():
+    snapshot = _snapshot()
+
+    assert snapshot.get_rank("p2") == 2
+    assert snapshot.get_rank("p2", is_absolute=False) == 3
+    assert [row["player_xuid"] for row in snapshot.get_window(True, 2, 3)] == ["p2", "p1"]
+    assert snapshot.get_percentile("p0") == 100.0
+    assert snapshot.get_percentile("p3") == 0.0
+    assert snapshot.get_rank("missing") is None
+
+
+def test_restored_from_rows_keeps_ranks():
+    snapshot = LeaderboardSnapshot.from_rows(dict(row) for row in _snapshot().rows())
+
+    assert [row["player_xuid"] for row in snapshot.get_board(True)] == ["p0", "p2", "p1", "p3"]
+    assert snapshot.get_rank("p1") == 3
+
+
+def test_persister_writes_latest_snapshot_in_background():
+    import threading
+    import time
+
+    from endstone_up_and_down.leaderboard_snapshot import LeaderboardPersister
+
+    release = threading.Event()
+    saved = []
+
+    def slow_save(snapshot):
+        release.wait(2)
+        saved.append(snapshot)
+
+    persister = LeaderboardPersister(slow_save)
+    snapshots = [_snapshot() for _ in range(3)]
+
+    start = time.perf_counter()
+    for snapshot in snapshots:
+        persister.submit(snapshot)
+    assert time.perf_counter() - start < 0.5
+
+    release.set()
+    persister.flush(timeout=2)
+    # 写入期间提交的快照互相覆盖，只写最新的一个
+    assert saved[-1] is snapshots[2]
+    assert snapshots[1] not in saved
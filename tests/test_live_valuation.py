@@ -0,0 +1,42 @@
+from decimal import Decimal
+
+from endstone_up_and_down.live_valuation import LiveValuationService
+
+
+class FakeLedger:
+    def get_balance(self, player_xuid):
+        return Decimal(100)
+
+
+class FakeValuationEngine:
+    def get_observed_prices(self, stock_names):
+        return {stock_name: Decimal(10) for stock_name in stock_names}
+
+
+class FakeDatabase:
+    """返回当前持仓；设置 on_query 后在查询返回前执行（模拟查询期间提交的交易）"""
+
+    def __init__(self):
+        self.share = 1
+        self.on_query = None
+
+    def query_all(self, sql, params):
+        rows = [{"stock_name": "AAPL", "share": self.share, "total_buy": 10_000_000, "total_sell": 0}]
+        if self.on_query:
+            on_query, self.on_query = self.on_query, None
+            on_query()
+        return rows
+
+
+def test_invalidate_during_position_query_is_not_overwritten():
+    database = FakeDatabase()
+    service = LiveValuationService(database, FakeLedger(), FakeValuationEngine(), lambda stock_names: {})
+
+    def trade_commits():
+        database.share = 2
+        service.invalidate("p1")
+
+    database.on_query = trade_commits
+    assert service.get_valuation("p1")["holdings_value"] == Decimal(10)
+
+    assert service.get_valuation("p1")["holdings_value"] == Decimal(20)
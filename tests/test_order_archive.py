@@ -0,0 +1,49 @@
+import time
+from decimal import Decimal
+
+from endstone_up_and_down.databaseManager import DatabaseManager
+from endstone_up_and_down.stockDao import StockDao
+
+
+def test_archived_orders_are_paged_and_summarized(tmp_path):
+    stock_dao = StockDao(DatabaseManager(str(tmp_path / "stock.db")))
+    stock_dao.init_tables()
+
+    for share in (2, 3):
+        order_id = stock_dao.create_order("p1", "AAPL", share, "buy_flex")
+        stock_dao.buy(order_id, "AAPL", "p1", share, Decimal("10"), Decimal("1"), Decimal(10 * share + 1))
+    old = time.mktime((2024, 1, 15, 12, 0, 0, 0, 0, -1))
+    stock_dao.database_manager.execute("UPDATE tb_player_order SET finish_time = ?", (old,))
+
+    assert stock_dao.order_archive.archive_orders(horizon_days=30) == 2
+
+    assert [order["share"] for order in stock_dao.get_orders("p1")] == [3, 2]
+    summary, = stock_dao.get_archived_order_summary("p1")
+    assert summary["month"] == "202401"
+    assert summary["order_count"] == 2
+    assert summary["buy_share"] == 5
+    assert summary["buy_total"] == Decimal("52")
+    assert summary["tax_total"] == Decimal("2")
+
+
+def test_players_without_archive_skip_partitions(tmp_path, monkeypatch):
+    stock_dao = StockDao(DatabaseManager(str(tmp_path / "stock.db")))
+    stock_dao.init_tables()
+
+    order_id = stock_dao.create_order("p1", "AAPL", 2, "buy_flex")
+    stock_dao.buy(order_id, "AAPL", "p1", 2, Decimal("10"), Decimal("1"), Decimal(21))
+    stock_dao.database_manager.execute(
+        "UPDATE tb_player_order SET finish_time = ?", (time.mktime((2024, 1, 15, 12, 0, 0, 0, 0, -1)),)
+    )
+    stock_dao.order_archive.archive_orders(horizon_days=30)
+    stock_dao.create_order("p2", "AAPL", 1, "buy_flex")
+
+    partition_reads = []
+    monkeypatch.setattr(stock_dao.order_archive, "get_partitions", lambda: partition_reads.append(1) or [])
+
+    assert stock_dao.has_archived_orders("p1")
+    assert not stock_dao.has_archived_orders("p2")
+    stock_dao.get_orders("p2")
+    assert partition_reads == []
+    stock_dao.get_orders("p1")
+    assert partition_reads == [1]
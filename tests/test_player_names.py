@@ -0,0 +1,35 @@
+from types import SimpleNamespace
+
+from endstone_up_and_down.player_names import PlayerNameCache
+
+
+class FakeArcCore:
+    def __init__(self, names):
+        self.names = names
+        self.calls = []
+
+    def get_player_name_by_xuid(self, player_xuid):
+        self.calls.append(player_xuid)
+        return self.names.get(player_xuid)
+
+
+def _cache(arc_core):
+    plugin_manager = SimpleNamespace(get_plugin=lambda name: arc_core)
+    return PlayerNameCache(SimpleNamespace(server=SimpleNamespace(plugin_manager=plugin_manager)))
+
+
+def test_failed_lookups_are_cached():
+    arc_core = FakeArcCore({"1111111111": "Alice"})
+    cache = _cache(arc_core)
+
+    assert cache.get_names(["1111111111", "2222222222"]) == {"1111111111": "Alice", "2222222222": "玩家22222222"}
+    assert cache.get_names(["1111111111", "2222222222"]) == {"1111111111": "Alice", "2222222222": "玩家22222222"}
+    assert arc_core.calls == ["1111111111", "2222222222"]
+
+
+def test_join_replaces_cached_placeholder():
+    cache = _cache(FakeArcCore({}))
+
+    assert cache.get_name("3333333333") == "玩家33333333"
+    cache.remember("3333333333", "Carol")
+    assert cache.get_name("3333333333") == "Carol"
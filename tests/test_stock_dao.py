@@ -0,0 +1,46 @@
+import sqlite3
+from decimal import Decimal
+
+from endstone_up_and_down.databaseManager import DatabaseManager
+from endstone_up_and_down.stockDao import StockDao
+
+
+def test_legacy_orders_without_tax_migrate_to_zero(tmp_path):
+    db_path = str(tmp_path / "stock.db")
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        """
+        CREATE TABLE tb_player_order (id INTEGER primary key autoincrement, player_xuid TEXT, stock_name nvarchar,
+            share int, single_price float, type nvarchar, create_time float, finish_time float, tax float, total float)
+        """
+    )
+    conn.execute(
+        "INSERT INTO tb_player_order (player_xuid, stock_name, share, single_price, type, create_time, finish_time, tax, total) "
+        "VALUES ('p1', 'AAPL', 2, 10.5, 'buy_flex', 1, 2, NULL, 21)"
+    )
+    conn.commit()
+    conn.close()
+
+    stock_dao = StockDao(DatabaseManager(db_path))
+    stock_dao.init_tables()
+
+    order, = stock_dao.get_orders("p1")
+    assert order["tax"] == Decimal(0)
+    assert order["single_price"] == Decimal("10.5")
+    assert f"{order['tax']:.2f}" == "0.00"
+    assert stock_dao.database_manager.query_one("SELECT tax FROM tb_player_order")["tax"] == 0
+
+
+def test_position_average_cost_follows_fifo_lots(tmp_path):
+    stock_dao = StockDao(DatabaseManager(str(tmp_path / "stock.db")))
+    stock_dao.init_tables()
+
+    for share, price in ((2, "10"), (2, "20")):
+        order_id = stock_dao.create_order("p1", "AAPL", share, "buy_flex")
+        stock_dao.buy(order_id, "AAPL", "p1", share, Decimal(price), Decimal(0), Decimal(price) * share)
+    order_id = stock_dao.create_order("p1", "AAPL", 3, "sell_flex")
+    stock_dao.sell(order_id, "AAPL", "p1", 3, Decimal("30"), Decimal(0), Decimal(90))
+
+    position = stock_dao.get_position("p1", "aapl")
+    assert position["share"] == 1
+    assert position["average_cost"] == Decimal(20)
@@ -0,0 +1,71 @@
+from decimal import Decimal
+from types import SimpleNamespace
+
+import pandas as pd
+import pytest
+
+from endstone_up_and_down import up_and_down_plugin
+from endstone_up_and_down.up_and_down_plugin import UpAndDownPlugin
+
+
+class FakeValuationEngine:
+    def __init__(self):
+        self.observed = {}
+
+    def observe_price(self, stock_name, price):
+        self.observed[stock_name] = price
+
+
+@pytest.fixture
+def plugin(monkeypatch):
+    monkeypatch.setattr(up_and_down_plugin.yf, "Ticker", lambda stock: SimpleNamespace(ticker=stock))
+    fake = SimpleNamespace(
+        valuation_engine=FakeValuationEngine(),
+        is_available=lambda ticket: ticket.ticker != "0700.HK",
+        _get_close_column=UpAndDownPlugin._get_close_column,
+    )
+    fake.get_stock_last_prices = lambda stocks: UpAndDownPlugin.get_stock_last_prices(fake, stocks)
+    fake.get_stock_last_quotes = lambda stocks: UpAndDownPlugin.get_stock_last_quotes(fake, stocks)
+    return fake
+
+
+def _mock_download(monkeypatch, df):
+    downloads = []
+
+    def download(stocks, **kwargs):
+        downloads.append(list(stocks))
+        return df
+
+    monkeypatch.setattr(up_and_down_plugin.yf, "download", download)
+    return downloads
+
+
+def test_single_ticker_flat_columns(plugin, monkeypatch):
+    _mock_download(monkeypatch, pd.DataFrame({"Open": [1.0, 2.0], "Close": [1.5, 2.345]}))
+
+    assert plugin.get_stock_last_prices(["aapl"]) == {"AAPL": Decimal("2.35")}
+    assert plugin.valuation_engine.observed == {"AAPL": Decimal("2.35")}
+
+
+@pytest.mark.parametrize("columns", [
+    [("AAPL", "Close"), ("MSFT", "Close")],
+    [("Close", "AAPL"), ("Close", "MSFT")],
+])
+def test_multi_ticker_layouts(plugin, monkeypatch, columns):
+    df = pd.DataFrame([[10.0, 20.0], [11.0, None]], columns=pd.MultiIndex.from_tuples(columns))
+    _mock_download(monkeypatch, df)
+
+    assert plugin.get_stock_last_prices(["AAPL", "MSFT"]) == {"AAPL": Decimal("11.0"), "MSFT": Decimal("20.0")}
+
+
+def test_unavailable_market_is_not_downloaded(plugin, monkeypatch):
+    downloads = _mock_download(monkeypatch, pd.DataFrame({"Close": [3.0]}))
+
+    assert plugin.get_stock_last_prices(["0700.HK", "AAPL"]) == {"0700.HK": None, "AAPL": Decimal("3.0")}
+    assert downloads == [["AAPL"]]
+
+
+def test_quotes_mark_priced_stocks_tradeable(plugin, monkeypatch):
+    _mock_download(monkeypatch, pd.DataFrame({"Close": [3.0]}))
+
+    assert plugin.get_stock_last_quotes(["0700.HK", "AAPL"]) == {"0700.HK": (None, None), "AAPL": (Decimal("3.0"), True)}
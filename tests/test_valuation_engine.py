@@ -0,0 +1,113 @@
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+import pytest
+
+from endstone_up_and_down.databaseManager import DatabaseManager
+from endstone_up_and_down.money import from_micro
+from endstone_up_and_down.stockDao import StockDao
+from endstone_up_and_down.valuation_engine import PortfolioValuationEngine
+
+
+@pytest.fixture
+def env(tmp_path):
+    database_manager = DatabaseManager(str(tmp_path / "stock.db"))
+    stock_dao = StockDao(database_manager)
+    stock_dao.init_tables()
+    database_manager.execute("INSERT INTO tb_player_account (player_xuid, balance) VALUES ('p1', 0)")
+    return database_manager, stock_dao, PortfolioValuationEngine(database_manager)
+
+
+def _buy(stock_dao, xuid, stock_name, share, price):
+    order_id = stock_dao.create_order(xuid, stock_name, share, "buy_flex")
+    price = Decimal(price)
+    stock_dao.buy(order_id, stock_name, xuid, share, price, Decimal(0), price * share)
+
+
+def test_ticker_bought_after_price_fetch_is_priced(env):
+    database_manager, stock_dao, engine = env
+    _buy(stock_dao, "p1", "AAPL", 1, "10")
+
+    fetched = []
+
+    def get_price(stock_name):
+        fetched.append(stock_name)
+        if stock_name == "AAPL" and "MSFT" not in fetched:
+            # 父进程查询完价格、子进程读取快照之前买入新股票
+            _buy(stock_dao, "p1", "MSFT", 2, "20")
+        return {"AAPL": 10, "MSFT": 20}[stock_name], True
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        players_data, _ = engine.value_all_in_process(get_price, executor)
+
+    assert fetched == ["AAPL", "MSFT"]
+    assert players_data[0]["holdings_value"] == 50
+    assert players_data[0]["absolute_profit_loss"] == 0
+
+
+def test_failed_incremental_pass_keeps_dirty_marks(env):
+    database_manager, stock_dao, engine = env
+    _buy(stock_dao, "p1", "AAPL", 1, "10")
+    engine.value_all(lambda stock_name: (10, True))
+
+    _buy(stock_dao, "p1", "MSFT", 1, "20")
+    engine.mark_player_dirty("p1")
+
+    def failing_price(stock_name):
+        raise ConnectionError("quote service down")
+
+    with pytest.raises(ConnectionError):
+        engine.value_dirty(failing_price)
+
+    players_data, _, revalued = engine.value_dirty(lambda stock_name: (20, True))
+    assert revalued == ["p1"]
+    assert players_data[0]["holdings_value"] == 30
+
+
+def _reference_profit_loss(database_manager, prices):
+    """逐玩家、逐持仓的 Decimal 计算（原 StockDao.get_all_players_profit_loss），作为向量化估值的参照"""
+    positions_by_player = {}
+    for position in database_manager.query_all(
+        "SELECT player_xuid, stock_name, share, total_buy, total_sell FROM tb_player_position"
+    ):
+        positions_by_player.setdefault(position['player_xuid'], []).append(position)
+
+    players = {}
+    for account in database_manager.query_all("SELECT player_xuid, balance FROM tb_player_account"):
+        total_buy = total_sell = holdings_value = Decimal(0)
+        for position in positions_by_player.get(account['player_xuid'], []):
+            total_buy += from_micro(position['total_buy'])
+            total_sell += from_micro(position['total_sell'])
+            if position['share'] > 0:
+                holdings_value += Decimal(prices[position['stock_name']]) * position['share']
+        if total_buy == 0:
+            continue
+
+        absolute_profit_loss = holdings_value - total_buy + total_sell
+        players[account['player_xuid']] = {
+            'total_wealth': float(holdings_value + from_micro(account['balance'] or 0)),
+            'holdings_value': float(holdings_value),
+            'absolute_profit_loss': float(absolute_profit_loss),
+            'relative_profit_loss': float(absolute_profit_loss / total_buy * 100),
+        }
+    return players
+
+
+def test_value_all_matches_reference_calculation(env):
+    database_manager, stock_dao, engine = env
+    database_manager.execute("INSERT INTO tb_player_account (player_xuid, balance) VALUES ('p2', 5000000)")
+    database_manager.execute("INSERT INTO tb_player_account (player_xuid, balance) VALUES ('p3', 0)")
+    _buy(stock_dao, "p1", "AAPL", 3, "10.5")
+    _buy(stock_dao, "p1", "MSFT", 1, "300")
+    _buy(stock_dao, "p2", "AAPL", 7, "12")
+    order_id = stock_dao.create_order("p2", "AAPL", 2, "sell_flex")
+    stock_dao.sell(order_id, "AAPL", "p2", 2, Decimal("13"), Decimal("0.26"), Decimal("26"))
+    prices = {"AAPL": "11.25", "MSFT": "280"}
+
+    players_data, _ = engine.value_all(lambda stock_name: (Decimal(prices[stock_name]), True))
+
+    expected = _reference_profit_loss(database_manager, prices)
+    assert {data['player_xuid'] for data in players_data} == set(expected) == {"p1", "p2"}
+    for data in players_data:
+        for field, value in expected[data['player_xuid']].items():
+            assert data[field] == pytest.approx(value)
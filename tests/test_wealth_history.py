@@ -0,0 +1,47 @@
+import datetime
+
+import pytest
+
+from endstone_up_and_down.databaseManager import DatabaseManager
+from endstone_up_and_down.wealth_history import WealthHistoryManager
+
+
+@pytest.fixture
+def history(tmp_path):
+    return WealthHistoryManager(DatabaseManager(str(tmp_path / "stock.db")))
+
+
+def _player(wealth, profit_loss, xuid="p1"):
+    return {"player_xuid": xuid, "total_wealth": wealth, "absolute_profit_loss": profit_loss}
+
+
+def _updated_time(history, xuid="p1"):
+    return history.database_manager.query_one(
+        "SELECT updated_time FROM tb_wealth_history WHERE player_xuid = ?", (xuid,)
+    )["updated_time"]
+
+
+def test_record_daily_appends_and_replaces_last_record(history):
+    day1 = datetime.date(2026, 1, 1)
+    day2 = datetime.date(2026, 1, 2)
+
+    history.record_daily([_player(100, 0)], date=day1)
+    history.record_daily([_player(110, 10)], date=day2)
+    history.record_daily([_player(120, 20)], date=day2)
+
+    assert history.get_history("p1") == [
+        {"date": day1, "total_wealth": 100, "absolute_profit_loss": 0},
+        {"date": day2, "total_wealth": 120, "absolute_profit_loss": 20},
+    ]
+
+
+def test_record_daily_skips_unchanged_record(history):
+    day = datetime.date(2026, 1, 1)
+
+    history.record_daily([_player(100, 0)], date=day)
+    updated_time = _updated_time(history)
+    history.record_daily([_player(100, 0), _player(50, -5, xuid="p2")], date=day)
+
+    assert _updated_time(history) == updated_time
+    assert len(history.get_history("p1")) == 1
+    assert history.get_history("p2")[0]["total_wealth"] == 50